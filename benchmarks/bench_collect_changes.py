@@ -0,0 +1,99 @@
+"""
+Benchmark the collection of the changes against the size of the repository.
+
+Builds a synthetic repository per file count, with a feature branch, unstaged, staged and untracked changes, and
+compares the wall-clock time of ``GitService.get_diff`` collecting everything in turn, with a single worker, and
+concurrently, the parent branch being detected along with the working tree diffs in both cases.
+
+Usage:
+    python benchmarks/bench_collect_changes.py [file counts...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from git import Repo  # noqa: E402
+from src.service.git_service import GitService  # noqa: E402
+
+DEFAULT_FILE_COUNTS = [1000, 5000, 20000]
+ROUNDS = 3
+
+
+def run(repo_path, *args):
+    subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True, text=True)
+
+
+def write_files(repo_path, names, content):
+    for name in names:
+        path = os.path.join(repo_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content(name))
+
+
+def build_repo(repo_path, file_count):
+    """Create a repository with ``file_count`` files, a few branches and changes of every kind on a feature branch."""
+    names = [f"pkg{index % 50:02d}/module{index:05d}.py" for index in range(file_count)]
+    changed = max(file_count // 100, 1)
+
+    run(repo_path, "init", "-q", "-b", "main")
+    run(repo_path, "config", "user.email", "bench@example.com")
+    run(repo_path, "config", "user.name", "bench")
+    write_files(repo_path, names, lambda name: "".join(f"line {line} of {name}\n" for line in range(40)))
+    run(repo_path, "add", "-A")
+    run(repo_path, "commit", "-q", "-m", "initial")
+    for index in range(20):
+        run(repo_path, "branch", f"branch-{index:02d}")
+
+    run(repo_path, "checkout", "-q", "-b", "feature")
+    write_files(repo_path, names[:changed], lambda name: f"committed change of {name}\n")
+    run(repo_path, "commit", "-q", "-am", "feature")
+    write_files(repo_path, names[changed : 2 * changed], lambda name: f"staged change of {name}\n")
+    run(repo_path, "add", "-A")
+    write_files(repo_path, names[2 * changed : 3 * changed], lambda name: f"unstaged change of {name}\n")
+    write_files(repo_path, [f"new/file{index:05d}.py" for index in range(changed)], lambda name: f"# {name}\n" * 20)
+
+
+def measure(repo_path, max_workers):
+    """Collect the changes with a fresh service, returning the result and the best wall-clock time."""
+    best = None
+    for _ in range(ROUNDS):
+        service = GitService(Repo(repo_path))
+        service.max_workers = max_workers
+        start = time.perf_counter()
+        result = service.get_diff(lambda: service.find_parent_branch(use_cache=False))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    file_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_FILE_COUNTS
+
+    print(f"{'files':>8} {'in turn (s)':>12} {'concurrent (s)':>15} {'speedup':>8}")
+    for file_count in file_counts:
+        with tempfile.TemporaryDirectory() as repo_path:
+            build_repo(repo_path, file_count)
+            cwd = os.getcwd()
+            # Untracked files are read relative to the root of the repository
+            os.chdir(repo_path)
+            try:
+                sequential, sequential_time = measure(repo_path, 1)
+                concurrent, concurrent_time = measure(repo_path, GitService.max_workers)
+            finally:
+                os.chdir(cwd)
+
+            assert sequential == concurrent, "The concurrent collection changed the result"
+            print(
+                f"{file_count:>8} {sequential_time:>12.3f} {concurrent_time:>15.3f} "
+                f"{sequential_time / concurrent_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
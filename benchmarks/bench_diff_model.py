@@ -0,0 +1,105 @@
+"""
+Benchmark the offset-based diff model against splitting the diff into strings.
+
+For synthetic diffs of increasing size, both approaches parse the diff into files and hunks and count the
+added and deleted lines of every hunk, which is what ranking and summarizing need. Peak memory is measured
+with tracemalloc on top of the diff text itself.
+
+Usage:
+    python benchmarks/bench_diff_model.py [file counts...]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.diff_model import parse_diff  # noqa: E402
+
+DEFAULT_FILE_COUNTS = [100, 1000, 5000]
+HUNKS_PER_FILE = 10
+
+
+def build_diff(file_count):
+    """Build a diff with ``file_count`` files of ``HUNKS_PER_FILE`` hunks each."""
+    parts = []
+    for file_index in range(file_count):
+        path = f"src/module_{file_index}.py"
+        parts.append(f"diff --git a/{path} b/{path}\nindex 1234567..89abcde 100644\n--- a/{path}\n+++ b/{path}\n")
+        for hunk_index in range(HUNKS_PER_FILE):
+            line = hunk_index * 20 + 1
+            parts.append(f"@@ -{line},7 +{line},7 @@ def function_{hunk_index}():\n")
+            parts.append("     context = compute_something(argument)\n" * 3)
+            parts.append(f"-    value = old_call({hunk_index})\n+    value = new_call({hunk_index})\n")
+            parts.append("     return context\n" * 3)
+    return "".join(parts)
+
+
+def string_approach(diff):
+    """The string based approach: split the diff into lines and rebuild every header and hunk as a string."""
+    files = []
+    for line in diff.splitlines(keepends=True):
+        if line.startswith("diff --git "):
+            files.append([line, []])
+        elif not files:
+            continue
+        elif line.startswith("@@"):
+            files[-1][1].append(line)
+        elif files[-1][1]:
+            files[-1][1][-1] += line
+        else:
+            files[-1][0] += line
+
+    changes = 0
+    for _, hunks in files:
+        for hunk in hunks:
+            for hunk_line in hunk.splitlines()[1:]:
+                if hunk_line.startswith(("+", "-")):
+                    changes += 1
+    return changes
+
+
+def model_approach(diff):
+    """The diff model: offsets into the shared buffer, counting changes without copying hunks."""
+    _, files = parse_diff(diff)
+    changes = 0
+    for file in files:
+        added, deleted = file.count_changes()
+        changes += added + deleted
+    return changes
+
+
+def measure(func, diff):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(diff)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    file_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_FILE_COUNTS
+
+    print(
+        f"{'files':>6} {'diff (MB)':>10} {'strings (s)':>12} {'model (s)':>10} "
+        f"{'strings peak (MB)':>18} {'model peak (MB)':>16}"
+    )
+    for file_count in file_counts:
+        diff = build_diff(file_count)
+
+        string_result, string_time, string_peak = measure(string_approach, diff)
+        model_result, model_time, model_peak = measure(model_approach, diff)
+
+        assert string_result == model_result, f"{string_result} != {model_result}"
+        print(
+            f"{file_count:>6} {len(diff) / 1e6:>10.1f} {string_time:>12.3f} {model_time:>10.3f} "
+            f"{string_peak / 1e6:>18.1f} {model_peak / 1e6:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark parent-branch detection against the number of local branches.
+
+Builds a synthetic repository per branch count and compares the single-pass detection in
+``GitService.find_parent_branch`` with the previous one-``merge-base``-per-branch approach, and with a
+repeated invocation served from the on-disk cache.
+
+Usage:
+    python benchmarks/bench_find_parent_branch.py [branch counts...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from git import Repo  # noqa: E402
+from src.service.git_service import GitService  # noqa: E402
+
+DEFAULT_BRANCH_COUNTS = [10, 50, 100, 200, 400]
+
+
+def run(repo_path, *args, timestamp=None):
+    env = dict(os.environ)
+    if timestamp is not None:
+        # Distinct commit dates keep the legacy "newest merge base" comparison deterministic
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = f"{1_700_000_000 + timestamp} +0000"
+    subprocess.run(["git", *args], cwd=repo_path, env=env, check=True, capture_output=True, text=True)
+
+
+def build_repo(repo_path, branch_count):
+    """Create a repository with a linear main history, ``branch_count`` branches and a feature branch."""
+    run(repo_path, "init", "-q", "-b", "main")
+    run(repo_path, "config", "user.email", "bench@example.com")
+    run(repo_path, "config", "user.name", "bench")
+    for i in range(branch_count):
+        run(repo_path, "commit", "-q", "--allow-empty", "-m", f"main {i}", timestamp=i)
+        run(repo_path, "branch", f"branch-{i:04d}")
+    run(repo_path, "checkout", "-q", "-b", "feature")
+    for i in range(5):
+        run(repo_path, "commit", "-q", "--allow-empty", "-m", f"feature {i}", timestamp=branch_count + i)
+
+
+def legacy_find_parent_branch(repo):
+    """The previous implementation: one merge-base and two commit lookups per branch."""
+    current_branch = repo.active_branch.name
+    parent_branch = None
+    closest_base = None
+    for branch in [head.name for head in repo.heads if head.name != current_branch]:
+        merge_base = repo.git.merge_base(current_branch, branch).strip()
+        if merge_base and (
+            not closest_base or repo.commit(merge_base).committed_date > repo.commit(closest_base).committed_date
+        ):
+            closest_base = merge_base
+            parent_branch = branch
+    return parent_branch
+
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    branch_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_BRANCH_COUNTS
+
+    print(f"{'branches':>8} {'legacy (s)':>12} {'single-pass (s)':>16} {'speedup':>8} {'cached (s)':>11}")
+    for branch_count in branch_counts:
+        with tempfile.TemporaryDirectory() as repo_path:
+            build_repo(repo_path, branch_count)
+
+            service = GitService()
+            service.repo = Repo(repo_path)
+
+            legacy_parent, legacy_time = measure(lambda: legacy_find_parent_branch(service.repo))
+            parent, single_pass_time = measure(lambda: service.find_parent_branch(use_cache=False))
+            service.find_parent_branch()
+            cached_parent, cached_time = measure(service.find_parent_branch)
+
+            assert parent == legacy_parent == cached_parent, f"{parent} != {legacy_parent}"
+            print(
+                f"{branch_count:>8} {legacy_time:>12.3f} {single_pass_time:>16.3f} "
+                f"{legacy_time / single_pass_time:>7.1f}x {cached_time:>11.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark cold-start time of the agt entry points with ``python -X importtime``.
+
+Each scenario runs in a fresh interpreter and imports what the corresponding path needs before it starts
+talking to git or the network:
+
+- help: parse the arguments and print ``agt --help``.
+- clipboard: load the change manager, the GitHub service and the clipboard library.
+- openai: load the change manager, the GitHub service and the OpenAI client.
+
+Usage:
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCENARIOS = {
+    "help": (
+        "import sys\n"
+        "sys.argv = ['agt', '--help']\n"
+        "from src.main import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+    "clipboard": "import src.core.git_change_manager, src.service.github_service, pyperclip\n",
+    "openai": "import src.core.git_change_manager, src.service.github_service, src.service.openai_service\n",
+}
+
+DEFAULT_RUNS = 5
+
+
+def total_import_time(importtime_output):
+    """Sum the cumulative time, in microseconds, of the top-level imports reported by ``-X importtime``."""
+    total = 0
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    return total
+
+
+def measure(code):
+    """Run the code in a fresh interpreter and return its wall-clock and import time in seconds."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    wall_time = time.perf_counter() - start
+    return wall_time, total_import_time(result.stderr) / 1_000_000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS
+
+    print(f"{'scenario':>10} {'wall (s)':>10} {'imports (s)':>12}")
+    for scenario, code in SCENARIOS.items():
+        samples = [measure(code) for _ in range(runs)]
+        wall_time = min(sample[0] for sample in samples)
+        import_time = min(sample[1] for sample in samples)
+        print(f"{scenario:>10} {wall_time:>10.3f} {import_time:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+
+from src.core.diff_model import parse_diff
+
+
+def fingerprint_hunk(hunk):
+    """
+    Fingerprint the change made by a hunk.
+
+    Only the added and deleted lines are hashed, with their whitespace normalized, so the same change made in
+    different places of different files gets the same fingerprint regardless of line numbers and context.
+
+    :return: The fingerprint, or None if the hunk has no added or deleted lines.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    changed = False
+    for line in hunk.lines()[1:]:
+        if line.startswith(("+", "-")):
+            digest.update(f"{line[0]}{' '.join(line[1:].split())}\n".encode("utf-8"))
+            changed = True
+    return digest.digest() if changed else None
+
+
+def collapse_repeated_hunks(diff):
+    """
+    Keep a single copy of the hunks that make the same change in several places.
+
+    The first occurrence of a repeated change is kept and followed by the list of the other files it appears
+    in. The other occurrences are removed, along with the files that are left with no hunk at all.
+
+    :param diff: The combined git diff.
+    :return: The diff with the repeated hunks collapsed.
+    """
+    preamble, files = parse_diff(diff)
+
+    groups = {}
+    for file in files:
+        for hunk in file.hunks:
+            fingerprint = fingerprint_hunk(hunk)
+            if fingerprint is not None:
+                groups.setdefault(fingerprint, []).append((file, hunk))
+
+    representatives = {}
+    duplicates = set()
+    for occurrences in groups.values():
+        if len(occurrences) < 2:
+            continue
+        _, first_hunk = occurrences[0]
+        representatives[id(first_hunk)] = [file.path for file, _ in occurrences[1:]]
+        duplicates.update(id(hunk) for _, hunk in occurrences[1:])
+
+    if not duplicates:
+        return diff
+
+    rendered = [preamble]
+    removed_files = 0
+    for file in files:
+        hunks = [hunk for hunk in file.hunks if id(hunk) not in duplicates]
+        if file.hunks and not hunks:
+            removed_files += 1
+            continue
+
+        rendered.append(file.header)
+        for hunk in hunks:
+            rendered.append(hunk.text)
+            if id(hunk) in representatives:
+                rendered.append(describe_repeats(hunk, representatives[id(hunk)]))
+
+    print(f"Collapsed {len(duplicates)} repeated hunk(s), {removed_files} file(s) only repeated other changes.")
+    return "".join(rendered)
+
+
+def describe_repeats(hunk, paths):
+    """Build the note listing the other places where the change of a hunk is repeated."""
+    counts = {}
+    for path in paths:
+        counts[path] = counts.get(path, 0) + 1
+    places = ", ".join(path if count == 1 else f"{path} (x{count})" for path, count in counts.items())
+
+    separator = "" if hunk.text.endswith("\n") else "\n"
+    return f"{separator}[The same change is also made {len(paths)} more time(s) in: {places}]\n"
@@ -0,0 +1,134 @@
+import re
+
+from src.utils.git_paths import diff_header_path
+
+UNTRACKED_HEADER = "--- Untracked file: "
+
+_DIFF_BOUNDARY = re.compile(r"^(?:diff --git |@@)", re.MULTILINE)
+_UNTRACKED_BOUNDARY = re.compile(rf"\n\n{re.escape(UNTRACKED_HEADER)}")
+
+
+class Hunk:
+    """A hunk of a diff, stored as offsets into the shared diff buffer."""
+
+    __slots__ = ("buffer", "start", "end")
+
+    def __init__(self, buffer, start, end):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def text(self):
+        return self.buffer[self.start : self.end]
+
+    def lines(self):
+        """Materialize the lines of the hunk."""
+        return self.text.splitlines()
+
+    def count_changes(self):
+        """Count the added and deleted lines without copying the hunk out of the buffer."""
+        # The hunk starts with its '@@' line, so every change line is preceded by a newline
+        return self.buffer.count("\n+", self.start, self.end), self.buffer.count("\n-", self.start, self.end)
+
+
+class UntrackedContent(Hunk):
+    """The content of an untracked file, every line of it being an addition."""
+
+    __slots__ = ()
+
+    def count_changes(self):
+        lines = self.buffer.count("\n", self.start, self.end)
+        if self.end > self.start and self.buffer[self.end - 1] != "\n":
+            lines += 1
+        return lines, 0
+
+
+class FileDiff:
+    """A changed file, made of a header that is always kept and its hunks, stored as offsets into the buffer."""
+
+    __slots__ = ("buffer", "start", "header_end", "end", "path", "hunks", "untracked")
+
+    def __init__(self, buffer, start, header_end, end, path, hunks, untracked=False):
+        self.buffer = buffer
+        self.start = start
+        self.header_end = header_end
+        self.end = end
+        self.path = path
+        self.hunks = hunks
+        self.untracked = untracked
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def header(self):
+        return self.buffer[self.start : self.header_end]
+
+    @property
+    def text(self):
+        return self.buffer[self.start : self.end]
+
+    def count_changes(self, hunks=None):
+        """Count the added and deleted lines of the given hunks, all the hunks of the file by default."""
+        added = deleted = 0
+        for hunk in self.hunks if hunks is None else hunks:
+            hunk_added, hunk_deleted = hunk.count_changes()
+            added += hunk_added
+            deleted += hunk_deleted
+        return added, deleted
+
+
+def parse_diff(buffer):
+    """
+    Parse a unified diff into files and hunks without copying it.
+
+    :param buffer: The diff text.
+    :return: A tuple with the text before the first file and the list of files.
+    """
+    files = []
+    boundaries = [match.start() for match in _DIFF_BOUNDARY.finditer(buffer)] + [len(buffer)]
+
+    for index, start in enumerate(boundaries[:-1]):
+        end = boundaries[index + 1]
+        if buffer.startswith("diff --git ", start):
+            files.append(FileDiff(buffer, start, end, end, diff_header_path(buffer[start:end]), []))
+        elif files:
+            # A hunk ends its file's header and extends the file to its own end
+            file = files[-1]
+            if not file.hunks:
+                file.header_end = start
+            file.hunks.append(Hunk(buffer, start, end))
+            file.end = end
+
+    preamble = buffer[: files[0].start] if files else buffer
+    return preamble, files
+
+
+def parse_untracked(buffer):
+    """
+    Parse the untracked file contents collected by GitService into files, each content being a single hunk.
+
+    :param buffer: The untracked file contents.
+    :return: A tuple with the text before the first file and the list of files.
+    """
+    files = []
+    starts = [match.start() for match in _UNTRACKED_BOUNDARY.finditer(buffer)]
+    boundaries = starts + [len(buffer)]
+
+    for index, start in enumerate(starts):
+        end = boundaries[index + 1]
+        header_start = start + 2
+        line_end = buffer.find("\n", header_start, end)
+        header_end = line_end + 1 if line_end != -1 else end
+
+        line = buffer[header_start : line_end if line_end != -1 else end]
+        path = line[len(UNTRACKED_HEADER) :].rsplit(" ---", 1)[0]
+        hunks = [UntrackedContent(buffer, header_end, end)] if header_end < end else []
+        files.append(FileDiff(buffer, start, header_end, end, path, hunks, untracked=True))
+
+    preamble = buffer[: starts[0]] if starts else buffer
+    return preamble, files
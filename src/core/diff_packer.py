@@ -0,0 +1,150 @@
+import fnmatch
+import math
+import os
+
+from src.core.diff_model import parse_diff, parse_untracked
+from src.utils.env import get_int_env
+
+# Rough ratio for code and diffs, kept low so that the estimate errs on the side of more tokens
+CHARS_PER_TOKEN = 3.5
+
+DEFAULT_MAX_PROMPT_TOKENS = 100_000
+
+# How much more diff is read from git than fits in the prompt, leaving the packer room to pick the best hunks
+DIFF_READ_FACTOR = 2
+
+# Files whose changes are rarely meaningful to describe a change, their hunks are dropped first
+LOW_PRIORITY_PATTERNS = [
+    "*.lock",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.snap",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.generated.*",
+    "*/__snapshots__/*",
+    "vendor/*",
+    "dist/*",
+]
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens of a text, or of a hunk or file of the diff model, without a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_max_prompt_tokens():
+    """
+    Get the maximum number of tokens of the prompt sent to the model.
+
+    :return: The value of AGT_MAX_PROMPT_TOKENS, or the default when it is not set or invalid.
+    """
+    return get_int_env("AGT_MAX_PROMPT_TOKENS", DEFAULT_MAX_PROMPT_TOKENS)
+
+
+def get_diff_byte_budget(max_prompt_tokens):
+    """Get the number of diff bytes worth reading from git for a prompt of the given size."""
+    return int(max_prompt_tokens * CHARS_PER_TOKEN * DIFF_READ_FACTOR)
+
+
+def get_file_priority(path):
+    """
+    Rank a file by how useful its changes are to describe the change.
+
+    :return: 0 for source files, 1 for lockfiles and generated files.
+    """
+    name = os.path.basename(path)
+    for pattern in LOW_PRIORITY_PATTERNS:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern):
+            return 1
+    return 0
+
+
+def pack_diff(diff, untracked_content, budget):
+    """
+    Fit the diff and the untracked file contents into a token budget.
+
+    File headers are always kept. Hunks are then added by priority, source files before lockfiles and
+    generated files and small hunks before large ones, and the hunks that do not fit are replaced by a
+    one-line summary of the omitted changes.
+
+    :param diff: The combined git diff.
+    :param untracked_content: The content of the untracked files.
+    :param budget: The maximum number of tokens for both texts.
+    :return: A tuple with the packed diff and the packed untracked content.
+    """
+    if estimate_tokens(diff) + estimate_tokens(untracked_content) <= budget:
+        return diff, untracked_content
+
+    diff_preamble, diff_files = parse_diff(diff)
+    untracked_preamble, untracked_files = parse_untracked(untracked_content)
+    files = diff_files + untracked_files
+
+    # Headers and a possible summary line are reserved for every file
+    used = estimate_tokens(diff_preamble) + estimate_tokens(untracked_preamble)
+    for file in files:
+        used += estimate_tokens(file.header) + estimate_tokens(summarize_omitted(file, file.hunks))
+
+    if used > budget:
+        return summarize_files(diff_files, budget // 2), summarize_files(untracked_files, budget // 2)
+
+    candidates = []
+    for file_index, file in enumerate(files):
+        priority = get_file_priority(file.path)
+        for hunk_index, hunk in enumerate(file.hunks):
+            candidates.append((priority, estimate_tokens(hunk), file_index, hunk_index))
+    candidates.sort()
+
+    kept = set()
+    for _, tokens, file_index, hunk_index in candidates:
+        if used + tokens <= budget:
+            kept.add((file_index, hunk_index))
+            used += tokens
+
+    # Only the kept hunks are copied out of the diff buffer
+    rendered = []
+    for file_index, file in enumerate(files):
+        hunks = [hunk for hunk_index, hunk in enumerate(file.hunks) if (file_index, hunk_index) in kept]
+        omitted = [hunk for hunk_index, hunk in enumerate(file.hunks) if (file_index, hunk_index) not in kept]
+        text = file.header + "".join(hunk.text for hunk in hunks)
+        if omitted and not text.endswith("\n"):
+            text += "\n"
+        rendered.append(text + summarize_omitted(file, omitted))
+
+    dropped = len(candidates) - len(kept)
+    print(f"The diff exceeds the prompt budget of {budget} tokens, {dropped} hunk(s) were summarized.")
+
+    return (
+        diff_preamble + "".join(rendered[: len(diff_files)]),
+        untracked_preamble + "".join(rendered[len(diff_files) :]),
+    )
+
+
+def summarize_omitted(file, omitted):
+    """Build the line that replaces the omitted hunks of a file."""
+    if not omitted:
+        return ""
+    added, deleted = file.count_changes(omitted)
+    return (
+        f"[{len(omitted)} of {len(file.hunks)} hunk(s) omitted to fit the prompt: {file.path} | +{added} -{deleted}]\n"
+    )
+
+
+def summarize_files(files, budget):
+    """Summarize every file in a single '--stat' style line, listing as many files as the budget allows."""
+    lines = []
+    used = 0
+    for index, file in enumerate(sorted(files, key=lambda file: get_file_priority(file.path))):
+        added, deleted = file.count_changes()
+        line = f" {file.path} | +{added} -{deleted}\n"
+        used += estimate_tokens(line)
+        if used > budget:
+            lines.append(f" ... and {len(files) - index} more file(s)\n")
+            break
+        lines.append(line)
+    return "".join(lines)
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Step:
+    def __init__(self, name, func, args, depends_on):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.depends_on = depends_on
+
+
+class ExecutionPlan:
+    """
+    Steps that run as soon as the steps they depend on are complete, the independent ones concurrently.
+
+    The duration of every step is recorded, so a slow phase can be told apart from a slow network call.
+    """
+
+    # Number of steps run at the same time
+    max_workers = 4
+
+    def __init__(self):
+        self.steps = {}
+        self.results = {}
+        self.timings = {}
+        self.total = None
+
+    def add(self, name, func, *args, depends_on=()):
+        """
+        Add a step to the plan.
+
+        :param name: The name of the step, which its result is read with.
+        :param func: The function run by the step, called with the given arguments.
+        :param depends_on: The names of the steps that must be complete before this one starts.
+        """
+        unknown = [dependency for dependency in depends_on if dependency not in self.steps]
+        if unknown:
+            raise ValueError(f"Step '{name}' depends on unknown steps: {', '.join(unknown)}")
+        self.steps[name] = Step(name, func, args, depends_on)
+
+    def result(self, name):
+        """Get the result of a step that is complete."""
+        return self.results[name]
+
+    def run(self):
+        """
+        Run every step.
+
+        When a step fails, the steps depending on it are not started, the steps that do not are still run, and the
+        error is raised once nothing is left to run.
+
+        :return: The results of the steps, by name.
+        """
+        started = time.perf_counter()
+        pending = dict(self.steps)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for step in list(pending.values()):
+                    if all(dependency in self.results for dependency in step.depends_on):
+                        del pending[step.name]
+                        running[executor.submit(self._run_step, step)] = step
+                if not running:
+                    # The remaining steps depend on a step that failed
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        self.results[step.name] = future.result()
+                    except Exception as e:
+                        error = error or e
+
+        self.total = time.perf_counter() - started
+        if error:
+            raise error
+        return self.results
+
+    def _run_step(self, step):
+        started = time.perf_counter()
+        try:
+            return step.func(*step.args)
+        finally:
+            self.timings[step.name] = time.perf_counter() - started
+
+    def describe(self):
+        """Describe how long every step and the whole plan took."""
+        timings = [f"{name} {seconds:.1f}s" for name, seconds in self.timings.items()]
+        return f"Execution timings: {', '.join(timings)}, total {self.total:.1f}s."
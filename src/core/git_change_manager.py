@@ -1,22 +1,34 @@
-import json
 import os
+import re
 import sys
 
-import pyperclip
 from git import Repo, InvalidGitRepositoryError
-from src.service.bitbucket_service import BitbucketService
+from src.core.diff_dedup import collapse_repeated_hunks
+from src.core.diff_packer import estimate_tokens, get_diff_byte_budget, get_max_prompt_tokens, pack_diff
+from src.core.execution_plan import ExecutionPlan
+from src.core.map_reduce import FileSummarizer, format_summaries, get_map_reduce_tokens, split_by_file
+from src.core.model_router import choose_route, count_changed_files, record_route
+from src.core.run_context import RunContext
 from src.service.git_service import GitService
-from src.service.github_service import GitHubService
-from src.service.openai_service import OpenAiService
+from src.service.llm_config import LlmConfig
 from src.service.terminal_service import TerminalService
 from src.service.vcs_service import VcsService
 from src.utils.ansi import color_text
 from src.utils.browser import open_in_default_browser
 from src.utils.file_utils import get_resource_path
+from src.utils.ignore_rules import build_pathspecs, load_ignore_patterns
+from src.utils.json_repair import parse_json_response
+from src.utils.prefetch import Prefetch, hold_background_output
+
+LAST_PROMPT_FILE = os.path.join("agt", "last-prompt.txt")
+
+# Guidance for the reader of a template, such as the placeholders of the PR body sections
+HTML_COMMENT = re.compile(r"[ \t]*<!--.*?-->", re.DOTALL)
 
 
 def validate_env_vars():
-    if not os.getenv("OPENAI_API_KEY"):
+    # A key is only required by OpenAI, not by a local OpenAI-compatible server
+    if not os.getenv("OPENAI_API_KEY") and not os.getenv("AGT_LLM_BASE_URL"):
         print("Error: OPENAI_API_KEY environment variable is not set.")
         sys.exit(1)
     if not os.getenv("GITHUB_TOKEN"):
@@ -24,15 +36,26 @@ def validate_env_vars():
         sys.exit(1)
 
 
-def get_prompt_file():
-    """Get the path to the prompt file."""
-    path = get_resource_path("resources/prompts/git-change-manager.txt")
+def get_prompt_file(name="git-change-manager.txt"):
+    """Get the path to a prompt file."""
+    path = get_resource_path(f"resources/prompts/{name}")
     if not os.path.isfile(path):
         print(f"Prompt file not found at {path}")
         sys.exit(1)
     return path
 
 
+def read_prompt_template(name="git-change-manager.txt"):
+    """
+    Read a prompt template, without its HTML comments.
+
+    The template is sent unchanged as the system message of every request, so that the provider can reuse its cache
+    of the prompt prefix, while the comments would only cost tokens.
+    """
+    with open(get_prompt_file(name), "r") as file:
+        return HTML_COMMENT.sub("", file.read())
+
+
 # Define colors for different sections
 def print_colored_summary(branch_name, commit_message, pr_title, pr_body):
     """Print all the collected information with colors."""
@@ -43,62 +66,109 @@ def print_colored_summary(branch_name, commit_message, pr_title, pr_body):
     print(f"PR Body:\n{color_text(pr_body, '33')}\n")
 
 
-def get_service_provider() -> VcsService:
+def get_run_context(path=None) -> RunContext:
     """
-    Determine the service provider for the given Git repository.
+    Open the Git repository in the current directory and create the context shared by the whole run.
 
-    :return: The service provider (e.g., "GitHub", "GitLab", "Bitbucket", or None if unknown).
+    :param path: Limit the changes to this path, the whole repository is used when not given.
+    :return: The run context for the repository.
     """
     try:
         # Initialize the repository object for the given path
         repo = Repo(os.getcwd())
-
-        # Ensure the repo is valid
-        if repo.bare:
-            print("Error: The directory is a bare Git repository.")
-            sys.exit(0)
-
-        # Get the remote URL (assuming 'origin' exists)
-        remote_url = next(repo.remote().urls, None)
-
-        if not remote_url:
-            print("Error: No remote URL found for the repository.")
-            sys.exit(0)
-
-        if "github.com" in remote_url:
-            return GitHubService()
-        elif "gitlab.com" in remote_url:
-            print(f"Unsupported service provider: {remote_url}")
-            sys.exit(0)
-        elif "bitbucket.org" in remote_url:
-            return BitbucketService()
-        else:
-            print(f"Unsupported service provider: {remote_url}")
-            sys.exit(0)
-
     except InvalidGitRepositoryError:
         print("Error: The current directory is not a Git repository.")
         sys.exit(0)
 
+    # Ensure the repo is valid
+    if repo.bare:
+        print("Error: The directory is a bare Git repository.")
+        sys.exit(0)
 
-def main():
-    validate_env_vars()
-    # Read prompt template
+    if path and not os.path.exists(path):
+        print(f"Error: The path '{path}' does not exist.")
+        sys.exit(1)
 
-    with open(get_prompt_file(), "r") as file:
-        prompt_text = file.read()
+    # git runs from the top of the repository and reports paths relative to it, the scope must be too
+    scope = os.path.relpath(path, repo.working_tree_dir) if path else None
+    pathspecs = build_pathspecs(scope, load_ignore_patterns(repo.working_tree_dir))
+    return RunContext(GitService(repo, pathspecs))
 
-    service = get_service_provider()
-    git = GitService()
-    terminal = TerminalService()
 
-    # Get Git information
-    change_description = input("Enter a description of the change: ").strip()
-    git_diff, untracked_content = git.get_diff()
+def get_service_provider(context: RunContext) -> VcsService:
+    """
+    Determine the service provider for the given Git repository.
+
+    :param context: The run context of the repository.
+    :return: The service provider (e.g., "GitHub", "GitLab", "Bitbucket", or None if unknown).
+    """
+    # Get the remote URL (assuming 'origin' exists)
+    remote_url = context.remote_url
+
+    if not remote_url:
+        print("Error: No remote URL found for the repository.")
+        sys.exit(0)
+
+    # Provider SDKs are imported only for the service that is actually used
+    if "github.com" in remote_url:
+        from src.service.github_service import GitHubService
+
+        return GitHubService(context)
+    elif "gitlab.com" in remote_url:
+        print(f"Unsupported service provider: {remote_url}")
+        sys.exit(0)
+    elif "bitbucket.org" in remote_url:
+        from src.service.bitbucket_service import BitbucketService
+
+        return BitbucketService(context)
+    else:
+        print(f"Unsupported service provider: {remote_url}")
+        sys.exit(0)
+
+
+def collect_changes(context, parent_branch, map_reduce=False):
+    """
+    Collect the changes of the repository.
+
+    Nothing here depends on the description of the change, so the changes are collected while the user types it.
 
-    # Combine prompt
-    prompt_combined = f"""{prompt_text}
-Description of the change:
+    :param context: The run context of the repository.
+    :param parent_branch: The parent branch, or a function returning it.
+    :param map_reduce: Prepare the changes of each file to be summarized on its own.
+    :return: A tuple with the diff, the content of the untracked files and, when the files are to be summarized, the
+        changes of each file.
+    """
+    git = context.git
+    map_reduce_tokens = get_map_reduce_tokens()
+    # Git is stopped once more diff was read than could ever be sent, unless the files may be summarized on their own
+    read_everything = map_reduce or map_reduce_tokens is not None
+    git.diff_byte_budget = None if read_everything else get_diff_byte_budget(get_max_prompt_tokens())
+    git_diff, untracked_content = git.get_diff(parent_branch)
+    git_diff = collapse_repeated_hunks(git_diff)
+
+    if not map_reduce and map_reduce_tokens is not None:
+        diff_tokens = estimate_tokens(git_diff) + estimate_tokens(untracked_content)
+        map_reduce = diff_tokens > map_reduce_tokens
+    changes = split_by_file(git_diff, untracked_content) if map_reduce else None
+    return git_diff, untracked_content, changes
+
+
+def build_prompt(prompt_text, change_description, git_diff, untracked_content):
+    """
+    Build the prompt that describes the changes, sent after the template.
+
+    :param prompt_text: The prompt template.
+    :param change_description: The description of the change given by the user.
+    :param git_diff: The diff of the changes.
+    :param untracked_content: The content of the untracked files.
+    :return: The prompt.
+    """
+    # Keep the prompt within the token budget, the template and the description are always sent in full
+    git_diff, untracked_content = pack_diff(
+        git_diff, untracked_content, get_diff_budget(get_max_prompt_tokens(), prompt_text, change_description)
+    )
+
+    prompt = f"""Description of the change:
 {change_description}
 
 Git diff for my changes:
@@ -107,36 +177,176 @@ Git diff for my changes:
 Content of untracked files:
 {untracked_content}
 """
-    choices = {"1": "Copy prompt to clipboard", "2": "Call OpenAI"}
+    return prompt
+
+
+def get_diff_budget(max_prompt_tokens, prompt_text, change_description):
+    """Get the number of tokens left for the changes once the template and the description are in the prompt."""
+    return max(max_prompt_tokens - estimate_tokens(prompt_text) - estimate_tokens(change_description), 0)
+
+
+def build_map_reduce_prompt(llm, context, prompt_text, change_description, changes, use_cache=True):
+    """
+    Summarize the changes of every file with the model and build the prompt made of the summaries.
+
+    :param llm: The service completing the prompts.
+    :param context: The run context of the repository.
+    :param prompt_text: The prompt template.
+    :param change_description: The description of the change given by the user.
+    :param changes: The changes of each file, as returned by split_by_file.
+    :param use_cache: Reuse the summaries of the files that have not changed since an earlier run.
+    :return: The prompt, sent after the template.
+    """
+    instructions = read_prompt_template("file-summary.txt")
+
+    budget = get_diff_budget(get_max_prompt_tokens(), prompt_text, change_description)
+    blob_pairs = context.git.get_blob_pairs(context.parent_branch)
+    summarizer = FileSummarizer(llm, instructions, blob_pairs, budget, use_cache=use_cache)
+    try:
+        summaries = format_summaries(summarizer.summarize(changes))
+    except Exception as e:
+        print(f"OpenAI API error: {str(e)}")
+        sys.exit(1)
+
+    return f"""Description of the change:
+{change_description}
+
+Summary of the changes of each file:
+{summaries}"""
+
+
+def get_last_prompt_path(context):
+    return os.path.join(context.repo.git_dir, LAST_PROMPT_FILE)
+
+
+def save_last_prompt(context, prompt):
+    """Save the prompt sent to the model, so that a failed run can be resumed without rebuilding it."""
+    path = get_last_prompt_path(context)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(prompt)
+    except OSError as e:
+        print(f"Unable to save the prompt: {e}")
+
+
+def load_last_prompt(context):
+    """Load the prompt of the previous run, exiting when there is none."""
+    try:
+        with open(get_last_prompt_path(context), "r", encoding="utf-8") as file:
+            return file.read()
+    except OSError:
+        print("Error: There is no prompt to resume, run agt without --resume.")
+        sys.exit(1)
+
+
+def main(path=None, use_cache=True, map_reduce=False, resume=False):
+    validate_env_vars()
+    prompt_text = read_prompt_template()
+
+    context = get_run_context(path)
+    service = get_service_provider(context)
+    git = context.git
+    terminal = TerminalService()
+
+    # Everything but the model response is fetched in the background while the user types the description
+    prefetch = Prefetch()
+    prefetch.start("parent_branch", lambda: context.parent_branch)
+    prefetch.start("repo_name", lambda: context.repo_name)
+    prefetch.start("username", service.get_username)
+    if not resume:
+        prefetch.start("changes", collect_changes, context, lambda: prefetch.get("parent_branch"), map_reduce)
+
+    if resume:
+        change_description = None
+        prompt, changes = load_last_prompt(context), None
+    else:
+        # The messages of the background tasks are printed once the description is entered
+        with hold_background_output():
+            change_description = input("Enter a description of the change: ").strip()
+        git_diff, untracked_content, changes = prefetch.get("changes")
+        prompt = build_prompt(prompt_text, change_description, git_diff, untracked_content)
+
+    choices = {"1": "Copy prompt to clipboard", "2": f"Call {LlmConfig.from_env().label}"}
     choice = terminal.get_user_choice("How would you like to proceed?\n", choices)
+    llm = None
 
     if choice == "1":
-        pyperclip.copy(prompt_combined)
-        openai_response = json.loads(
-            terminal.get_direct_user_input(
-                "The prompt was copied to your clipboard, press any key to paste the response from your model in the editor.\n\n"
-            )
+        import pyperclip
+
+        save_last_prompt(context, prompt)
+        pyperclip.copy(f"{prompt_text}\n{prompt}")
+        pasted_response = terminal.get_direct_user_input(
+            "The prompt was copied to your clipboard, press any key to paste the response from your model in the editor.\n\n"
         )
+        try:
+            openai_response = parse_json_response(pasted_response)
+        except ValueError as e:
+            print(f"Error: The response is not a valid JSON object: {e}")
+            sys.exit(1)
     elif choice == "2":
-        openai_response = OpenAiService().call(prompt_combined)
+        from src.service.openai_service import OpenAiService
+
+        llm = OpenAiService(use_cache=use_cache)
+        if changes is not None:
+            prompt = build_map_reduce_prompt(
+                llm, context, prompt_text, change_description, changes, use_cache=use_cache
+            )
+        # A prompt made of summaries always describes a large change
+        changed_files = count_changed_files(prompt) if changes is None else None
+        route = choose_route(llm.config, estimate_tokens(prompt_text) + estimate_tokens(prompt), changed_files)
+        llm.model = route.model
+        print(route.describe())
+
+        # A failed request can be retried with 'agt --resume' without typing the description again
+        save_last_prompt(context, prompt)
+        # Each field is reviewed as soon as it is generated, while the rest of the response is still streaming
+        openai_response = llm.stream(
+            prompt, system=prompt_text, on_complete=lambda metrics: record_route(route, metrics)
+        )
     else:
         print("Invalid choice, exiting.")
         sys.exit(0)
 
     # Confirm or edit suggestions
     branch_name = terminal.get_user_input(
-        "Branch name", f"{service.get_username()}/{openai_response.get('branch_name')}"
+        "Branch name", f"{prefetch.get('username')}/{openai_response.get('branch_name')}"
     )
     commit_message = terminal.get_user_input("Commit message", openai_response.get("commit_message"))
     pr_title = terminal.get_user_input("PR title", openai_response.get("pr_title"))
     pr_body = terminal.get_user_input("PR body", openai_response.get("pr_body"))
 
     print_colored_summary(branch_name, commit_message, pr_title, pr_body)
+    if llm and llm.describe_metrics():
+        print(llm.describe_metrics())
 
     # Execute commands
+    prefetch.wait()
     print("Executing commands...")
-    # Get the current branch
-    git.sync_branch_and_commit(branch_name, commit_message)
-    pr_url = service.create_pull_request(branch_name, pr_title, pr_body)
-
-    open_in_default_browser(pr_url)
+    # The pull request lookup runs while the changes are committed and pushed, once, at the end of the git steps
+    plan = ExecutionPlan()
+    plan.add("commit", git.commit_changes, branch_name, commit_message, context.active_branch, context.is_dirty)
+    plan.add("prepare pull request", service.prepare_pull_request, branch_name)
+    plan.add("push", lambda: plan.result("commit") and git.push_branch(branch_name), depends_on=["commit"])
+    plan.add(
+        "pull request",
+        service.create_pull_request,
+        branch_name,
+        pr_title,
+        pr_body,
+        depends_on=["push", "prepare pull request"],
+    )
+    plan.add("assign", service.assign_pull_request, depends_on=["pull request"])
+    plan.add(
+        "browser",
+        lambda: plan.result("pull request") and open_in_default_browser(plan.result("pull request")),
+        depends_on=["pull request"],
+    )
+    try:
+        plan.run()
+    except Exception as e:
+        # The steps depending on the one that failed were not run
+        print(f"An error occurred while executing the commands: {e}")
+        sys.exit(1)
+    print("Git operations completed successfully.")
+    print(plan.describe())
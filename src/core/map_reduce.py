@@ -0,0 +1,212 @@
+import asyncio
+import os
+import re
+
+from src.core.diff_model import parse_diff, parse_untracked
+from src.core.diff_packer import estimate_tokens, pack_diff
+from src.service.git_service import NULL_SHA
+from src.utils.disk_cache import DiskCache, get_cache_dir, make_cache_key
+from src.utils.env import get_int_env
+from src.utils.retry import get_retry_delay
+
+
+def get_map_reduce_tokens():
+    """
+    Get the estimated diff size above which each file is summarized on its own.
+
+    :return: The value of AGT_MAP_REDUCE_TOKENS, or None when it is not set or invalid.
+    """
+    return get_int_env("AGT_MAP_REDUCE_TOKENS", None)
+
+
+def split_by_file(diff, untracked_content):
+    """
+    Split the diff and the untracked file contents into the changes of each file.
+
+    A file can appear in several parts of the diff, for example when it has both staged and unstaged changes, its
+    parts are kept together.
+
+    :return: A dictionary mapping paths to (diff, untracked content) tuples, in the order of the diff.
+    """
+    changes = {}
+    for file in parse_diff(diff)[1]:
+        file_diff, file_untracked = changes.get(file.path, ("", ""))
+        changes[file.path] = (file_diff + file.text, file_untracked)
+    for file in parse_untracked(untracked_content)[1]:
+        file_diff, file_untracked = changes.get(file.path, ("", ""))
+        changes[file.path] = (file_diff, file_untracked + file.text)
+    return changes
+
+
+# The line introducing the summary of a file in the summary of several files
+_FILE_HEADER = re.compile(r"^--- (.+?) ---$", re.MULTILINE)
+
+
+def split_summary(paths, summary):
+    """
+    Split the summary of a chunk into the summaries of its files, from the header line the model puts before each.
+
+    :param paths: The paths of the files of the chunk.
+    :param summary: The summary of the chunk.
+    :return: A list of (paths, summary) tuples, a single one for the whole chunk when the files cannot be told apart.
+    """
+    if len(paths) == 1:
+        return [(paths, summary)]
+
+    headers = list(_FILE_HEADER.finditer(summary))
+    if sorted(header.group(1).strip() for header in headers) != sorted(paths):
+        return [(paths, summary)]
+
+    sections = {}
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(summary)
+        sections[header.group(1).strip()] = summary[header.end() : end].strip()
+    return [([path], sections[path]) for path in paths]
+
+
+def group_by_directory(changes, chunk_tokens):
+    """
+    Group the changes of small files of the same directory, so that they are summarized in a single request.
+
+    :param changes: The changes of each file, as returned by split_by_file.
+    :param chunk_tokens: The maximum number of tokens of a group of several files.
+    :return: A list of chunks, each one being the list of the paths it covers.
+    """
+    chunks = []
+    chunk_directory = None
+    chunk_size = 0
+    for path, (file_diff, file_untracked) in changes.items():
+        directory = os.path.dirname(path)
+        size = estimate_tokens(file_diff) + estimate_tokens(file_untracked)
+        if chunks and directory == chunk_directory and chunk_size + size <= chunk_tokens:
+            chunks[-1].append(path)
+            chunk_size += size
+        else:
+            chunks.append([path])
+            chunk_directory = directory
+            chunk_size = size
+    return chunks
+
+
+class FileSummarizer:
+    """
+    Summarize the changes of the files with the model, concurrently and reusing the summaries of earlier runs.
+
+    A summary is cached for each file under the blob shas it has at the fork point and in the working tree, so on a
+    long lived branch only the files changed since the previous run are sent to the model again. Only those files are
+    grouped into chunks, so a changed file does not make the files grouped with it earlier be summarized again.
+    """
+
+    # Number of summaries requested at the same time
+    max_concurrency = 4
+
+    # Maximum number of tokens of a chunk grouping the small files of a directory
+    chunk_tokens = 2000
+
+    # Attempts made for a summary when the request fails with a transient error
+    max_attempts = 4
+
+    def __init__(self, llm, instructions, blob_pairs, budget, use_cache=True):
+        """
+        :param llm: The service completing the prompts.
+        :param instructions: The system message sent before the changes of every chunk.
+        :param blob_pairs: The (base sha, new sha) tuples of the changed files, by path.
+        :param budget: The maximum number of tokens of the changes of a single chunk.
+        :param use_cache: Reuse the summaries of earlier runs.
+        """
+        self.llm = llm
+        self.instructions = instructions
+        self.blob_pairs = blob_pairs
+        self.budget = budget
+        self.cache = DiskCache(get_cache_dir("summaries"), max_entries=5000) if use_cache else None
+        self._resume_at = 0
+
+    def summarize(self, changes):
+        """
+        Summarize the changes of every file, the files of a directory that are not cached being grouped while they
+        are small.
+
+        :param changes: The changes of each file, as returned by split_by_file.
+        :return: A list of (label, summary) tuples, in the order of the changes.
+        """
+        cached = {}
+        for path in changes:
+            cache_key = self._cache_key(path)
+            summary = self.cache.get(cache_key) if cache_key else None
+            if summary is not None:
+                cached[path] = summary
+
+        uncached = {path: change for path, change in changes.items() if path not in cached}
+        chunks = group_by_directory(uncached, min(self.chunk_tokens, self.budget))
+        results = asyncio.run(self._summarize_chunks(chunks, uncached))
+        by_first_path = {paths[0]: result for paths, result in zip(chunks, results)}
+
+        summaries = []
+        for path in changes:
+            if path in cached:
+                summaries.append((path, cached[path]))
+            for paths, summary in by_first_path.get(path, []):
+                summaries.append((", ".join(paths), summary))
+
+        print(f"Summarized {len(changes)} file(s), {len(cached)} from the cache, in {len(chunks)} request(s).")
+        return summaries
+
+    async def _summarize_chunks(self, chunks, changes):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize_chunk(paths):
+            async with semaphore:
+                return await self.summarize_chunk(paths, changes)
+
+        return await asyncio.gather(*(summarize_chunk(paths) for paths in chunks))
+
+    async def summarize_chunk(self, paths, changes):
+        """
+        Summarize the changes of a chunk of files, caching the summary of every file it can be split into.
+
+        :return: A list of (paths, summary) tuples, one for each file or a single one for the whole chunk.
+        """
+        chunk_diff = "".join(changes[path][0] for path in paths)
+        chunk_untracked = "".join(changes[path][1] for path in paths)
+        chunk_diff, chunk_untracked = pack_diff(chunk_diff, chunk_untracked, self.budget)
+        summary = (await self._complete(f"{chunk_diff}{chunk_untracked}")).strip()
+
+        summaries = split_summary(paths, summary)
+        for summary_paths, file_summary in summaries:
+            cache_key = self._cache_key(summary_paths[0]) if len(summary_paths) == 1 else None
+            if cache_key:
+                self.cache.set(cache_key, file_summary)
+        return summaries
+
+    async def _complete(self, prompt):
+        """
+        Complete a prompt, waiting and trying again when the request fails with a transient error.
+
+        Once a request is rate limited or fails every pending request waits for the same delay, instead of each of
+        them being rejected in turn.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_attempts):
+            delay = self._resume_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self.llm.complete_async(prompt, system=self.instructions)
+            except Exception as e:
+                if not self.llm.is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                self._resume_at = max(self._resume_at, loop.time() + get_retry_delay(e, attempt))
+
+    def _cache_key(self, path):
+        """Build the key of the summary of a file, or None when its change cannot be identified by its blobs."""
+        if not self.cache:
+            return None
+        base_sha, new_sha = self.blob_pairs.get(path, (NULL_SHA, NULL_SHA))
+        if base_sha == new_sha:
+            return None
+        return make_cache_key(self.llm.model, self.instructions, base_sha, new_sha)
+
+
+def format_summaries(summaries):
+    """Render the summaries of the files as the section of the prompt that replaces the diff."""
+    return "".join(f"--- {label} ---\n{summary}\n\n" for label, summary in summaries)
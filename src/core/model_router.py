@@ -0,0 +1,93 @@
+import json
+import os
+import time
+
+from src.core.diff_model import parse_diff, parse_untracked
+from src.utils.disk_cache import get_cache_dir
+from src.utils.env import get_int_env
+
+DEFAULT_SMALL_MODEL_MAX_TOKENS = 8000
+DEFAULT_SMALL_MODEL_MAX_FILES = 10
+
+ROUTE_LOG_FILE = "routes.jsonl"
+
+
+class Route:
+    """The model picked for a prompt, along with the measures the choice was based on."""
+
+    def __init__(self, name, model, prompt_tokens, changed_files, reason):
+        self.name = name
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.changed_files = changed_files
+        self.reason = reason
+
+    def describe(self):
+        return f"Using {self.model} ({self.name} route): {self.reason}."
+
+
+def get_threshold(name, default):
+    """
+    Read a routing threshold from the environment.
+
+    :return: The value of the variable, or the default when it is not set or invalid.
+    """
+    return get_int_env(name, default)
+
+
+def count_changed_files(prompt):
+    """Count the files whose diff or content is in a prompt."""
+    paths = {file.path for file in parse_diff(prompt)[1]}
+    paths.update(file.path for file in parse_untracked(prompt)[1])
+    return len(paths)
+
+
+def choose_route(config, prompt_tokens, changed_files):
+    """
+    Pick the model for a prompt from its size and the number of files it changes.
+
+    Small changes go to the small model, which answers faster and costs less, when one is configured. Anything
+    above AGT_SMALL_MODEL_MAX_TOKENS estimated tokens or AGT_SMALL_MODEL_MAX_FILES changed files goes to the
+    configured model.
+
+    :param config: The LLM configuration.
+    :param prompt_tokens: The estimated number of tokens of the prompt.
+    :param changed_files: The number of changed files, None when the prompt is made of summaries.
+    :return: The route.
+    """
+    measures = f"{prompt_tokens} tokens, {'summarized' if changed_files is None else changed_files} file(s)"
+    if not config.small_model or config.small_model == config.model:
+        return Route("default", config.model, prompt_tokens, changed_files, f"no small model, {measures}")
+
+    max_tokens = get_threshold("AGT_SMALL_MODEL_MAX_TOKENS", DEFAULT_SMALL_MODEL_MAX_TOKENS)
+    max_files = get_threshold("AGT_SMALL_MODEL_MAX_FILES", DEFAULT_SMALL_MODEL_MAX_FILES)
+    if changed_files is not None and prompt_tokens <= max_tokens and changed_files <= max_files:
+        return Route("small", config.small_model, prompt_tokens, changed_files, f"small change, {measures}")
+    return Route("large", config.model, prompt_tokens, changed_files, f"large change, {measures}")
+
+
+def record_route(route, metrics):
+    """
+    Append the route of a request and the latency it got to the route log, to tune the thresholds from data.
+
+    :param route: The route of the request.
+    :param metrics: The timings of the response, as recorded by the LLM service.
+    """
+    entry = {
+        "time": int(time.time()),
+        "route": route.name,
+        "model": route.model,
+        "prompt_tokens": route.prompt_tokens,
+        "changed_files": route.changed_files,
+        "first_token": metrics.get("first_token"),
+        "total": metrics.get("total"),
+        "attempts": metrics.get("attempts"),
+        "cached_tokens": metrics.get("cached_tokens"),
+    }
+    path = os.path.join(get_cache_dir("metrics"), ROUTE_LOG_FILE)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as log_file:
+            log_file.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"Unable to record the route: {e}")
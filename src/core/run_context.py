@@ -0,0 +1,50 @@
+from functools import cached_property
+
+from src.service.git_service import GitService
+
+
+class RunContext:
+    """
+    Repository information shared by every step of a single agt run.
+
+    Each value is resolved on first access and memoized, so the services that need it do not query git again.
+    """
+
+    git: GitService
+
+    def __init__(self, git: GitService):
+        self.git = git
+
+    @property
+    def repo(self):
+        return self.git.repo
+
+    @cached_property
+    def remote_url(self):
+        """The URL of the 'origin' remote, or None if it has no URL."""
+        return next(self.repo.remote().urls, None)
+
+    @cached_property
+    def repo_name(self):
+        """The repository name in the format 'username/repo'."""
+        return self.git.get_repo_name(self.remote_url)
+
+    @cached_property
+    def parent_branch(self):
+        """The branch from which the current branch originated."""
+        return self.git.find_parent_branch()
+
+    @cached_property
+    def active_branch(self):
+        """The name of the checked out branch when the run started."""
+        return self.repo.active_branch.name
+
+    @property
+    def status(self):
+        """The status of the working tree when the run started."""
+        return self.git.get_status()
+
+    @property
+    def is_dirty(self):
+        """Whether the working tree had staged, unstaged or untracked changes when the run started."""
+        return self.status.is_dirty
@@ -2,8 +2,6 @@ import argparse
 import subprocess
 import sys
 
-from src.core import git_change_manager
-
 
 def display_help():
     """
@@ -20,9 +18,18 @@ def display_help():
 
     Options:
       -h, --help      Show this help message and exit.
+      --path <path>   Only consider the changes under the given path.
+      --no-cache      Always call the model, even for a prompt that was already answered.
+      --map-reduce    Summarize each changed file on its own, then build the suggestions from the summaries.
+      --resume        Send the prompt of the previous run again, without describing the change or reading the diff.
+
+    Ignore rules:
+      Lockfiles and minified files are left out by default. Add gitignore-style patterns to a
+      .agtignore file in the repository root to leave out more, or '!<pattern>' to keep a default.
 
     Examples:
-      agt      Automatically create a GitHub pull request using code changes.
+      agt                        Automatically create a GitHub pull request using code changes.
+      agt --path services/api    Only describe the changes under services/api.
     """
     print(help_text)
 
@@ -36,6 +43,22 @@ def main():
     )
 
     parser.add_argument("-h", "--help", action="store_true", help="Show this help message and exit.")
+    parser.add_argument("--path", help="Only consider the changes under the given path.")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always call the model, even for a prompt that was already answered."
+    )
+
+    parser.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="Summarize each changed file on its own, then build the suggestions from the summaries.",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Send the prompt of the previous run again, without describing the change or reading the diff.",
+    )
 
     args = parser.parse_args()
 
@@ -43,8 +66,13 @@ def main():
         display_help()
         sys.exit(0)
 
+    # Imported after argument parsing so that --help does not pay for loading git and the provider SDKs
+    from src.core import git_change_manager
+
     try:
-        git_change_manager.main()
+        git_change_manager.main(
+            path=args.path, use_cache=not args.no_cache, map_reduce=args.map_reduce, resume=args.resume
+        )
     except subprocess.CalledProcessError as e:
         print(f"Error executing GitHub PR workflow: {e}")
         sys.exit(1)
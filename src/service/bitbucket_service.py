@@ -2,17 +2,13 @@ import os
 import sys
 
 import requests
-from src.service.git_service import GitService
 from src.service.vcs_service import VcsService
 
 
 class BitbucketService(VcsService):
-    git: GitService
+    def __init__(self, context):
+        super().__init__(context)
 
-    def __init__(self):
-        super().__init__()
-
-        self.git = GitService()
         self.api_url = "https://api.bitbucket.org/2.0"
         self.username = os.getenv("BITBUCKET_USERNAME")
         self.password = os.getenv("BITBUCKET_APP_PASSWORD")
@@ -70,10 +66,9 @@ class BitbucketService(VcsService):
         :return: The URL of the created pull request.
         """
         try:
-            # Use GitService to get repo details
-            git = GitService()
-            repo_slug = git.get_repo_name()
-            base_branch = git.find_parent_branch()
+            # Use the run context to get repo details
+            repo_slug = self.context.repo_name
+            base_branch = self.context.parent_branch
 
             # Build the URL for the repository
             project_key, repo_name = repo_slug.split("/")
@@ -99,4 +94,7 @@ class BitbucketService(VcsService):
 
 
 if __name__ == "__main__":
-    print(BitbucketService().get_username())
+    from src.core.run_context import RunContext
+    from src.service.git_service import GitService
+
+    print(BitbucketService(RunContext(GitService())).get_username())
@@ -1,50 +1,241 @@
+import hashlib
+import json
 import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from git import Repo, GitCommandError
+from src.service.git_status import StatusSnapshot
+from src.utils.file_utils import BINARY_SNIFF_BYTES, is_binary, read_text_sample, write_file_atomic
+from src.utils.git_paths import diff_header_path
+from src.utils.ignore_rules import filter_by_pathspecs
+
+PARENT_BRANCH_CACHE_FILE = os.path.join("agt", "parent-branch.json")
+
+# The sha git reports for the missing side of an added or deleted file
+NULL_SHA = "0" * 40
 
 
 class GitService:
-    repo = Repo(os.getcwd())
+    # Byte budgets for the content of untracked files sent along with the diff
+    untracked_file_budget = 64 * 1024
+    untracked_total_budget = 512 * 1024
+
+    # Changed line counts above which a file gets a zero-context patch, or only a one-line summary
+    full_patch_max_lines = 1000
+    reduced_patch_max_lines = 5000
+
+    # Maximum number of diff bytes read from git in one get_diff call, None reads everything
+    diff_byte_budget = None
+
+    # Number of git commands and file reads run at the same time while collecting the changes
+    max_workers = 8
+
+    def __init__(self, repo=None, pathspecs=None):
+        self._repo = repo
+        self.pathspecs = pathspecs or []
+        self._diff_bytes_left = None
+        self._status = None
+
+    @property
+    def repo(self):
+        """The repository in the current directory, opened on first use."""
+        if self._repo is None:
+            self._repo = Repo(os.getcwd())
+        return self._repo
+
+    @repo.setter
+    def repo(self, repo):
+        self._repo = repo
+
+    def find_parent_branch(self, include_remotes=False, use_cache=True):
+        """
+        Find the branch from which the current branch originated.
 
-    def find_parent_branch(self):
-        """Find the branch from which the current branch originated."""
+        The ref tips are listed in a single ``for-each-ref`` pass and the fork point is found with one
+        ``rev-list --boundary`` traversal of the commits unique to HEAD, so the cost does not grow with the
+        number of branches in the repository. The result is cached under ``.git/`` until the current branch,
+        HEAD or any candidate ref changes.
 
-        # Get the current branch
+        :param include_remotes: Also consider ``origin/*`` remote-tracking branches as candidates.
+        :param use_cache: Reuse the result of a previous run when HEAD and the refs have not changed.
+        :return: The name of the parent branch, or None if it cannot be determined.
+        """
+        try:
+            cache_key = self._parent_branch_cache_key(include_remotes) if use_cache else None
+            if cache_key:
+                cached = self._read_parent_branch_cache(cache_key)
+                if cached is not None:
+                    return cached["parent_branch"]
+
+            parent_branch = self._detect_parent_branch(include_remotes)
+
+            if cache_key:
+                self._write_parent_branch_cache(cache_key, parent_branch)
+            return parent_branch
+        except GitCommandError as e:
+            print(f"Error finding parent branch: {e}")
+            return None
+
+    def _detect_parent_branch(self, include_remotes):
+        """Walk the refs and the commit graph to find the parent branch, bypassing the cache."""
         current_branch = self.repo.active_branch.name
 
-        # Get all branches except the current one
-        branches = [head.name for head in self.repo.heads if head.name != current_branch]
+        tips = self._list_ref_tips(current_branch, include_remotes)
+        if not tips:
+            return None
 
-        # Find the closest merge base for each branch
-        parent_branch = None
-        closest_base = None
-        for branch in branches:
-            try:
-                # Compute the merge base between the current branch and another branch
-                merge_base = self.repo.git.merge_base(current_branch, branch).strip()
-                if merge_base:
-                    # Check if this merge base is closer than the previous closest
-                    if (
-                        not closest_base
-                        or self.repo.commit(merge_base).committed_date > self.repo.commit(closest_base).committed_date
-                    ):
-                        closest_base = merge_base
-                        parent_branch = branch
-            except Exception as e:
-                print(f"Error checking branch {branch}: {e}")
-
-        return parent_branch
-
-    def get_repo_name(self):
+        fork_point = self._find_fork_point(current_branch, include_remotes)
+        if not fork_point:
+            return None
+
+        candidates = [ref for ref in self._list_refs_containing(fork_point, include_remotes) if ref in tips]
+        if not candidates:
+            return None
+
+        # Prefer a branch whose tip is exactly the fork point, then local branches over remote ones
+        for ref in candidates:
+            if tips[ref] == fork_point:
+                return ref
+        return candidates[0]
+
+    def _parent_branch_cache_key(self, include_remotes):
+        """
+        Build the key that identifies a cached parent branch result.
+
+        The refs are fingerprinted from file metadata only, git rewrites a ref file through a lock file rename
+        on every update so the inode and modification time change with its content.
+
+        :return: A dictionary with the current branch, the HEAD sha and a fingerprint of the refs.
+        """
+        refs = ["packed-refs", os.path.join("refs", "heads")]
+        if include_remotes:
+            refs.append(os.path.join("refs", "remotes", "origin"))
+
+        fingerprint = hashlib.sha1()
+        for ref in refs:
+            for path in self._walk_files(os.path.join(self.repo.common_dir, ref)):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                fingerprint.update(f"{path}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}\n".encode("utf-8"))
+
+        return {
+            "branch": self.repo.active_branch.name,
+            "head": self.repo.head.commit.hexsha,
+            "refs": fingerprint.hexdigest(),
+            "include_remotes": include_remotes,
+        }
+
+    @staticmethod
+    def _walk_files(path):
+        """Yield the given path, or every file below it when it is a directory, in a stable order."""
+        if not os.path.isdir(path):
+            yield path
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+    def _parent_branch_cache_path(self):
+        return os.path.join(self.repo.git_dir, PARENT_BRANCH_CACHE_FILE)
+
+    def _read_parent_branch_cache(self, cache_key):
+        """
+        Read the cached parent branch entry.
+
+        :return: The cached entry if it matches the given key, otherwise None.
+        """
+        try:
+            with open(self._parent_branch_cache_path(), "r", encoding="utf-8") as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("key") != cache_key:
+            return None
+        return entry
+
+    def _write_parent_branch_cache(self, cache_key, parent_branch):
+        """Store the parent branch for the given key, replacing any previous entry."""
+        entry = json.dumps({"key": cache_key, "parent_branch": parent_branch})
+        write_file_atomic(self._parent_branch_cache_path(), entry, "cache the parent branch")
+
+    @staticmethod
+    def _ref_patterns(include_remotes):
+        """Return the ref namespaces that can contain a parent branch."""
+        patterns = ["refs/heads/"]
+        if include_remotes:
+            patterns.append("refs/remotes/origin/")
+        return patterns
+
+    def _list_ref_tips(self, current_branch, include_remotes):
+        """
+        List the tip of every candidate branch in a single ``for-each-ref`` call.
+
+        :return: A dictionary mapping short ref names to commit shas, in ``for-each-ref`` order.
+        """
+        output = self.repo.git.for_each_ref(
+            "--format=%(objectname) %(refname:short)", *self._ref_patterns(include_remotes)
+        )
+        excluded = {current_branch, f"origin/{current_branch}", "origin/HEAD", "origin"}
+
+        tips = {}
+        for line in output.splitlines():
+            sha, _, name = line.partition(" ")
+            if name and name not in excluded:
+                tips[name] = sha
+        return tips
+
+    def _find_fork_point(self, current_branch, include_remotes):
+        """
+        Find the most recent commit of HEAD's history that is shared with another branch.
+
+        :return: The sha of the fork point, or None if HEAD shares no history with other branches.
+        """
+        exclusions = [f"--exclude={current_branch}", "--branches"]
+        if include_remotes:
+            exclusions += [f"--exclude=origin/{current_branch}", "--exclude=origin/HEAD", "--remotes=origin"]
+
+        output = self.repo.git.rev_list("--boundary", "--timestamp", "HEAD", "--not", *exclusions)
+        lines = output.splitlines()
+
+        if not lines:
+            # HEAD is already reachable from another branch, so it is the fork point itself
+            return self.repo.head.commit.hexsha
+
+        fork_point = None
+        latest_timestamp = None
+        for line in lines:
+            timestamp, _, sha = line.partition(" ")
+            if not sha.startswith("-"):
+                continue
+            if latest_timestamp is None or int(timestamp) > latest_timestamp:
+                latest_timestamp = int(timestamp)
+                fork_point = sha[1:]
+        return fork_point
+
+    def _list_refs_containing(self, commit, include_remotes):
+        """List the short names of the candidate refs that contain the given commit."""
+        output = self.repo.git.for_each_ref(
+            f"--contains={commit}", "--format=%(refname:short)", *self._ref_patterns(include_remotes)
+        )
+        return output.splitlines()
+
+    def get_repo_name(self, remote_url=None):
         """
         Retrieve the repository name from the Git remote URL.
 
+        :param remote_url: The remote URL to parse, read from the 'origin' remote when not given.
         :return: The repository name in the format 'username/repo', or None if not found.
         """
         try:
 
             # Get the remote URL
-            remote_url = next(self.repo.remote().urls)
+            if remote_url is None:
+                remote_url = next(self.repo.remote().urls)
 
             # Extract the repository name from the URL
             if remote_url.startswith("https://") or remote_url.startswith("http://"):
@@ -61,33 +252,33 @@ class GitService:
             print(f"Error retrieving repository name: {e}")
             return None
 
-    def get_diff(self):
+    def get_diff(self, parent_branch=None):
         """
         Get staged, unstaged, and untracked changes using GitPython.
 
+        The git commands and the reads of the untracked files run concurrently in a pool of ``max_workers``
+        threads. Their results are put together in a fixed order, so the output and the parts cut by the diff
+        budget are the same as when everything runs in turn.
+
+        :param parent_branch: The branch the current branch originated from, or a function returning it, which is
+            then called while the other changes are read. 'main' is used when unknown.
         :return: A dictionary containing diffs and untracked file contents.
         """
         try:
-            unstaged = self.repo.git.diff()
-            staged = self.repo.git.diff(cached=True)
-
-            parent_branch = self.find_parent_branch()
+            self._diff_bytes_left = self.diff_byte_budget
 
-            if not parent_branch:
-                print("Unable to determine the parent branch. Defaulting to 'main'.")
-                parent_branch = "main"
+            # Scope and ignore rules are applied by git, excluded content is never produced
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                unstaged = executor.submit(self._fetch_diff, (), self.diff_byte_budget)
+                staged = executor.submit(self._fetch_diff, ("--cached",), self.diff_byte_budget)
+                branch = executor.submit(self._fetch_branch_diff, parent_branch)
 
-            branch = self.repo.git.diff(f"{parent_branch}...HEAD")
+                # Get untracked files and their content
+                untracked_content = self._collect_untracked_content(self._list_untracked_files(), executor)
 
-            # Get untracked files and their content
-            untracked_content = ""
-            for untracked_file in self.repo.untracked_files:
-                if os.path.isfile(untracked_file):
-                    try:
-                        with open(untracked_file, "r", encoding="utf-8") as file_content:
-                            untracked_content += f"\n\n--- Untracked file: {untracked_file} ---\n{file_content.read()}"
-                    except UnicodeDecodeError:
-                        print(f"Skipping binary or unreadable file: {untracked_file}")
+                unstaged = self._assemble_diff(unstaged.result())
+                staged = self._assemble_diff(staged.result())
+                branch = self._assemble_diff(branch.result())
 
             return f"{unstaged}\n{staged}\n{branch}", untracked_content
 
@@ -95,36 +286,410 @@ class GitService:
             print(f"Error retrieving Git diffs: {e}")
             return None
 
-    def sync_branch_and_commit(self, new_branch, commit_message):
+    def _fetch_branch_diff(self, parent_branch):
+        """Resolve the parent branch, when given as a function, and read the diff of the current branch from it."""
+        if callable(parent_branch):
+            parent_branch = parent_branch()
+        if not parent_branch:
+            print("Unable to determine the parent branch. Defaulting to 'main'.")
+            parent_branch = "main"
+
+        return self._fetch_diff((f"{parent_branch}...HEAD",), self.diff_byte_budget)
+
+    def get_status(self):
+        """
+        Get the status of the working tree, read from a single ``git status`` call on first use.
+
+        The untracked cache, and the file system monitor where git has a built-in one, are enabled for the call
+        unless the configuration of the repository sets them, so that later runs only rescan what changed.
+
+        :return: The status snapshot.
+        """
+        if self._status is None:
+            output = self.repo.git.status(
+                "--porcelain=v2", "-z", "--branch", "--untracked-files=all", env=self._status_config_env()
+            )
+            self._status = StatusSnapshot.parse(output)
+        return self._status
+
+    def _status_config_env(self):
+        """Build the environment passing the status performance settings the repository does not configure."""
+        reader = self.repo.config_reader()
+        configured = {name.lower() for name in reader.options("core")} if reader.has_section("core") else set()
+
+        # core.fsmonitor is left to the user, as it starts a daemon that outlives the run
+        settings = []
+        if "untrackedcache" not in configured:
+            settings.append(("core.untrackedCache", "true"))
+
+        return self._config_env(settings)
+
+    @staticmethod
+    def _config_env(settings):
+        """Build the environment passing configuration settings to a git command, as (key, value) tuples."""
+        # Settings already passed through the environment are kept
+        count = int(os.environ.get("GIT_CONFIG_COUNT", "0") or 0)
+        env = {"GIT_CONFIG_COUNT": str(count + len(settings))} if settings else {}
+        for index, (key, value) in enumerate(settings, start=count):
+            env[f"GIT_CONFIG_KEY_{index}"] = key
+            env[f"GIT_CONFIG_VALUE_{index}"] = value
+        return env
+
+    def get_blob_pairs(self, parent_branch=None):
+        """
+        Identify the net change of every changed file by its blob sha at the fork point and in the working tree.
+
+        The fork point blobs come from a single ``diff --raw`` against the merge base, and the working tree files
+        that git has not hashed yet are hashed in a single ``hash-object --stdin-paths`` call. Untracked files that
+        are binary or larger than ``untracked_file_budget`` are left out, their content is never sent as a whole.
+
+        :param parent_branch: The branch the current branch originated from, 'main' is used when unknown.
+        :return: A dictionary mapping paths to (base sha, new sha) tuples, NULL_SHA standing for a missing side.
+        """
         try:
+            merge_base = self.repo.git.merge_base(parent_branch or "main", "HEAD")
+            raw = self.repo.git.diff("--raw", "-z", "--no-renames", "--no-abbrev", merge_base, *self._pathspec_args())
+        except GitCommandError as e:
+            print(f"Error identifying the changed files: {e}")
+            return {}
 
-            current_branch = self.repo.active_branch.name
+        pairs = {}
+        fields = raw.split("\0")
+        for status, path in zip(fields[0::2], fields[1::2]):
+            _, _, base_sha, new_sha, change = status.split(" ", 4)
+            pairs[path] = (base_sha, new_sha if change != "D" else NULL_SHA)
 
-            # Check if the repository is in a clean state
-            if self.repo.is_dirty(untracked_files=True):
-                print("Repository has uncommitted changes.")
-
-            if current_branch == "main":
-                # Create a new branch from main
-                self.repo.git.checkout("-b", new_branch)
-                self.repo.git.push("-u", "origin", new_branch)
-            elif current_branch != new_branch:
-                # Rename the current branch
-                self.repo.git.branch("-m", new_branch)
-                self.repo.git.push("-u", "origin", new_branch)
-
-            if self.repo.is_dirty(untracked_files=True):
-                # Stage all changes and commit
-                self.repo.git.add(A=True)
-                if self.repo.index.diff("HEAD"):  # Only commit if there are staged changes
-                    self.repo.git.commit("-m", commit_message)
-                    self.repo.git.push()
-                    print("Changes committed successfully.")
-                else:
-                    print("No staged changes to commit.")
-            else:
-                print("No changes detected in the repository.")
+        unhashed = [path for path, (_, new_sha) in pairs.items() if new_sha == NULL_SHA and os.path.isfile(path)]
+        for path in self._list_untracked_files():
+            if self._is_small_text_file(path):
+                pairs[path] = (NULL_SHA, NULL_SHA)
+                unhashed.append(path)
 
-            print("Git operations completed successfully.")
+        # Paths are read one per line, the rare ones containing a newline stay unidentified
+        for path in [path for path in unhashed if "\n" in path]:
+            unhashed.remove(path)
+            del pairs[path]
+        if not unhashed:
+            return pairs
+
+        try:
+            shas = self._hash_files(unhashed)
         except GitCommandError as e:
-            print(f"An error occurred while executing Git commands: {e}")
+            print(f"Error hashing the changed files: {e}")
+            shas = []
+        for path, sha in zip(unhashed, shas):
+            pairs[path] = (pairs[path][0], sha)
+        for path in unhashed[len(shas) :]:
+            del pairs[path]
+        return pairs
+
+    def _is_small_text_file(self, path):
+        """Tell whether an untracked file is a text file whose whole content fits in the per-file budget."""
+        try:
+            if not os.path.isfile(path) or os.path.getsize(path) > self.untracked_file_budget:
+                return False
+            with open(path, "rb") as file:
+                return not is_binary(file.read(BINARY_SNIFF_BYTES))
+        except OSError:
+            return False
+
+    def _hash_files(self, paths):
+        """Hash working tree files, their paths being written to git rather than passed on the command line."""
+        process = self.repo.git.hash_object("--stdin-paths", istream=subprocess.PIPE, as_process=True)
+        output, _ = process.proc.communicate("".join(f"{path}\n" for path in paths).encode("utf-8"))
+        if process.proc.returncode:
+            raise GitCommandError(["git", "hash-object", "--stdin-paths"], process.proc.returncode)
+        return output.decode("ascii").split()
+
+    def _fetch_diff(self, args, max_bytes):
+        """
+        Run the numstat pre-pass of a git diff and read its patches, without touching the shared diff budget.
+
+        :param args: The arguments selecting what to compare.
+        :param max_bytes: The number of bytes after which the reading of a patch stops, None reads everything.
+        :return: The numstat entries, the skipped paths, their summaries and the chunks of every patch, or None
+            when nothing changed.
+        """
+        numstat = self.repo.git.diff("--numstat", "-z", *args, *self._pathspec_args())
+        if not numstat:
+            return None
+
+        entries = self._parse_numstat(numstat)
+        reduced = []
+        skipped = []
+        summaries = []
+        for added, deleted, paths in entries:
+            if added is None:
+                skipped.extend(paths)
+                summaries.append(f"diff --git a/{paths[0]} b/{paths[-1]}\nBinary files differ\n")
+            elif added + deleted > self.reduced_patch_max_lines:
+                skipped.extend(paths)
+                summaries.append(
+                    f"diff --git a/{paths[0]} b/{paths[-1]}\n"
+                    f"Patch omitted, {added} lines added and {deleted} lines removed\n"
+                )
+            elif added + deleted > self.full_patch_max_lines:
+                reduced.extend(paths)
+
+        if not reduced and not skipped:
+            patch_calls = [(*args, *self._pathspec_args())]
+        else:
+            # Only the few large files are listed, everything else is still selected by the regular pathspecs
+            excluded = [f":(exclude,literal){path}" for path in reduced + skipped]
+            patch_calls = [(*args, "--", *(self.pathspecs or ["."]), *excluded)]
+            if reduced:
+                patch_calls.append(("-U0", *args, "--", *[f":(literal){path}" for path in reduced]))
+
+        patches = [self._read_chunks(patch_args, max_bytes) for patch_args in patch_calls]
+        return entries, skipped, summaries, patches
+
+    def _assemble_diff(self, fetched):
+        """
+        Put a fetched diff together, spending the diff budget shared by the diffs of the run.
+
+        :param fetched: The diff, as returned by _fetch_diff.
+        :return: The diff.
+        """
+        if fetched is None:
+            return ""
+
+        entries, skipped, summaries, patches = fetched
+        parts = []
+        seen = set()
+        for chunks in patches:
+            parts.append(self._take_chunks(chunks, seen))
+
+        # Once the diff budget cut the diff, the files it did not reach are summarized from the pre-pass
+        summaries = list(summaries)
+        if self._diff_bytes_left == 0:
+            for added, deleted, paths in entries:
+                if added is not None and paths[-1] not in seen and paths[-1] not in skipped:
+                    summaries.append(
+                        f"diff --git a/{paths[0]} b/{paths[-1]}\n"
+                        f"Patch omitted, {added} lines added and {deleted} lines removed\n"
+                    )
+
+        parts.append("".join(summaries))
+        return "\n".join(part for part in parts if part)
+
+    def _read_chunks(self, args, max_bytes):
+        """
+        Read a git diff chunk by chunk until it ends or more than max_bytes were read.
+
+        :param args: The git diff arguments.
+        :param max_bytes: The number of bytes after which git is stopped, None reads everything.
+        :return: The chunks that were read.
+        """
+        if max_bytes == 0:
+            return []
+
+        chunks = []
+        size = 0
+        stream = self._stream_diff(*args)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    break
+        finally:
+            stream.close()
+        return chunks
+
+    def _take_chunks(self, chunks, seen):
+        """
+        Keep the chunks of a patch that fit in what is left of the diff budget.
+
+        :param chunks: The chunks of the patch.
+        :param seen: A set the paths of the files kept are added to.
+        :return: The part of the patch that was kept.
+        """
+        if self._diff_bytes_left == 0:
+            return ""
+
+        taken = []
+        for chunk in chunks:
+            if self._diff_bytes_left is not None:
+                if len(chunk) > self._diff_bytes_left:
+                    self._diff_bytes_left = 0
+                    taken.append("[Diff truncated to fit the prompt budget]\n")
+                    break
+                self._diff_bytes_left -= len(chunk)
+
+            if chunk.startswith("diff --git "):
+                seen.add(diff_header_path(chunk))
+            taken.append(chunk)
+        return "".join(taken)
+
+    def _stream_diff(self, *args):
+        """
+        Yield a git diff as it is produced, one file header or hunk at a time.
+
+        Closing the generator before the end stops the git process, so the rest of the diff is never produced.
+
+        :param args: The git diff arguments.
+        """
+        # Paths are printed as they are rather than octal-escaped, the prompt and the numstat paths using them as is
+        process = self.repo.git.diff(*args, as_process=True, env=self._config_env([("core.quotePath", "false")]))
+        completed = False
+        try:
+            chunk = []
+            for raw_line in process.proc.stdout:
+                line = raw_line.decode("utf-8", errors="replace")
+                if chunk and (line.startswith("diff --git ") or line.startswith("@@")):
+                    yield "".join(chunk)
+                    chunk = []
+                chunk.append(line)
+            if chunk:
+                yield "".join(chunk)
+            completed = True
+        finally:
+            if completed:
+                # Raises GitCommandError when git failed, like a regular call
+                process.wait()
+            else:
+                process.proc.kill()
+                process.proc.wait()
+
+    @staticmethod
+    def _parse_numstat(numstat):
+        """
+        Parse the output of ``git diff --numstat -z``.
+
+        :return: A list of (added, deleted, paths) tuples, the counts being None for binary files and the paths
+            holding the old and the new path of renamed files.
+        """
+        entries = []
+        fields = numstat.split("\0")
+        index = 0
+        while index < len(fields) and fields[index]:
+            added, deleted, path = fields[index].split("\t", 2)
+            index += 1
+            if path:
+                paths = [path]
+            else:
+                # Renames and copies are followed by the old and the new path as separate fields
+                paths = fields[index : index + 2]
+                index += 2
+
+            if added == "-":
+                entries.append((None, None, paths))
+            else:
+                entries.append((int(added), int(deleted), paths))
+        return entries
+
+    def _pathspec_args(self):
+        """Return the arguments that limit a git command to the pathspecs of the service, if any."""
+        return ["--", *self.pathspecs] if self.pathspecs else []
+
+    def _list_untracked_files(self):
+        """List the untracked files that are not ignored by git and match the pathspecs of the service."""
+        # Taken from the status snapshot, so the working tree is scanned once for every consumer of the run
+        return filter_by_pathspecs(self.get_status().untracked, self.pathspecs)
+
+    def _collect_untracked_content(self, untracked_files, executor=None):
+        """
+        Collect the content of untracked files within the per-file and total byte budgets.
+
+        Binary files are detected from their first bytes and skipped, large files are sampled from their head
+        and tail, and files beyond the total budget are only listed by name.
+
+        :param untracked_files: The paths of the untracked files.
+        :param executor: A pool the files are read in ahead of time, the budgets still being spent in order. Only
+            the files whose per-file budgets fit in what is left of the total budget are read ahead.
+        :return: The content of the untracked files.
+        """
+        reads = {}
+        ahead = 0
+        reserved = 0
+
+        parts = []
+        remaining = self.untracked_total_budget
+        for index, untracked_file in enumerate(untracked_files):
+            # The reads in flight never hold more than what is left of the total budget
+            ahead = max(ahead, index)
+            while executor and ahead < len(untracked_files) and reserved + self.untracked_file_budget <= remaining:
+                path = untracked_files[ahead]
+                reads[path] = executor.submit(read_text_sample, path, self.untracked_file_budget)
+                reserved += self.untracked_file_budget
+                ahead += 1
+            read = reads.pop(untracked_file, None)
+            if read is not None:
+                reserved -= self.untracked_file_budget
+
+            if not os.path.isfile(untracked_file):
+                continue
+            if remaining <= 0:
+                parts.append(f"\n\n--- Untracked file: {untracked_file} (omitted, content budget exhausted) ---")
+                continue
+
+            try:
+                budget = min(self.untracked_file_budget, remaining)
+                if read is not None and (
+                    budget == self.untracked_file_budget or os.path.getsize(untracked_file) <= budget
+                ):
+                    content = read.result()
+                else:
+                    content = read_text_sample(untracked_file, budget)
+            except OSError as e:
+                print(f"Skipping unreadable file {untracked_file}: {e}")
+                continue
+            if content is None:
+                print(f"Skipping binary file: {untracked_file}")
+                continue
+
+            parts.append(f"\n\n--- Untracked file: {untracked_file} ---\n{content}")
+            remaining -= len(content)
+
+        return "".join(parts)
+
+    def commit_changes(self, new_branch, commit_message, current_branch=None, is_dirty=None):
+        """
+        Move the changes to the given branch and commit them, without pushing.
+
+        :param new_branch: The branch to commit to.
+        :param commit_message: The commit message.
+        :param current_branch: The currently checked out branch, read from the repository when not given.
+        :param is_dirty: Whether the working tree has changes, checked in the repository when not given.
+        :return: Whether the branch has to be pushed, because it was created, renamed or got a new commit.
+        :raises ValueError: When the working tree has unresolved merge conflicts.
+        :raises GitCommandError: When a git command fails.
+        """
+        if current_branch is None:
+            current_branch = self.repo.active_branch.name
+
+        # Check if the repository is in a clean state, switching or renaming the branch keeps the changes
+        if is_dirty is None:
+            is_dirty = self.get_status().is_dirty
+        if is_dirty:
+            print("Repository has uncommitted changes.")
+            conflicts = self.get_status().conflicts
+            if conflicts:
+                raise ValueError(f"Resolve the merge conflicts in {', '.join(conflicts)} before committing.")
+
+        branch_changed = True
+        if current_branch == "main":
+            # Create a new branch from main
+            self.repo.git.checkout("-b", new_branch)
+        elif current_branch != new_branch:
+            # Rename the current branch
+            self.repo.git.branch("-m", new_branch)
+        else:
+            branch_changed = False
+
+        if not is_dirty:
+            print("No changes detected in the repository.")
+            return branch_changed
+
+        # Stage all changes and commit
+        self.repo.git.add(A=True)
+        if not self.repo.index.diff("HEAD"):  # Only commit if there are staged changes
+            print("No staged changes to commit.")
+            return branch_changed
+        self.repo.git.commit("-m", commit_message)
+        print("Changes committed successfully.")
+        return True
+
+    def push_branch(self, branch):
+        """Push a branch to origin in a single push, setting it as the upstream of the local branch."""
+        self.repo.git.push("-u", "origin", branch)
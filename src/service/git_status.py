@@ -0,0 +1,109 @@
+class StatusEntry:
+    """A path reported by ``git status``, with its index and working tree status letters."""
+
+    def __init__(self, kind, path, index_status=".", worktree_status=".", original_path=None):
+        """
+        :param kind: 'changed', 'renamed', 'unmerged', 'untracked' or 'ignored'.
+        :param path: The path, relative to the root of the repository.
+        :param index_status: The status of the path in the index, '.' when unchanged.
+        :param worktree_status: The status of the path in the working tree, '.' when unchanged.
+        :param original_path: The path the file was renamed or copied from.
+        """
+        self.kind = kind
+        self.path = path
+        self.index_status = index_status
+        self.worktree_status = worktree_status
+        self.original_path = original_path
+
+
+class StatusSnapshot:
+    """
+    The state of the working tree, read from a single ``git status --porcelain=v2 -z`` call.
+
+    Every step of a run reads the same snapshot, so the working tree is scanned once however many steps need to
+    know whether it is dirty or which files are untracked.
+    """
+
+    def __init__(self, entries, branch=None, head=None):
+        """
+        :param entries: The status entries.
+        :param branch: The checked out branch, None when HEAD is detached.
+        :param head: The sha of HEAD, None before the first commit.
+        """
+        self.entries = entries
+        self.branch = branch
+        self.head = head
+
+    @classmethod
+    def parse(cls, output):
+        """
+        Parse the output of ``git status --porcelain=v2 -z --branch`` in a single pass.
+
+        :param output: The output of the command.
+        :return: The snapshot.
+        """
+        entries = []
+        headers = {}
+        fields = output.split("\0")
+        index = 0
+        while index < len(fields):
+            record = fields[index]
+            index += 1
+            if not record:
+                continue
+
+            kind = record[0]
+            if kind == "#":
+                name, _, value = record[2:].partition(" ")
+                headers[name] = value
+            elif kind == "1":
+                status, path = record.split(" ", 8)[1::7]
+                entries.append(StatusEntry("changed", path, status[0], status[1]))
+            elif kind == "2":
+                # The original path of a rename or a copy follows as a separate field
+                status, path = record.split(" ", 9)[1::8]
+                entries.append(StatusEntry("renamed", path, status[0], status[1], fields[index]))
+                index += 1
+            elif kind == "u":
+                status, path = record.split(" ", 10)[1::9]
+                entries.append(StatusEntry("unmerged", path, status[0], status[1]))
+            elif kind == "?":
+                entries.append(StatusEntry("untracked", record[2:], "?", "?"))
+            elif kind == "!":
+                entries.append(StatusEntry("ignored", record[2:], "!", "!"))
+
+        branch = headers.get("branch.head")
+        head = headers.get("branch.oid")
+        return cls(
+            entries,
+            branch=None if branch == "(detached)" else branch,
+            head=None if head == "(initial)" else head,
+        )
+
+    @property
+    def untracked(self):
+        """The paths of the untracked files that are not ignored."""
+        return [entry.path for entry in self.entries if entry.kind == "untracked"]
+
+    @property
+    def renames(self):
+        """A dictionary mapping the new path of every renamed or copied file to its original path."""
+        return {entry.path: entry.original_path for entry in self.entries if entry.kind == "renamed"}
+
+    @property
+    def conflicts(self):
+        """The paths with unresolved merge conflicts."""
+        return [entry.path for entry in self.entries if entry.kind == "unmerged"]
+
+    @property
+    def has_staged_changes(self):
+        return any(entry.index_status not in ".?!" for entry in self.entries)
+
+    @property
+    def has_unstaged_changes(self):
+        return any(entry.worktree_status not in ".?!" for entry in self.entries)
+
+    @property
+    def is_dirty(self):
+        """Whether there are staged, unstaged or untracked changes."""
+        return any(entry.kind != "ignored" for entry in self.entries)
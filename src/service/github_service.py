@@ -2,16 +2,18 @@ import os
 import sys
 
 from github import Github
-from src.service.git_service import GitService
 from src.service.vcs_service import VcsService
 
 
 class GitHubService(VcsService):
     github: Github
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, context):
+        super().__init__(context)
         self.github = Github(os.getenv("GITHUB_TOKEN"))
+        self._login = None
+        self._prepared = None
+        self._created = None
 
     def validate_environment(self):
         """
@@ -29,11 +31,27 @@ class GitHubService(VcsService):
             print("Error: GITHUB_TOKEN environment variable is not set.")
             return None
 
-        # Get the authenticated user
-        user = self.github.get_user()
+        # Get the authenticated user, once per run since the pull request assignment needs it again
+        if self._login is None:
+            self._login = self.github.get_user().login
+        return self._login
 
-        # Return the username
-        return user.login
+    def prepare_pull_request(self, head_branch):
+        """Fetch the repository and look for an open pull request of the branch while the branch is pushed."""
+        try:
+            repo = self.github.get_repo(self.context.repo_name)
+            self._prepared = (head_branch, repo, self._find_open_pull_request(repo, head_branch))
+        except Exception:
+            # create_pull_request looks everything up again and reports the error
+            self._prepared = None
+
+    def _find_open_pull_request(self, repo, head_branch):
+        open_pulls = repo.get_pulls(
+            state="open", base=self.context.parent_branch, head=f"{repo.owner.login}:{head_branch}"
+        )
+        for pr in open_pulls:
+            return pr  # If there's an open PR, use it
+        return None
 
     def create_pull_request(self, head_branch, pr_title, pr_body):
         """
@@ -50,19 +68,14 @@ class GitHubService(VcsService):
             print("Error: GITHUB_TOKEN environment variable is not set.")
             return
 
-        git = GitService()
-
         try:
-            # Access the repository
-            repo = self.github.get_repo(git.get_repo_name())
-            base_branch = git.find_parent_branch()
-
-            # Check for an existing PR
-            pull_request = None
-            open_pulls = repo.get_pulls(state="open", base=base_branch, head=f"{repo.owner.login}:{head_branch}")
-            for pr in open_pulls:
-                pull_request = pr
-                break  # If there's an open PR, use it
+            if self._prepared and self._prepared[0] == head_branch:
+                _, repo, pull_request = self._prepared
+            else:
+                # Access the repository and check for an existing PR
+                repo = self.github.get_repo(self.context.repo_name)
+                pull_request = self._find_open_pull_request(repo, head_branch)
+            base_branch = self.context.parent_branch
 
             if pull_request:
                 print(f"Pull request already exists: {pull_request.html_url}")
@@ -77,9 +90,18 @@ class GitHubService(VcsService):
                     base=base_branch,  # The branch you want to merge into
                     head=head_branch,  # The branch you want to merge from
                 )
-                pull_request.add_to_assignees(self.github.get_user().login)
+                self._created = pull_request
                 print("Pull request created")
 
             return pull_request.html_url
         except Exception as e:
             print(f"Failed to create pull request: {e}")
+
+    def assign_pull_request(self):
+        """Assign the pull request created by this run to the authenticated user."""
+        if self._created is None:
+            return
+        try:
+            self._created.add_to_assignees(self.get_username())
+        except Exception as e:
+            print(f"Failed to assign the pull request: {e}")
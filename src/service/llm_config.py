@@ -0,0 +1,50 @@
+import os
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_SMALL_MODEL = "gpt-4o-mini"
+
+
+class LlmConfig:
+    """
+    The endpoint and the model used to generate the suggestions.
+
+    Any server implementing the OpenAI chat completions API can be used, such as a llama.cpp or vLLM server running
+    on the developer machine or inside the network, by setting its base URL.
+    """
+
+    def __init__(self, base_url=None, model=DEFAULT_MODEL, api_key=None, small_model=None):
+        self.base_url = base_url
+        self.model = model
+        self.api_key = api_key
+        self.small_model = small_model
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read the configuration from the environment.
+
+        AGT_LLM_BASE_URL selects an OpenAI-compatible server instead of OpenAI, AGT_LLM_MODEL the model, and
+        AGT_LLM_API_KEY the key sent to the server, OPENAI_API_KEY being used when it is not set.
+        AGT_LLM_SMALL_MODEL selects the model used for small changes, which defaults to gpt-4o-mini on OpenAI with
+        the default model and is not used otherwise.
+        """
+        base_url = os.getenv("AGT_LLM_BASE_URL") or None
+        model = os.getenv("AGT_LLM_MODEL") or DEFAULT_MODEL
+        default_small_model = DEFAULT_SMALL_MODEL if base_url is None and model == DEFAULT_MODEL else None
+        return cls(
+            base_url=base_url,
+            model=model,
+            api_key=os.getenv("AGT_LLM_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            small_model=os.getenv("AGT_LLM_SMALL_MODEL") or default_small_model,
+        )
+
+    @property
+    def is_openai(self):
+        return self.base_url is None
+
+    @property
+    def label(self):
+        """A short description of the backend for the user."""
+        if self.is_openai:
+            return "OpenAI"
+        return f"{self.model} at {self.base_url}"
@@ -1,32 +1,285 @@
-import json
+import itertools
 import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import openai
 
+from src.service.llm_config import LlmConfig
+from src.utils.disk_cache import DiskCache, get_cache_dir, make_cache_key
+from src.utils.json_repair import parse_json_response
+from src.utils.json_stream import JsonFieldExtractor
+from src.utils.latency_history import LatencyHistory
+from src.utils.pending_response import PendingResponse
+from src.utils.retry import RETRYABLE_STATUS_CODES, get_retry_delay
+
+# The fields of the response, in the order they are reviewed
+RESPONSE_FIELDS = ("branch_name", "commit_message", "pr_title", "pr_body")
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pull_request",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in RESPONSE_FIELDS},
+            "required": list(RESPONSE_FIELDS),
+            "additionalProperties": False,
+        },
+    },
+}
+
 
 class OpenAiService:
     client = None
+    async_client = None
 
-    def __init__(self):
-        if not os.getenv("OPENAI_API_KEY"):
+    # Seconds an attempt may wait to connect or for the next chunk of the response
+    request_timeout = 60
+    max_attempts = 4
+
+    def __init__(self, use_cache=True, hedge=None, config=None):
+        """
+        :param use_cache: Answer identical prompts from the response cache.
+        :param hedge: Hedge slow requests, read from AGT_HEDGE_REQUESTS when not given.
+        :param config: The endpoint and the model, read from the environment when not given.
+        """
+        self.config = config or LlmConfig.from_env()
+        if self.config.is_openai and not self.config.api_key:
             print("Error: OPENAI_API_KEY environment variable is not set.")
             sys.exit(1)
-        self.client = openai.OpenAI()
-
-    def call(self, prompt):
-        """Send the combined prompt to OpenAI API and return the response."""
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": prompt},
-                ],
-            )
-
-            message = response.choices[0].message.content
-
-            return json.loads(message.replace("```json", "").replace("```", ""))
-        except Exception as e:
-            print(f"OpenAI API error: {str(e)}")
-            sys.exit(1)
+        self.model = self.config.model
+        # Retries are handled here, so that they also cover the failures of a stream after it started
+        self.client = openai.OpenAI(**self._client_args())
+        self.hedge = os.getenv("AGT_HEDGE_REQUESTS") == "1" if hedge is None else hedge
+        # Identical prompts, such as a rerun after aborting the review, are answered from disk
+        self.cache = DiskCache(get_cache_dir("responses")) if use_cache else None
+        self.metrics = {}
+
+    @property
+    def latency(self):
+        """The latency history of the endpoint and model, the latencies of others not being comparable."""
+        endpoint = make_cache_key(self.config.base_url, self.model)[:16]
+        return LatencyHistory(os.path.join(get_cache_dir("metrics"), f"first-token-{endpoint}.json"))
+
+    def stream(self, prompt, system=None, on_complete=None):
+        """
+        Send the combined prompt to OpenAI API in the background, streaming the response.
+
+        :param prompt: The prompt.
+        :param system: The instructions sent as a system message before the prompt. Keeping them identical from one
+            request to the next lets the provider reuse its cache of the prompt prefix.
+        :param on_complete: Called with the metrics of the request once the response is complete, unless it is
+            answered from the cache.
+        :return: A PendingResponse whose fields can be read as soon as each one is generated.
+        """
+        request = self._response_request(prompt, system)
+        cached = self._get_cached(request)
+        if cached is not None:
+            return PendingResponse.completed(cached)
+
+        def produce(response):
+            result = self._request_fields(request, on_field=response.set_field)
+            if on_complete:
+                on_complete(self.metrics)
+            return result
+
+        return PendingResponse.run(produce)
+
+    def _get_cached(self, request):
+        """Return the cached response to an identical request, if any."""
+        if not self.cache:
+            return None
+        cached = self.cache.get(self._cache_key(request))
+        if cached is not None:
+            print(f"Using the cached response for this prompt ({self.cache.stats()}).")
+        return cached
+
+    def _request_fields(self, request, on_field=None):
+        """
+        Stream the response to a request, recording the time to the first token and to every field of the response.
+
+        Attempts that fail with a connection error, a timeout, a rate limit or a server error are retried after
+        the delay requested by the API or a jittered exponential backoff, up to ``max_attempts`` attempts. Once a
+        field is published it may already be in use, so an attempt failing after that is not retried, since another
+        generation would not match it.
+
+        :param request: The model and the messages of the request.
+        :param on_field: Called with the name and the value of every field as soon as it is complete.
+        :return: The fields of the response.
+        """
+        started = time.perf_counter()
+        self.metrics = {
+            "first_token": None,
+            "fields": {},
+            "total": None,
+            "attempts": 0,
+            "hedged": False,
+            "prompt_tokens": None,
+            "cached_tokens": None,
+        }
+        for attempt in range(self.max_attempts):
+            self.metrics["attempts"] += 1
+            try:
+                result = self._stream_fields(request, on_field, started)
+                break
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not self.is_retryable(e) or self.metrics["fields"]:
+                    print(f"OpenAI API error: {str(e)}")
+                    sys.exit(1)
+                delay = get_retry_delay(e, attempt)
+                print(f"OpenAI API error: {str(e)}, retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+        if self.cache:
+            self.cache.set(self._cache_key(request), result)
+        return result
+
+    def _stream_fields(self, request, on_field, started):
+        """Make one attempt at streaming the response to a request and parse it."""
+        _, first_content, chunks = self._open_stream(request)
+        extractor = JsonFieldExtractor()
+        for content in itertools.chain([first_content], map(self._read_chunk, chunks)):
+            if not content:
+                continue
+            if self.metrics["first_token"] is None:
+                self.metrics["first_token"] = time.perf_counter() - started
+            for name, value in extractor.feed(content):
+                self.metrics["fields"][name] = time.perf_counter() - started
+                if on_field:
+                    on_field(name, value)
+        self.metrics["total"] = time.perf_counter() - started
+
+        return parse_json_response(extractor.text)
+
+    def _open_stream(self, request):
+        """
+        Open a streamed completion and wait for its first token, hedging the request when it is unusually slow.
+
+        When hedging is enabled and the first token takes longer than the 95th percentile of the previous requests,
+        a second identical request is sent and the first one to produce a token is used, the other being closed.
+
+        :return: A tuple with the stream, the content of the first token and an iterator over the next chunks.
+        """
+        threshold = self.latency.percentile(95) if self.hedge else None
+        if threshold is None:
+            return self._first_token(request)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        attempts = [executor.submit(self._first_token, request)]
+        if not wait(attempts, timeout=threshold).done:
+            self.metrics["hedged"] = True
+            attempts.append(executor.submit(self._first_token, request))
+        executor.shutdown(wait=False)
+
+        pending = set(attempts)
+        winner = None
+        error = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is not None:
+                    error = attempt.exception()
+                elif winner is None:
+                    winner = attempt
+                else:
+                    self._close_stream(attempt)
+        for attempt in pending:
+            attempt.add_done_callback(self._close_stream)
+
+        if winner is None:
+            raise error
+        return winner.result()
+
+    def _first_token(self, request):
+        """Open a streamed completion and read it up to its first token, recording how long the token took."""
+        started = time.perf_counter()
+        stream = self.client.chat.completions.create(**request, **self._stream_args())
+        chunks = iter(stream)
+        for chunk in chunks:
+            content = self._content(chunk)
+            if content:
+                self.latency.record(time.perf_counter() - started)
+                return stream, content, chunks
+        return stream, "", chunks
+
+    def _stream_args(self):
+        # The token usage, including the prompt tokens read from the provider cache, comes in a last chunk
+        if self.config.is_openai:
+            return {"stream": True, "stream_options": {"include_usage": True}}
+        return {"stream": True}
+
+    @staticmethod
+    def _content(chunk):
+        return chunk.choices[0].delta.content if chunk.choices else None
+
+    def _read_chunk(self, chunk):
+        """Return the content of a chunk, recording the token usage when the chunk carries it."""
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.metrics["prompt_tokens"] = usage.prompt_tokens
+            self.metrics["cached_tokens"] = getattr(details, "cached_tokens", None) or 0
+        return self._content(chunk)
+
+    @staticmethod
+    def _close_stream(attempt):
+        """Close the stream of a hedged attempt that lost the race, if it was opened."""
+        if attempt.exception() is None:
+            attempt.result()[0].close()
+
+    @staticmethod
+    def is_retryable(error):
+        """Tell whether a request that failed with the given error is worth another attempt."""
+        if isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError)):
+            return True
+        return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+    def describe_metrics(self):
+        """Describe how long the last streamed response took to start, to produce every field and to complete."""
+        if not self.metrics.get("total"):
+            return None
+        timings = [f"first token {self.metrics['first_token']:.1f}s"]
+        timings.extend(f"{name} {seconds:.1f}s" for name, seconds in self.metrics["fields"].items())
+        timings.append(f"complete {self.metrics['total']:.1f}s")
+        details = [f"{self.metrics['attempts']} attempt(s)"] + (["hedged"] if self.metrics["hedged"] else [])
+        if self.metrics["prompt_tokens"] is not None:
+            details.append(f"{self.metrics['cached_tokens']} of {self.metrics['prompt_tokens']} prompt tokens cached")
+        return f"Response timings: {', '.join(timings)} ({', '.join(details)})"
+
+    async def complete_async(self, prompt, system=None):
+        """Send a prompt to OpenAI API without blocking the event loop and return the text of the response."""
+        if self.async_client is None:
+            self.async_client = openai.AsyncOpenAI(**self._client_args())
+        response = await self.async_client.chat.completions.create(**self._request(prompt, system))
+        return response.choices[0].message.content
+
+    def _client_args(self):
+        # Local servers usually accept any key, but the client requires one
+        return {
+            "base_url": self.config.base_url,
+            "api_key": self.config.api_key or "unused",
+            "timeout": self.request_timeout,
+            "max_retries": 0,
+        }
+
+    def _cache_key(self, request):
+        return make_cache_key(self.config.base_url, request)
+
+    def _response_request(self, prompt, system=None):
+        """Build the request of the response fields, constrained to their schema when the API supports it."""
+        request = self._request(prompt, system)
+        # OpenAI-compatible servers do not all support structured outputs, their responses rely on the repair pass
+        if self.config.is_openai:
+            request["response_format"] = RESPONSE_FORMAT
+        return request
+
+    def _request(self, prompt, system=None):
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        return {
+            "model": self.model,
+            "messages": messages,
+        }
@@ -2,7 +2,8 @@ from abc import abstractmethod, ABC
 
 
 class VcsService(ABC):
-    def __init__(self):
+    def __init__(self, context):
+        self.context = context
         self.validate_environment()
 
     @abstractmethod
@@ -19,9 +20,22 @@ class VcsService(ABC):
         """
         pass
 
+    def prepare_pull_request(self, branch_name):
+        """
+        Look up what the pull request creation needs and does not depend on the branch being pushed, so that it runs
+        while the branch is pushed. Nothing is prepared by default.
+        """
+        pass
+
     @abstractmethod
     def create_pull_request(self, branch_name, pr_title, pr_body):
         """
         Create a pull request for the specific service.
         """
         pass
+
+    def assign_pull_request(self):
+        """
+        Assign the pull request created by the run to the authenticated user, when the service supports it.
+        """
+        pass
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+
+from src.utils.file_utils import write_file_atomic
+
+
+def get_cache_dir(name):
+    """
+    Get the directory of a named cache of the user, following the XDG base directory specification.
+
+    :param name: The name of the cache, used as a subdirectory.
+    :return: The path of the cache directory, which may not exist yet.
+    """
+    root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "agt", name)
+
+
+def make_cache_key(*parts):
+    """
+    Build a content-addressed cache key.
+
+    :param parts: JSON serializable values that together identify the cached value.
+    :return: The hex digest of the canonical JSON encoding of the parts.
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    A JSON value store with one file per key and least recently used eviction.
+
+    Every read of an entry refreshes its modification time, so the modification times order the entries from the
+    least to the most recently used. Entries older than ``max_age`` are never returned, and writing an entry evicts
+    the least recently used ones until the cache fits in ``max_entries`` and ``max_bytes``. The directory is only
+    scanned on the first write and when the entries counted since then may no longer fit.
+    """
+
+    def __init__(self, directory, max_entries=200, max_bytes=20 * 1024 * 1024, max_age=7 * 24 * 60 * 60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        # The number and the size of the entries as of the last eviction plus the ones written since, None until then
+        self._entries = None
+        self._bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Read the value stored under a key, counting the lookup as a hit or a miss.
+
+        :return: The stored value, or None when there is no fresh entry for the key.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as cache_file:
+                value = json.load(cache_file)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a value under a key, then evict the entries that no longer fit."""
+        path = self._path(key)
+        encoded = json.dumps(value)
+        if not write_file_atomic(path, encoded, f"write to the cache at {self.directory}"):
+            return
+
+        if self._entries is not None:
+            self._entries += 1
+            self._bytes += len(encoded.encode("utf-8"))
+        if self._entries is None or self._entries > self.max_entries or self._bytes > self.max_bytes:
+            try:
+                self.evict()
+            except OSError as e:
+                print(f"Unable to write to the cache at {self.directory}: {e}")
+
+    def evict(self):
+        """Remove the expired entries and the least recently used ones beyond the size limits."""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    self._remove(entry.path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort(reverse=True)
+        total_bytes = 0
+        self._entries = self._bytes = 0
+        for index, (_, size, path) in enumerate(entries):
+            total_bytes += size
+            if index >= self.max_entries or total_bytes > self.max_bytes:
+                self._remove(path)
+            else:
+                self._entries += 1
+                self._bytes = total_bytes
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """Describe the hits and misses of the cache during this run."""
+        return f"{self.hits} hit(s), {self.misses} miss(es)"
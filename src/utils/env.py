@@ -0,0 +1,20 @@
+import os
+
+
+def get_int_env(name, default):
+    """
+    Read an integer setting from the environment.
+
+    :param name: The name of the environment variable.
+    :param default: The value to use when the variable is not set or invalid.
+    :return: The value of the variable, or the default.
+    """
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        fallback = "ignoring it" if default is None else f"using {default}"
+        print(f"Invalid {name} value '{value}', {fallback}.")
+        return default
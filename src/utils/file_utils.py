@@ -1,5 +1,11 @@
+import codecs
+import mmap
 import os
 import sys
+import tempfile
+
+# Same window git inspects to decide whether a file is binary
+BINARY_SNIFF_BYTES = 8000
 
 
 def get_resource_path(relative_path):
@@ -10,3 +16,76 @@ def get_resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     # Use the original path during development
     return os.path.join(os.path.abspath("."), relative_path)
+
+
+def is_binary(chunk):
+    """Guess whether a file is binary from its leading bytes."""
+    if b"\0" in chunk:
+        return True
+    try:
+        # An incremental decoder tolerates a multi-byte character cut at the end of the chunk
+        codecs.getincrementaldecoder("utf-8")().decode(chunk, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def read_text_sample(path, max_bytes):
+    """
+    Read a text file without loading more than max_bytes of it.
+
+    Files larger than max_bytes are memory-mapped and only their head and tail are kept.
+
+    :param path: The path of the file to read.
+    :param max_bytes: The maximum number of bytes to read from the file.
+    :return: The content of the file, or None if the file looks binary.
+    """
+    with open(path, "rb") as file:
+        if is_binary(file.read(BINARY_SNIFF_BYTES)):
+            return None
+
+        size = os.fstat(file.fileno()).st_size
+        if size <= max_bytes:
+            file.seek(0)
+            return file.read(max_bytes).decode("utf-8", errors="replace")
+
+        half = max_bytes // 2
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            head = mapped[:half].decode("utf-8", errors="replace")
+            tail = mapped[size - half :].decode("utf-8", errors="replace")
+
+    return f"{head}\n... [{size - 2 * half} bytes omitted] ...\n{tail}"
+
+
+def write_file_atomic(path, content, description):
+    """
+    Write a text file so readers only ever see its previous or its new content.
+
+    The content goes to a temporary file of its own in the same directory first, so concurrent writers of the same
+    path do not interleave, then replaces the file.
+
+    :param path: The path of the file to write, whose directory is created if needed.
+    :param content: The text to write.
+    :param description: What the write does, used in the message printed when it fails.
+    :return: True if the file was written, False otherwise.
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    except OSError as e:
+        print(f"Unable to {description}: {e}")
+        return False
+
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Unable to {description}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+    return True
@@ -0,0 +1,81 @@
+_ESCAPES = {"a": "\a", "b": "\b", "t": "\t", "n": "\n", "v": "\v", "f": "\f", "r": "\r", '"': '"', "\\": "\\"}
+
+
+def unquote_path(text):
+    """
+    Undo the C-style quoting git applies to paths with special characters, such as "caf\\303\\251.py".
+
+    :param text: The path as printed by git, quoted or not.
+    :return: The path.
+    """
+    if len(text) < 2 or not text.startswith('"') or not text.endswith('"'):
+        return text
+
+    data = bytearray()
+    index = 1
+    while index < len(text) - 1:
+        char = text[index]
+        if char != "\\":
+            data.extend(char.encode("utf-8"))
+            index += 1
+        elif text[index + 1 : index + 4].isdigit():
+            # Bytes outside of printable ASCII are written as three octal digits
+            data.append(int(text[index + 1 : index + 4], 8))
+            index += 4
+        else:
+            data.extend(_ESCAPES.get(text[index + 1], text[index + 1]).encode("utf-8"))
+            index += 2
+    return data.decode("utf-8", errors="replace")
+
+
+def diff_header_path(header):
+    """
+    Find the path of a file, on the side of the change, from its header in a diff.
+
+    The path is read from the '+++' line, the 'rename to' line or the '---' line of a deleted file when the header
+    has one, and from the 'diff --git' line otherwise, so paths that contain ' b/' or that git quotes are kept intact.
+
+    :param header: The diff header of the file, starting with its 'diff --git' line.
+    :return: The path.
+    """
+    lines = header.split("\n")
+    old_path = None
+    for line in lines[1:]:
+        if line.startswith("@@"):
+            break
+        if line.startswith("rename to ") or line.startswith("copy to "):
+            return unquote_path(line.split(" to ", 1)[1])
+        if line.startswith("--- ") and line != "--- /dev/null":
+            old_path = _strip_prefix(line[4:], "a/")
+        elif line.startswith("+++ "):
+            return old_path if line == "+++ /dev/null" else _strip_prefix(line[4:], "b/")
+
+    names = lines[0][len("diff --git ") :]
+    if names.startswith('"'):
+        end = _quoted_end(names)
+        return _strip_prefix(names[end + 1 :].lstrip(" "), "b/")
+    # Unless the file was renamed, both sides hold the same path
+    length = (len(names) - len("a/ b/")) // 2
+    path = names[2 : 2 + length]
+    if names == f"a/{path} b/{path}":
+        return path
+    return _strip_prefix(names.partition(" b/")[2], "")
+
+
+def _strip_prefix(name, prefix):
+    """Unquote a path of a diff header, removing its 'a/' or 'b/' prefix and the tab git adds after some paths."""
+    path = unquote_path(name.rstrip("\t"))
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+def _quoted_end(text):
+    """Find the closing quote of the quoted name at the start of the text."""
+    index = 1
+    while index < len(text):
+        if text[index] == "\\":
+            index += 2
+        elif text[index] == '"':
+            return index
+        else:
+            index += 1
+    return len(text) - 1
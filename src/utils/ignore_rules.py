@@ -0,0 +1,134 @@
+import os
+import re
+
+IGNORE_FILE = ".agtignore"
+
+# Excluded unless a '!<pattern>' line in .agtignore removes them
+DEFAULT_IGNORE_PATTERNS = [
+    "*.lock",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+]
+
+
+def load_ignore_patterns(root):
+    """
+    Read the ignore patterns of a repository, starting from the built-in defaults.
+
+    The .agtignore file uses gitignore syntax. Since git pathspecs cannot re-include an excluded path, a
+    '!<pattern>' line only removes a pattern listed before it, such as one of the defaults.
+
+    :param root: The root directory of the working tree.
+    :return: The list of patterns to exclude.
+    """
+    patterns = list(DEFAULT_IGNORE_PATTERNS)
+
+    path = os.path.join(root, IGNORE_FILE)
+    if not os.path.isfile(path):
+        return patterns
+
+    with open(path, "r", encoding="utf-8") as ignore_file:
+        for line in ignore_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("!"):
+                if line[1:] in patterns:
+                    patterns.remove(line[1:])
+                continue
+            patterns.append(line)
+    return patterns
+
+
+def to_exclude_pathspecs(pattern):
+    """
+    Translate a gitignore pattern into git exclude pathspecs.
+
+    :param pattern: A gitignore pattern.
+    :return: The pathspecs excluding the matching files and the contents of the matching directories.
+    """
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+
+    # Like in gitignore, a pattern with a slash is anchored to the root, otherwise it matches at any level
+    if "/" in pattern:
+        pattern = pattern.lstrip("/")
+    elif not pattern.startswith("**/"):
+        pattern = f"**/{pattern}"
+
+    pathspecs = [f":(exclude,glob){pattern}/**"]
+    if not directory_only:
+        pathspecs.insert(0, f":(exclude,glob){pattern}")
+    return pathspecs
+
+
+def build_pathspecs(scope=None, patterns=()):
+    """
+    Build the pathspecs that limit git commands to the scope of a run.
+
+    :param scope: The path the run is limited to, the whole repository when not given.
+    :param patterns: The gitignore patterns to exclude.
+    :return: The list of pathspecs.
+    """
+    pathspecs = [scope or "."]
+    for pattern in patterns:
+        pathspecs.extend(to_exclude_pathspecs(pattern))
+    return pathspecs
+
+
+def filter_by_pathspecs(paths, pathspecs):
+    """
+    Keep the paths that git would select with the pathspecs built by build_pathspecs.
+
+    This lets a list that git already produced, such as the untracked files of the status, be limited to the scope
+    and the ignore rules of a run without another git call.
+
+    :param paths: The paths, relative to the root of the working tree.
+    :param pathspecs: The pathspecs, a scope followed by exclude glob pathspecs.
+    :return: The paths that are selected.
+    """
+    scopes = []
+    excludes = []
+    for pathspec in pathspecs:
+        if pathspec.startswith(":(exclude,glob)"):
+            excludes.append(_glob_to_regex(pathspec[len(":(exclude,glob)") :]))
+        else:
+            scopes.append(os.path.normpath(pathspec).replace(os.sep, "/"))
+
+    def selected(path):
+        in_scope = not scopes or any(scope == "." or path == scope or path.startswith(f"{scope}/") for scope in scopes)
+        return in_scope and not any(exclude.fullmatch(path) for exclude in excludes)
+
+    return [path for path in paths if selected(path)]
+
+
+def _glob_to_regex(pattern):
+    """Translate a glob pathspec, where '*' stops at slashes and '**' crosses them, into a regular expression."""
+    parts = []
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+        elif pattern.startswith("/**", index) and index + 3 == len(pattern):
+            parts.append("/.*")
+            index += 3
+        elif pattern[index] == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif pattern[index] == "?":
+            parts.append("[^/]")
+            index += 1
+        elif pattern[index] == "[" and "]" in pattern[index + 1 :]:
+            end = pattern.index("]", index + 1)
+            parts.append(f"[{pattern[index + 1 : end].replace('!', '^', 1)}]")
+            index = end + 1
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+    return re.compile("".join(parts))
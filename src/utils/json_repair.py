@@ -0,0 +1,77 @@
+import json
+
+
+def parse_json_response(text):
+    """
+    Parse the JSON object of a model response, repairing the usual formatting mistakes when it is not valid as is.
+
+    The text around the object, such as a markdown code fence or an explanation, is ignored, trailing commas are
+    removed, raw line breaks are accepted within strings, and a truncated object is closed.
+
+    :param text: The response.
+    :return: The parsed object.
+    :raises ValueError: When the response cannot be repaired.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(repair_json(text), strict=False)
+
+
+def repair_json(text):
+    """
+    Extract the first JSON object of a text and fix its formatting in a single pass.
+
+    :param text: The text containing the object.
+    :return: The text of the object.
+    :raises ValueError: When the text does not contain an object.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("The response does not contain a JSON object.")
+
+    output = []
+    closers = []
+    in_string = False
+    escaped = False
+    for char in text[start:]:
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _drop_trailing_comma(output)
+            if closers and char == closers[-1]:
+                closers.pop()
+            output.append(char)
+            if not closers:
+                return "".join(output)
+            continue
+        output.append(char)
+
+    # The object was truncated, close everything that is still open
+    if in_string:
+        if escaped:
+            output.pop()
+        output.append('"')
+    _drop_trailing_comma(output)
+    output.extend(reversed(closers))
+    return "".join(output)
+
+
+def _drop_trailing_comma(output):
+    index = len(output) - 1
+    while index >= 0 and output[index].isspace():
+        index -= 1
+    if index >= 0 and output[index] == ",":
+        del output[index]
@@ -0,0 +1,113 @@
+import json
+
+
+class JsonFieldExtractor:
+    """
+    Extract the fields of a JSON object from its text while the text is still being received.
+
+    Each field is returned as soon as its value is complete, so the first fields of a streamed response can be used
+    before the last ones are generated. Any text before the opening brace, such as a markdown code fence, and after
+    the closing brace is ignored. Control characters, such as raw newlines, are accepted inside strings, and once
+    the text stops being valid JSON no more fields are extracted, the text being left to the repair pass.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+        self._state = "start"
+        self._token_start = None
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """
+        Add the next chunk of the text.
+
+        :param chunk: The text received since the previous call.
+        :return: The list of (key, value) tuples of the fields completed by this chunk.
+        """
+        self.text += chunk
+        fields = []
+        while self._position < len(self.text) and self._state != "done":
+            try:
+                field = self._step(self.text[self._position])
+            except ValueError:
+                self._state = "done"
+                break
+            if field:
+                fields.append(field)
+            self._position += 1
+        return fields
+
+    def _step(self, char):
+        """Advance the parser by one character, returning a field when its value ends on this character."""
+        if self._state == "start":
+            if char == "{":
+                self._state = "key"
+        elif self._state == "key":
+            if char == '"':
+                self._begin_string("in_key")
+            elif char == "}":
+                self._state = "done"
+        elif self._state == "in_key":
+            if self._string_ends(char):
+                self._key = json.loads(self.text[self._token_start : self._position + 1], strict=False)
+                self._state = "colon"
+        elif self._state == "colon":
+            if char == ":":
+                self._state = "value"
+        elif self._state == "value":
+            if char == '"':
+                self._begin_string("in_string")
+            elif not char.isspace():
+                self._token_start = self._position
+                self._depth = 0
+                self._in_string = False
+                self._state = "in_value"
+                return self._step(char)
+        elif self._state == "in_string":
+            if self._string_ends(char):
+                self._state = "next"
+                return self._key, json.loads(self.text[self._token_start : self._position + 1], strict=False)
+        elif self._state == "in_value":
+            return self._step_value(char)
+        elif self._state == "next":
+            if char == ",":
+                self._state = "key"
+            elif char == "}":
+                self._state = "done"
+        return None
+
+    def _step_value(self, char):
+        """Advance through a number, literal, array or object value, which ends at a comma or brace outside of it."""
+        if self._in_string:
+            self._in_string = not self._string_ends(char)
+        elif char == '"':
+            self._in_string = True
+            self._escaped = False
+        elif char in "[{":
+            self._depth += 1
+        elif self._depth and char in "]}":
+            self._depth -= 1
+        elif not self._depth and char in ",}":
+            value = json.loads(self.text[self._token_start : self._position], strict=False)
+            self._state = "key" if char == "," else "done"
+            return self._key, value
+        return None
+
+    def _begin_string(self, state):
+        self._token_start = self._position
+        self._escaped = False
+        self._state = state
+
+    def _string_ends(self, char):
+        """Tell whether a character closes the current string, keeping track of backslash escapes."""
+        if self._escaped:
+            self._escaped = False
+        elif char == "\\":
+            self._escaped = True
+        elif char == '"':
+            return True
+        return False
@@ -0,0 +1,39 @@
+import json
+import math
+
+from src.utils.file_utils import write_file_atomic
+
+
+class LatencyHistory:
+    """The latencies of the most recent requests, kept on disk to tell how slow a request usually is."""
+
+    max_samples = 50
+
+    def __init__(self, path):
+        self.path = path
+
+    def samples(self):
+        """Read the recorded latencies, from the oldest to the most recent."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as history_file:
+                return [float(sample) for sample in json.load(history_file)]
+        except (OSError, ValueError, TypeError):
+            return []
+
+    def record(self, seconds):
+        """Record the latency of a request, dropping the oldest samples beyond max_samples."""
+        samples = (self.samples() + [seconds])[-self.max_samples :]
+        write_file_atomic(self.path, json.dumps(samples), "record the request latency")
+
+    def percentile(self, percent, min_samples=10):
+        """
+        Get a percentile of the recorded latencies.
+
+        :param percent: The percentile, between 0 and 100.
+        :param min_samples: The number of samples below which the percentile is not meaningful.
+        :return: The latency in seconds, or None when there are not enough samples.
+        """
+        samples = sorted(self.samples())
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(len(samples) * percent / 100) - 1)]
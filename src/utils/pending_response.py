@@ -0,0 +1,83 @@
+import threading
+
+
+class PendingResponse:
+    """
+    A response produced in a background thread, whose fields can be read as soon as each one is available.
+
+    ``get`` behaves like ``dict.get`` but waits until the field is received or the response is complete, so the code
+    reading a complete response works unchanged with a response that is still being generated.
+    """
+
+    def __init__(self):
+        self._fields = {}
+        self._complete = False
+        self._error = None
+        self._condition = threading.Condition()
+
+    @classmethod
+    def run(cls, target, *args):
+        """
+        Start producing a response in a daemon thread.
+
+        :param target: The function producing the response, called with the pending response and the given arguments.
+            It publishes the fields with set_field as they are available and returns the complete response.
+        :return: The pending response.
+        """
+        response = cls()
+
+        def produce():
+            try:
+                response.complete(target(response, *args))
+            except BaseException as e:
+                response.fail(e)
+
+        threading.Thread(target=produce, daemon=True).start()
+        return response
+
+    @classmethod
+    def completed(cls, fields):
+        """Wrap a response that is already complete."""
+        response = cls()
+        response.complete(fields)
+        return response
+
+    def set_field(self, name, value):
+        """Publish a field, waking up the readers waiting for it."""
+        with self._condition:
+            self._fields[name] = value
+            self._condition.notify_all()
+
+    def complete(self, fields):
+        """Publish the complete response, its fields replacing the ones received so far."""
+        with self._condition:
+            self._fields.update(fields or {})
+            self._complete = True
+            self._condition.notify_all()
+
+    def fail(self, error):
+        """Complete the response with an error, raised again to every reader."""
+        with self._condition:
+            self._error = error
+            self._complete = True
+            self._condition.notify_all()
+
+    def get(self, name, default=None):
+        """
+        Wait for a field of the response.
+
+        :return: The value of the field, or the default if the complete response does not have it.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: name in self._fields or self._complete)
+            if name not in self._fields and self._error is not None:
+                raise self._error
+            return self._fields.get(name, default)
+
+    def result(self):
+        """Wait for the complete response and return its fields."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._complete)
+            if self._error is not None:
+                raise self._error
+            return dict(self._fields)
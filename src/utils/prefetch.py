@@ -0,0 +1,92 @@
+import sys
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class Prefetch:
+    """
+    Values computed in the background from the start of a run, and read when they are needed.
+
+    Every task runs in its own daemon thread, so a task waiting on the network does not hold the others back, and
+    exiting the run, for example with Ctrl+C at a prompt, does not wait for the tasks that are still running.
+    """
+
+    def __init__(self):
+        self._futures = {}
+
+    def start(self, name, func, *args):
+        """
+        Start computing a value.
+
+        :param name: The name the value is read with.
+        :param func: The function computing the value, called with the given arguments.
+        """
+        future = Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self._futures[name] = future
+        threading.Thread(target=run, name=f"prefetch-{name}", daemon=True).start()
+
+    def get(self, name):
+        """Wait for a value, raising the error of its task when it failed."""
+        return self._futures[name].result()
+
+    def wait(self):
+        """Wait for every value, raising the error of the first task that failed."""
+        for name in self._futures:
+            self.get(name)
+
+
+class _HeldOutput:
+    """A standard output that passes the writes of the main thread through and keeps those of the others."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._held = []
+        self._released = False
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        if threading.current_thread() is not threading.main_thread():
+            with self._lock:
+                if not self._released:
+                    self._held.append(text)
+                    return len(text)
+        return self.stream.write(text)
+
+    def release(self):
+        """Write what was kept, the writes that come after go straight through."""
+        with self._lock:
+            self._released = True
+            held, self._held = "".join(self._held), []
+        if held:
+            self.stream.write(held)
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        # fileno, isatty and the like are those of the real stream, so input() keeps its line editing
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def hold_background_output():
+    """
+    Keep what the background tasks print until the block ends, so it does not land in the middle of a line the user
+    is typing.
+
+    Everything printed by a thread other than the main one, including the worker threads of a task, is held.
+    """
+    held = _HeldOutput(sys.stdout)
+    sys.stdout = held
+    try:
+        yield
+    finally:
+        sys.stdout = held.stream
+        held.release()
@@ -0,0 +1,25 @@
+import random
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def get_retry_delay(error, attempt, base_delay=1.0, max_delay=30.0):
+    """
+    Get how long to wait before the next attempt of a failed request.
+
+    The delay requested by the server through the ``retry-after-ms`` or ``Retry-After`` headers is honoured,
+    otherwise the delay is drawn between zero and an exponential backoff, so that concurrent clients do not retry
+    in lockstep.
+
+    :param error: The error of the failed attempt, with the HTTP response it carries if any.
+    :param attempt: The number of the failed attempt, starting from 0.
+    :return: The delay in seconds.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, unit in (("retry-after-ms", 0.001), ("retry-after", 1)):
+        try:
+            return min(float(headers[header]) * unit, max_delay)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
@@ -1,10 +1,53 @@
+import subprocess
+from unittest.mock import patch
+
+import git.cmd
 import pytest
+from git import Repo
 
 
 @pytest.fixture(autouse=True)
-def set_env_vars(monkeypatch):
+def set_env_vars(monkeypatch, tmp_path):
     """Automatically set environment variables for all tests."""
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
     monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
     monkeypatch.setenv("BITBUCKET_USERNAME", "fake-key")
     monkeypatch.setenv("BITBUCKET_APP_PASSWORD", "fake-key")
+    # Keep the caches of the tests away from the cache of the user
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """Create a repository with a feature branch of two commits forked from main, a GitHub origin and a change."""
+
+    def run(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    run("init", "-q", "-b", "main")
+    run("config", "user.email", "test@example.com")
+    run("config", "user.name", "test")
+    run("remote", "add", "origin", "git@github.com:test-user/test-repo.git")
+    for index in range(3):
+        if index == 1:
+            run("checkout", "-q", "-b", "feature")
+        (tmp_path / "file.txt").write_text(f"content {index}\n")
+        run("add", "file.txt")
+        run("commit", "-q", "-m", f"commit {index}")
+    (tmp_path / "file.txt").write_text("changed\n")
+
+    return Repo(tmp_path)
+
+
+@pytest.fixture
+def git_commands():
+    """Record the git subcommand of every subprocess spawned by GitPython."""
+    commands = []
+    popen = git.cmd.safer_popen
+
+    def record(command, *args, **kwargs):
+        commands.append(command[1])
+        return popen(command, *args, **kwargs)
+
+    with patch("git.cmd.safer_popen", side_effect=record):
+        yield commands
@@ -0,0 +1,70 @@
+from src.core.diff_dedup import collapse_repeated_hunks, fingerprint_hunk
+from src.core.diff_model import parse_diff
+
+
+def build_file_diff(path, hunks):
+    header = f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+    return header + "".join(hunks)
+
+
+RENAME_HUNK = "@@ -{line},3 +{line},3 @@\n {context}\n-from old_module import helper\n+from new_module import helper\n"
+
+
+def test_fingerprint_ignores_position_context_and_whitespace():
+    """Test that the same change made in different places gets the same fingerprint."""
+    diff = build_file_diff(
+        "a.py",
+        [
+            RENAME_HUNK.format(line=1, context="import os"),
+            RENAME_HUNK.format(line=40, context="import sys").replace("import helper", "import   helper"),
+            "@@ -1 +1 @@\n-a\n+b\n",
+        ],
+    )
+    _, files = parse_diff(diff)
+    first, second, other = [fingerprint_hunk(hunk) for hunk in files[0].hunks]
+
+    assert first == second
+    assert first != other
+
+
+def test_fingerprint_without_changes():
+    """Test that hunks without added or deleted lines are not fingerprinted."""
+    _, files = parse_diff(build_file_diff("a.py", ["@@ -1 +1 @@\n context\n"]))
+    assert fingerprint_hunk(files[0].hunks[0]) is None
+
+
+def test_collapse_repeated_hunks():
+    """Test that a change repeated across files is sent once with the list of the other files."""
+    diff = "".join(
+        build_file_diff(f"pkg/module_{i}.py", [RENAME_HUNK.format(line=i + 1, context=f"# module {i}")])
+        for i in range(5)
+    ) + build_file_diff("pkg/main.py", [RENAME_HUNK.format(line=3, context="# main"), "@@ -9 +9 @@\n-x = 1\n+x = 2\n"])
+
+    collapsed = collapse_repeated_hunks(diff)
+
+    assert collapsed.count("+from new_module import helper") == 1
+    assert collapsed.startswith(build_file_diff("pkg/module_0.py", [RENAME_HUNK.format(line=1, context="# module 0")]))
+    assert (
+        "[The same change is also made 5 more time(s) in: "
+        "pkg/module_1.py, pkg/module_2.py, pkg/module_3.py, pkg/module_4.py, pkg/main.py]\n"
+    ) in collapsed
+    assert "diff --git a/pkg/module_1.py" not in collapsed
+    assert collapsed.endswith(
+        "diff --git a/pkg/main.py b/pkg/main.py\n--- a/pkg/main.py\n+++ b/pkg/main.py\n@@ -9 +9 @@\n-x = 1\n+x = 2\n"
+    )
+
+
+def test_collapse_repeated_hunks_in_same_file():
+    """Test that repeats within a file are counted."""
+    diff = build_file_diff("a.py", [RENAME_HUNK.format(line=line, context="pass") for line in [1, 20, 40]])
+
+    collapsed = collapse_repeated_hunks(diff)
+
+    assert collapsed.count("@@ -") == 1
+    assert "[The same change is also made 2 more time(s) in: a.py (x2)]" in collapsed
+
+
+def test_collapse_without_repeats():
+    """Test that a diff without repeated changes is returned unchanged."""
+    diff = build_file_diff("a.py", ["@@ -1 +1 @@\n-a\n+b\n"]) + build_file_diff("b.py", ["@@ -1 +1 @@\n-c\n+d\n"])
+    assert collapse_repeated_hunks(diff) is diff
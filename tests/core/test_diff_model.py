@@ -0,0 +1,103 @@
+from src.core.diff_model import FileDiff, Hunk, parse_diff, parse_untracked
+
+DIFF = (
+    "diff --git a/a.py b/a.py\n"
+    "index 123..456 100644\n"
+    "--- a/a.py\n"
+    "+++ b/a.py\n"
+    "@@ -1,2 +1,2 @@\n"
+    "-old\n"
+    "+new\n"
+    " same\n"
+    "@@ -10 +10,2 @@\n"
+    " context\n"
+    "+added\n"
+    "diff --git a/image.png b/image.png\n"
+    "Binary files differ\n"
+)
+
+
+def test_parse_diff():
+    """Test parsing files and hunks as offsets into the diff."""
+    preamble, files = parse_diff(DIFF)
+
+    assert preamble == ""
+    assert [file.path for file in files] == ["a.py", "image.png"]
+    assert files[0].header == "diff --git a/a.py b/a.py\nindex 123..456 100644\n--- a/a.py\n+++ b/a.py\n"
+    assert [hunk.text for hunk in files[0].hunks] == [
+        "@@ -1,2 +1,2 @@\n-old\n+new\n same\n",
+        "@@ -10 +10,2 @@\n context\n+added\n",
+    ]
+    assert files[1].header == "diff --git a/image.png b/image.png\nBinary files differ\n"
+    assert files[1].hunks == []
+    assert "".join(file.text for file in files) == DIFF
+
+
+def test_parse_diff_quoted_paths():
+    """Test that paths git quotes, or that contain ' b/', are read whole."""
+    diff = (
+        'diff --git "a/caf\\303\\251.py" "b/caf\\303\\251.py"\n'
+        "@@ -1 +1 @@\n"
+        "+new\n"
+        "diff --git a/a b/c.py b/a b/c.py\n"
+        "old mode 100644\n"
+        "new mode 100755\n"
+    )
+
+    assert [file.path for file in parse_diff(diff)[1]] == ["café.py", "a b/c.py"]
+
+
+def test_parse_diff_shares_the_buffer():
+    """Test that files and hunks keep offsets into the original text instead of copies."""
+    _, files = parse_diff(DIFF)
+
+    assert all(file.buffer is DIFF for file in files)
+    assert all(hunk.buffer is DIFF for hunk in files[0].hunks)
+    assert len(files[0].hunks[0]) == len("@@ -1,2 +1,2 @@\n-old\n+new\n same\n")
+
+
+def test_parse_diff_preamble():
+    """Test that text before the first file is kept apart."""
+    preamble, files = parse_diff("\n" + DIFF)
+
+    assert preamble == "\n"
+    assert len(files) == 2
+
+
+def test_parse_diff_without_files():
+    """Test parsing text that contains no diff."""
+    assert parse_diff("") == ("", [])
+    assert parse_diff("nothing") == ("nothing", [])
+
+
+def test_count_changes():
+    """Test counting added and deleted lines."""
+    _, files = parse_diff(DIFF)
+
+    assert files[0].hunks[0].count_changes() == (1, 1)
+    assert files[0].hunks[1].count_changes() == (1, 0)
+    assert files[0].count_changes() == (2, 1)
+    assert files[0].count_changes(files[0].hunks[1:]) == (1, 0)
+    assert files[1].count_changes() == (0, 0)
+
+
+def test_hunk_lines_are_materialized_on_demand():
+    """Test materializing the lines of a hunk."""
+    hunk = Hunk("xx@@ -1 +1 @@\n-a\n+b\nyy", 2, 20)
+    assert hunk.lines() == ["@@ -1 +1 @@", "-a", "+b"]
+
+
+def test_parse_untracked():
+    """Test parsing untracked file contents."""
+    content = "\n\n--- Untracked file: a.txt ---\none\ntwo\n\n\n--- Untracked file: b.txt (omitted, budget) ---"
+
+    preamble, files = parse_untracked(content)
+
+    assert preamble == ""
+    assert [file.path for file in files] == ["a.txt", "b.txt (omitted, budget)"]
+    assert all(isinstance(file, FileDiff) and file.untracked for file in files)
+    assert files[0].header == "\n\n--- Untracked file: a.txt ---\n"
+    assert files[0].hunks[0].text == "one\ntwo\n"
+    assert files[0].count_changes() == (2, 0)
+    assert files[1].hunks == []
+    assert "".join(file.text for file in files) == content
@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+from src.core.diff_packer import (
+    estimate_tokens,
+    get_diff_byte_budget,
+    get_file_priority,
+    get_max_prompt_tokens,
+    pack_diff,
+)
+
+
+def build_file_diff(path, hunks):
+    header = f"diff --git a/{path} b/{path}\nindex 123..456 100644\n--- a/{path}\n+++ b/{path}\n"
+    return header + "".join(f"@@ -{i},1 +{i},1 @@\n-old {i}\n+{body}\n" for i, body in enumerate(hunks, 1))
+
+
+def test_estimate_tokens():
+    """Test the offline token estimate."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 35) == 10
+
+
+def test_get_max_prompt_tokens(monkeypatch):
+    """Test reading the prompt budget from the environment."""
+    monkeypatch.setenv("AGT_MAX_PROMPT_TOKENS", "5000")
+    assert get_max_prompt_tokens() == 5000
+
+    monkeypatch.setenv("AGT_MAX_PROMPT_TOKENS", "lots")
+    assert get_max_prompt_tokens() == 100_000
+
+    monkeypatch.delenv("AGT_MAX_PROMPT_TOKENS")
+    assert get_max_prompt_tokens() == 100_000
+
+
+def test_get_diff_byte_budget():
+    """Test that more diff is read than fits in the prompt."""
+    assert get_diff_byte_budget(1000) == 7000
+
+
+def test_get_file_priority():
+    """Test that lockfiles and generated files rank below source files."""
+    assert get_file_priority("src/app.py") == 0
+    assert get_file_priority("package-lock.json") == 1
+    assert get_file_priority("frontend/yarn.lock") == 1
+    assert get_file_priority("proto/service_pb2.py") == 1
+    assert get_file_priority("vendor/lib/code.go") == 1
+
+
+def test_pack_diff_within_budget():
+    """Test that a diff that fits is returned unchanged."""
+    diff = build_file_diff("a.py", ["one"])
+    assert pack_diff(diff, "untracked", 10_000) == (diff, "untracked")
+
+
+def test_pack_diff_drops_large_and_low_priority_hunks(capsys):
+    """Test that lockfile and large hunks are summarized first while all file headers are kept."""
+    diff = build_file_diff("app.py", ["small change", "x" * 2000]) + build_file_diff("poetry.lock", ["y" * 400])
+
+    packed_diff, packed_untracked = pack_diff(diff, "", 180)
+
+    assert estimate_tokens(packed_diff) <= 180
+    assert "diff --git a/app.py b/app.py" in packed_diff
+    assert "diff --git a/poetry.lock b/poetry.lock" in packed_diff
+    assert "+small change" in packed_diff
+    assert "x" * 2000 not in packed_diff
+    assert "y" * 400 not in packed_diff
+    assert "[1 of 2 hunk(s) omitted to fit the prompt: app.py | +1 -1]" in packed_diff
+    assert "[1 of 1 hunk(s) omitted to fit the prompt: poetry.lock | +1 -1]" in packed_diff
+    assert packed_untracked == ""
+    assert "2 hunk(s) were summarized" in capsys.readouterr().out
+
+
+def test_pack_diff_summarizes_untracked_files():
+    """Test that untracked contents share the budget with the diff."""
+    diff = build_file_diff("app.py", ["change"])
+    untracked = "\n\n--- Untracked file: data.csv ---\n" + "row\n" * 1000
+
+    packed_diff, packed_untracked = pack_diff(diff, untracked, 150)
+
+    assert packed_diff == diff
+    assert packed_untracked == (
+        "\n\n--- Untracked file: data.csv ---\n[1 of 1 hunk(s) omitted to fit the prompt: data.csv | +1000 -0]\n"
+    )
+
+
+def test_pack_diff_only_stat_when_headers_exceed_budget():
+    """Test that only a stat summary is sent when even the file headers do not fit."""
+    diff = "".join(build_file_diff(f"file_{i}.py", ["change"]) for i in range(50))
+
+    packed_diff, _ = pack_diff(diff, "", 100)
+
+    assert estimate_tokens(packed_diff) <= 100
+    assert packed_diff.startswith(" file_0.py | +1 -1\n")
+    assert "more file(s)" in packed_diff
+    assert "@@" not in packed_diff
+
+
+@patch("src.core.diff_packer.print")
+def test_pack_diff_hard_bound(mock_print):
+    """Test that the packed diff never exceeds the budget."""
+    diff = "".join(build_file_diff(f"file_{i}.py", ["z" * (i * 37 % 500)] * 3) for i in range(40))
+
+    for budget in [2000, 5000, 10_000]:
+        packed_diff, packed_untracked = pack_diff(diff, "", budget)
+        assert estimate_tokens(packed_diff) + estimate_tokens(packed_untracked) <= budget
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+from src.core.execution_plan import ExecutionPlan
+
+
+def test_independent_steps_run_concurrently():
+    """Test that steps without dependencies between them run at the same time, and dependents after them."""
+    both_started = threading.Barrier(2, timeout=5)
+    plan = ExecutionPlan()
+    plan.add("push", lambda: both_started.wait() is not None and "pushed")
+    plan.add("lookup", lambda: both_started.wait() is not None and "found")
+    plan.add("create", lambda: f"{plan.result('push')} and {plan.result('lookup')}", depends_on=["push", "lookup"])
+
+    results = plan.run()
+
+    assert results["create"] == "pushed and found"
+    assert list(plan.timings)[-1] == "create"
+    assert plan.describe().startswith("Execution timings: ")
+    assert "create " in plan.describe()
+
+
+def test_failed_step_skips_its_dependents():
+    """Test that a failure stops the steps depending on it, the other steps still running."""
+    ran = []
+
+    def fail():
+        raise RuntimeError("push rejected")
+
+    plan = ExecutionPlan()
+    plan.add("push", fail)
+    plan.add("lookup", ran.append, "lookup")
+    plan.add("create", ran.append, "create", depends_on=["push"])
+
+    with pytest.raises(RuntimeError, match="push rejected"):
+        plan.run()
+    assert ran == ["lookup"]
+    assert "create" not in plan.timings
+
+
+def test_unknown_dependency():
+    """Test that a step can only depend on the steps added before it."""
+    with pytest.raises(ValueError):
+        ExecutionPlan().add("create", print, depends_on=["push"])
@@ -1,11 +1,13 @@
 import os
+import threading
 from unittest.mock import patch, MagicMock
 
 import pytest
 from git import InvalidGitRepositoryError
 from src.service.bitbucket_service import BitbucketService
 from src.core.git_change_manager import get_prompt_file, get_service_provider, print_colored_summary, validate_env_vars
-from src.core.git_change_manager import main
+from src.core.git_change_manager import get_run_context, load_last_prompt, main, read_prompt_template
+from src.core.run_context import RunContext
 from src.service.github_service import GitHubService
 
 
@@ -30,6 +32,14 @@ def mock_prompt_file(tmp_path):
         yield mock_prompt
 
 
+@pytest.fixture(autouse=True)
+def last_prompt_path(tmp_path):
+    """Keep the prompt saved by main out of the working tree."""
+    path = tmp_path / "last-prompt.txt"
+    with patch("src.core.git_change_manager.get_last_prompt_path", return_value=str(path)):
+        yield path
+
+
 # Test validate_env_vars
 
 
@@ -48,6 +58,14 @@ def test_validate_env_vars_missing_openai_api_key():
         assert excinfo.value.code == 1
 
 
+def test_validate_env_vars_local_server_without_openai_api_key():
+    """Test that OPENAI_API_KEY is not required when an OpenAI-compatible server is configured."""
+    with patch.dict(
+        os.environ, {"AGT_LLM_BASE_URL": "http://localhost:8080/v1", "GITHUB_TOKEN": "mock_github_token"}, clear=True
+    ):
+        validate_env_vars()
+
+
 def test_validate_env_vars_missing_github_token():
     """Test validate_env_vars when GITHUB_TOKEN is missing."""
     with patch.dict(os.environ, {"OPENAI_API_KEY": "mock_openai_key"}, clear=True):
@@ -83,6 +101,57 @@ def test_get_prompt_file_missing(mock_get_resource_path, mock_isfile):
         get_prompt_file()
 
 
+def test_read_prompt_template_strips_comments(mock_prompt_file):
+    """Test that the guidance in HTML comments is removed from the template before it is sent."""
+    mock_prompt_file.write_text("## Description\n<!-- Describe\nthe change -->\n\nCloses # <!-- issue -->\n")
+
+    assert read_prompt_template() == "## Description\n\n\nCloses #\n"
+
+
+# Test get_run_context
+
+
+def test_get_run_context(mock_repo):
+    """Test that the run context wraps the repository of the current directory."""
+    context = get_run_context()
+    assert isinstance(context, RunContext)
+    assert context.repo is mock_repo
+
+
+def test_get_run_context_with_path(mock_repo, tmp_path):
+    """Test that the path and the ignore rules become pathspecs of the git service."""
+    mock_repo.working_tree_dir = str(tmp_path)
+    (tmp_path / ".agtignore").write_text("vendor/\n")
+
+    context = get_run_context(str(tmp_path))
+
+    assert context.git.pathspecs[0] == "."
+    assert ":(exclude,glob)**/*.lock" in context.git.pathspecs
+    assert context.git.pathspecs[-1] == ":(exclude,glob)**/vendor/**"
+
+
+def test_get_run_context_missing_path(mock_repo):
+    """Test that a path that does not exist is rejected."""
+    with pytest.raises(SystemExit) as excinfo:
+        get_run_context("does/not/exist")
+    assert excinfo.value.code == 1
+
+
+@patch("src.core.git_change_manager.Repo")
+def test_get_run_context_invalid_repo(mock_repo):
+    """Test invalid repository handling."""
+    mock_repo.side_effect = InvalidGitRepositoryError
+    with pytest.raises(SystemExit):
+        get_run_context()
+
+
+def test_get_run_context_bare_repo(mock_repo):
+    """Test invalid repository handling."""
+    mock_repo.bare = True
+    with pytest.raises(SystemExit):
+        get_run_context()
+
+
 # Test get_service_provider
 
 
@@ -91,7 +160,7 @@ def test_get_service_provider_github(mock_repo):
 
     mock_repo.remote.return_value.urls = iter(["https://github.com/test/repo"])
 
-    service = get_service_provider()
+    service = get_service_provider(get_run_context())
     assert isinstance(service, GitHubService)
 
 
@@ -101,7 +170,7 @@ def test_get_service_provider_gitlab(mock_repo):
     mock_repo.remote.return_value.urls = iter(["https://gitlab.com/test/repo"])
 
     with pytest.raises(SystemExit):
-        get_service_provider()
+        get_service_provider(get_run_context())
 
 
 def test_get_service_provider_bitbucket(mock_repo):
@@ -109,37 +178,22 @@ def test_get_service_provider_bitbucket(mock_repo):
 
     mock_repo.remote.return_value.urls = iter(["https://bitbucket.org/test/repo"])
 
-    service = get_service_provider()
+    service = get_service_provider(get_run_context())
     assert isinstance(service, BitbucketService)
 
 
-@patch("src.core.git_change_manager.Repo")
-def test_get_service_provider_invalid_repo(mock_repo):
-    """Test invalid repository handling."""
-    mock_repo.side_effect = InvalidGitRepositoryError
-    with pytest.raises(SystemExit):
-        get_service_provider()
-
-
-def test_get_service_provider_bare_repo(mock_repo):
-    """Test invalid repository handling."""
-    mock_repo.bare = True
-    with pytest.raises(SystemExit):
-        get_service_provider()
-
-
 def test_get_service_provider_no_remote(mock_repo):
     """Test handling of missing remote URLs."""
     mock_repo.remote.return_value.urls = iter([])
     with pytest.raises(SystemExit):
-        get_service_provider()
+        get_service_provider(get_run_context())
 
 
 def test_get_service_provider_unsupported_provider(mock_repo):
     """Test unsupported provider handling."""
-    mock_repo.return_value.remote.return_value.urls = iter(["https://unsupported.com/test/repo"])
+    mock_repo.remote.return_value.urls = iter(["https://unsupported.com/test/repo"])
     with pytest.raises(SystemExit):
-        get_service_provider()
+        get_service_provider(get_run_context())
 
 
 # Test print_colored_summary
@@ -161,10 +215,10 @@ def test_print_colored_summary(mock_color_text, capsys):
 
 @patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
 @patch("src.core.git_change_manager.get_service_provider")
-@patch("src.core.git_change_manager.GitService")
+@patch("src.core.git_change_manager.get_run_context")
 @patch("src.core.git_change_manager.TerminalService")
 @patch(
-    "src.service.openai_service.OpenAiService.call",
+    "src.service.openai_service.OpenAiService.stream",
     return_value={
         "branch_name": "test-branch",
         "commit_message": "test commit",
@@ -179,19 +233,19 @@ def test_main(
     mock_browser,
     mock_api_call,
     mock_terminal,
-    mock_git_service,
+    mock_run_context,
     mock_service_provider,
     mock_prompt_file,
-    tmp_path,
+    last_prompt_path,
 ):
     """Test main function with all dependencies mocked."""
     mock_file = MagicMock()
     mock_file.read.return_value = "Mocked Prompt Content"
     mock_open.return_value.__enter__.return_value = mock_file
 
-    mock_git_instance = mock_git_service.return_value
+    mock_git_instance = mock_run_context.return_value.git
     mock_git_instance.get_diff.return_value = ("mock_diff", "mock_untracked")
-    mock_git_instance.sync_branch_and_commit.return_value = None
+    mock_git_instance.commit_changes.return_value = True
 
     mock_service_instance = mock_service_provider.return_value
     mock_service_instance.get_username.return_value = "mock-user"
@@ -204,17 +258,26 @@ def test_main(
     with patch("builtins.input", return_value="Test change description"):
         main()
 
+    mock_context = mock_run_context.return_value
     mock_git_instance.get_diff.assert_called_once()
-    mock_git_instance.sync_branch_and_commit.assert_called_once_with("mock-user/test-branch", "test commit")
+    assert mock_git_instance.get_diff.call_args.args[0]() is mock_context.parent_branch
+    mock_git_instance.commit_changes.assert_called_once_with(
+        "mock-user/test-branch", "test commit", mock_context.active_branch, mock_context.is_dirty
+    )
+    mock_git_instance.push_branch.assert_called_once_with("mock-user/test-branch")
+    mock_service_provider.assert_called_once_with(mock_context)
+    mock_service_instance.prepare_pull_request.assert_called_once_with("mock-user/test-branch")
     mock_service_instance.create_pull_request.assert_called_once_with("mock-user/test-branch", "test PR", "test body")
+    mock_service_instance.assign_pull_request.assert_called_once()
     mock_browser.assert_called_once_with("https://mock-pr-url")
-    mock_open.assert_called_once_with("/mock/path/to/git-change-manager.txt", "r")
+    mock_open.assert_any_call("/mock/path/to/git-change-manager.txt", "r")
+    mock_open.assert_any_call(str(last_prompt_path), "w", encoding="utf-8")
 
 
 @patch("src.core.git_change_manager.open_in_default_browser")
-@patch("src.core.git_change_manager.GitService")
+@patch("src.core.git_change_manager.get_run_context")
 @patch(
-    "src.service.openai_service.OpenAiService.call",
+    "src.service.openai_service.OpenAiService.stream",
     return_value={
         "branch_name": "test-branch",
         "commit_message": "test commit",
@@ -227,14 +290,14 @@ def test_main(
 @patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
 @patch("builtins.open", new_callable=MagicMock)
 def test_main_create_pull_request_params(
-    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_git_service, mock_browser
+    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_run_context, mock_browser
 ):
     """Test that create_pull_request is called with correct parameters."""
     mock_file = MagicMock()
     mock_file.read.return_value = "Test Prompt Content"
     mock_open.return_value.__enter__.return_value = mock_file
 
-    mock_git_instance = mock_git_service.return_value
+    mock_git_instance = mock_run_context.return_value.git
     mock_git_instance.get_diff.return_value = ("mock_diff", "mock_untracked")
 
     mock_service_instance = mock_service_provider.return_value
@@ -252,9 +315,58 @@ def test_main_create_pull_request_params(
 
 
 @patch("src.core.git_change_manager.open_in_default_browser")
-@patch("src.core.git_change_manager.GitService")
+@patch("src.core.git_change_manager.get_run_context")
+@patch(
+    "src.service.openai_service.OpenAiService.stream",
+    return_value={
+        "branch_name": "test-branch",
+        "commit_message": "test commit",
+        "pr_title": "test PR",
+        "pr_body": "test body",
+    },
+)
+@patch("src.core.git_change_manager.TerminalService")
+@patch("src.core.git_change_manager.get_service_provider")
+@patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
+@patch("builtins.open", new_callable=MagicMock)
+def test_main_failed_commit_skips_the_pull_request(
+    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_run_context, mock_browser, capsys
+):
+    """Test that a commit stopped by merge conflicts fails the run before the push and the pull request."""
+    mock_file = MagicMock()
+    mock_file.read.return_value = "Test Prompt Content"
+    mock_open.return_value.__enter__.return_value = mock_file
+
+    mock_git_instance = mock_run_context.return_value.git
+    mock_git_instance.get_diff.return_value = ("mock_diff", "mock_untracked")
+    mock_git_instance.commit_changes.side_effect = ValueError(
+        "Resolve the merge conflicts in app.py before committing."
+    )
+
+    mock_service_instance = mock_service_provider.return_value
+    mock_service_instance.get_username.return_value = "mock-user"
+
+    mock_terminal_instance = mock_terminal.return_value
+    mock_terminal_instance.get_user_choice.return_value = "2"
+    mock_terminal_instance.get_user_input.side_effect = lambda *args: args[1]
+
+    with patch("builtins.input", return_value="Test Change Description"), pytest.raises(SystemExit) as excinfo:
+        main()
+
+    assert excinfo.value.code == 1
+    mock_git_instance.push_branch.assert_not_called()
+    mock_service_instance.create_pull_request.assert_not_called()
+    mock_service_instance.assign_pull_request.assert_not_called()
+    mock_browser.assert_not_called()
+    output = capsys.readouterr().out
+    assert "Resolve the merge conflicts in app.py" in output
+    assert "completed successfully" not in output
+
+
+@patch("src.core.git_change_manager.open_in_default_browser")
+@patch("src.core.git_change_manager.get_run_context")
 @patch(
-    "src.service.openai_service.OpenAiService.call",
+    "src.service.openai_service.OpenAiService.stream",
     return_value={
         "branch_name": "test-branch",
         "commit_message": "test commit",
@@ -267,14 +379,14 @@ def test_main_create_pull_request_params(
 @patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
 @patch("builtins.open", new_callable=MagicMock)
 def test_main_choice_1(
-    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_git_service, mock_browser
+    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_run_context, mock_browser
 ):
     """Test main function for choice 1 (Copy to Clipboard)."""
     mock_file = MagicMock()
     mock_file.read.return_value = "Test Prompt Content"
     mock_open.return_value.__enter__.return_value = mock_file
 
-    mock_git_instance = mock_git_service.return_value
+    mock_git_instance = mock_run_context.return_value.git
     mock_git_instance.get_diff.return_value = ("mock_diff", "mock_untracked")
 
     mock_service_instance = mock_service_provider.return_value
@@ -284,15 +396,15 @@ def test_main_choice_1(
     mock_terminal_instance.get_user_choice.return_value = "1"
     mock_terminal_instance.get_user_input.side_effect = lambda *args: args[1]
     mock_terminal_instance.get_direct_user_input.return_value = (
-        '{"branch_name": "test-branch", "commit_message": "test commit", "pr_title": "test PR", "pr_body": "test body"}'
+        '```json\n{"branch_name": "test-branch", "commit_message": "test commit", "pr_title": "test PR", '
+        '"pr_body": "test body",}\n```'
     )
 
     with patch("pyperclip.copy") as mock_copy:
         with patch("builtins.input", return_value="Test Change Description"):
             main()
 
-        mock_copy.assert_called_once_with(
-            """Test Prompt Content
+        mock_copy.assert_called_once_with("""Test Prompt Content
 Description of the change:
 Test Change Description
 
@@ -301,26 +413,27 @@ mock_diff
 
 Content of untracked files:
 mock_untracked
-"""
-        )
+""")
+    # The fenced response with a trailing comma is repaired locally
+    mock_service_instance.create_pull_request.assert_called_once_with("mock-user/test-branch", "test PR", "test body")
 
 
 @patch("src.core.git_change_manager.open_in_default_browser")
-@patch("src.core.git_change_manager.GitService")
-@patch("src.service.openai_service.OpenAiService.call")
+@patch("src.core.git_change_manager.get_run_context")
+@patch("src.service.openai_service.OpenAiService.stream")
 @patch("src.core.git_change_manager.TerminalService")
 @patch("src.core.git_change_manager.get_service_provider")
 @patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
 @patch("builtins.open", new_callable=MagicMock)
 def test_main_invalid_choice(
-    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_git_service, mock_browser
+    mock_open, mock_prompt, mock_service_provider, mock_terminal, mock_api_call, mock_run_context, mock_browser
 ):
     """Test main function for invalid choice (else clause)."""
     mock_file = MagicMock()
     mock_file.read.return_value = "Test Prompt Content"
     mock_open.return_value.__enter__.return_value = mock_file
 
-    mock_git_instance = mock_git_service.return_value
+    mock_git_instance = mock_run_context.return_value.git
     mock_git_instance.get_diff.return_value = ("mock_diff", "mock_untracked")
 
     mock_terminal_instance = mock_terminal.return_value
@@ -330,3 +443,153 @@ def test_main_invalid_choice(
         with pytest.raises(SystemExit) as excinfo:
             main()
         assert excinfo.value.code == 0
+
+
+@patch("src.core.git_change_manager.open_in_default_browser")
+@patch("src.core.git_change_manager.get_run_context")
+@patch("src.service.openai_service.OpenAiService.complete_async", return_value="- changed a line")
+@patch(
+    "src.service.openai_service.OpenAiService.stream",
+    return_value={
+        "branch_name": "test-branch",
+        "commit_message": "test commit",
+        "pr_title": "test PR",
+        "pr_body": "test body",
+    },
+)
+@patch("src.core.git_change_manager.TerminalService")
+@patch("src.core.git_change_manager.get_service_provider")
+@patch("src.core.git_change_manager.get_prompt_file", return_value="/mock/path/to/git-change-manager.txt")
+@patch("builtins.open", new_callable=MagicMock)
+@pytest.mark.parametrize("map_reduce, threshold", [(True, None), (False, "10")])
+def test_main_map_reduce(
+    mock_open,
+    mock_prompt,
+    mock_service_provider,
+    mock_terminal,
+    mock_api_call,
+    mock_complete,
+    mock_run_context,
+    mock_browser,
+    map_reduce,
+    threshold,
+    monkeypatch,
+):
+    """Test that in map-reduce mode, or above the threshold, the prompt is built from the file summaries."""
+    if threshold:
+        monkeypatch.setenv("AGT_MAP_REDUCE_TOKENS", threshold)
+    mock_file = MagicMock()
+    mock_file.read.return_value = "Test Prompt Content"
+    mock_open.return_value.__enter__.return_value = mock_file
+
+    mock_git_instance = mock_run_context.return_value.git
+    mock_git_instance.get_diff.return_value = ("diff --git a/app.py b/app.py\n@@ -1 +1 @@\n-old\n+new\n", "")
+    mock_git_instance.get_blob_pairs.return_value = {}
+
+    mock_service_provider.return_value.get_username.return_value = "mock-user"
+    mock_terminal_instance = mock_terminal.return_value
+    mock_terminal_instance.get_user_choice.return_value = "2"
+    mock_terminal_instance.get_user_input.side_effect = lambda *args: args[1]
+
+    with patch("builtins.input", return_value="Test Change Description"):
+        main(map_reduce=map_reduce)
+
+    assert mock_git_instance.diff_byte_budget is None
+    mock_prompt.assert_any_call("file-summary.txt")
+    mock_complete.assert_called_once_with(
+        "diff --git a/app.py b/app.py\n@@ -1 +1 @@\n-old\n+new\n", system="Test Prompt Content"
+    )
+    mock_api_call.assert_called_once()
+    assert mock_api_call.call_args.kwargs["system"] == "Test Prompt Content"
+    assert mock_api_call.call_args.args == (
+        """Description of the change:
+Test Change Description
+
+Summary of the changes of each file:
+--- app.py ---
+- changed a line
+
+""",
+    )
+
+
+@patch("src.core.git_change_manager.open_in_default_browser")
+@patch("src.core.git_change_manager.get_run_context")
+@patch(
+    "src.service.openai_service.OpenAiService.stream",
+    return_value={
+        "branch_name": "test-branch",
+        "commit_message": "test commit",
+        "pr_title": "test PR",
+        "pr_body": "test body",
+    },
+)
+@patch("src.core.git_change_manager.TerminalService")
+@patch("src.core.git_change_manager.get_service_provider")
+def test_main_prefetches_while_typing(
+    mock_service_provider, mock_terminal, mock_stream, mock_run_context, mock_browser, mock_prompt_file
+):
+    """Test that the diff and the username are fetched while the user types the description."""
+    fetched = {"diff": threading.Event(), "username": threading.Event()}
+    mock_git_instance = mock_run_context.return_value.git
+    mock_git_instance.get_diff.side_effect = lambda parent: fetched["diff"].set() or ("mock_diff", "")
+    mock_service_instance = mock_service_provider.return_value
+    mock_service_instance.get_username.side_effect = lambda: fetched["username"].set() or "mock-user"
+    mock_terminal_instance = mock_terminal.return_value
+    mock_terminal_instance.get_user_choice.return_value = "2"
+    mock_terminal_instance.get_user_input.side_effect = lambda *args: args[1]
+
+    def type_description(message):
+        assert all(event.wait(5) for event in fetched.values())
+        return "Test change description"
+
+    with patch("builtins.input", side_effect=type_description):
+        main()
+
+    mock_service_instance.get_username.assert_called_once()
+    mock_service_instance.create_pull_request.assert_called_once_with("mock-user/test-branch", "test PR", "test body")
+
+
+@patch("src.core.git_change_manager.open_in_default_browser")
+@patch("src.core.git_change_manager.get_run_context")
+@patch(
+    "src.service.openai_service.OpenAiService.stream",
+    return_value={
+        "branch_name": "test-branch",
+        "commit_message": "test commit",
+        "pr_title": "test PR",
+        "pr_body": "test body",
+    },
+)
+@patch("src.core.git_change_manager.TerminalService")
+@patch("src.core.git_change_manager.get_service_provider")
+def test_main_resume(
+    mock_service_provider,
+    mock_terminal,
+    mock_stream,
+    mock_run_context,
+    mock_browser,
+    mock_prompt_file,
+    last_prompt_path,
+):
+    """Test that a resumed run sends the saved prompt without asking for a description or reading the diff."""
+    last_prompt_path.write_text("Saved prompt")
+    mock_service_provider.return_value.get_username.return_value = "mock-user"
+    mock_terminal_instance = mock_terminal.return_value
+    mock_terminal_instance.get_user_choice.return_value = "2"
+    mock_terminal_instance.get_user_input.side_effect = lambda *args: args[1]
+
+    with patch("builtins.input", side_effect=AssertionError("The description is not asked again")):
+        main(resume=True)
+
+    mock_stream.assert_called_once()
+    assert mock_stream.call_args.args == ("Saved prompt",)
+    mock_run_context.return_value.git.get_diff.assert_not_called()
+    assert last_prompt_path.read_text() == "Saved prompt"
+
+
+def test_load_last_prompt_missing(last_prompt_path):
+    """Test that resuming without a saved prompt exits."""
+    with pytest.raises(SystemExit) as excinfo:
+        load_last_prompt(MagicMock())
+    assert excinfo.value.code == 1
@@ -0,0 +1,171 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.map_reduce import FileSummarizer, format_summaries, get_map_reduce_tokens, group_by_directory
+from src.core.map_reduce import split_by_file, split_summary
+
+DIFF = (
+    "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-old\n+new\n"
+    "diff --git a/lib.py b/lib.py\n--- a/lib.py\n+++ b/lib.py\n@@ -1 +1 @@\n-a\n+b\n"
+    "\ndiff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n@@ -5 +5 @@\n-x\n+y\n"
+)
+UNTRACKED = "\n\n--- Untracked file: new.py ---\nprint('new')"
+
+
+def build_summarizer(llm, pairs, **kwargs):
+    """Build a summarizer sending every file in its own request."""
+    summarizer = FileSummarizer(llm, "Summarize:", pairs, 1000, **kwargs)
+    summarizer.chunk_tokens = 0
+    return summarizer
+
+
+def build_llm():
+    llm = MagicMock()
+    llm.model = "model"
+    llm.complete_async = AsyncMock(side_effect=lambda prompt, system: f"summary {len(prompt)}")
+    return llm
+
+
+def test_split_by_file():
+    """Test that the parts of the diff of a file are kept together, along with the untracked files."""
+    changes = split_by_file(DIFF, UNTRACKED)
+
+    assert list(changes) == ["app.py", "lib.py", "new.py"]
+    assert changes["app.py"][0].count("diff --git a/app.py") == 2
+    assert changes["app.py"][1] == ""
+    assert changes["new.py"] == ("", UNTRACKED)
+
+
+def test_summarize_reuses_cached_summaries():
+    """Test that only the files whose blobs changed since the previous run are sent to the model."""
+    changes = split_by_file(DIFF, UNTRACKED)
+    pairs = {"app.py": ("a1", "a2"), "lib.py": ("l1", "l2"), "new.py": ("0" * 40, "n1")}
+
+    first_llm = build_llm()
+    first = build_summarizer(first_llm, pairs).summarize(changes)
+    assert first_llm.complete_async.call_count == 3
+
+    second_llm = build_llm()
+    pairs["lib.py"] = ("l1", "l3")
+    second = build_summarizer(second_llm, pairs).summarize(changes)
+
+    second_llm.complete_async.assert_called_once()
+    assert second_llm.complete_async.call_args.args[0].startswith("diff --git a/lib.py")
+    assert second_llm.complete_async.call_args.kwargs == {"system": "Summarize:"}
+    assert [label for label, _ in second] == ["app.py", "lib.py", "new.py"]
+    assert second[0] == first[0]
+
+
+def test_summarize_without_cache_or_blobs():
+    """Test that files are summarized again when the cache is disabled or their blobs are unknown."""
+    changes = split_by_file(DIFF, "")
+    llm = build_llm()
+
+    build_summarizer(llm, {}).summarize(changes)
+    build_summarizer(llm, {"app.py": ("a1", "a2")}, use_cache=False).summarize(changes)
+
+    assert llm.complete_async.call_count == 4
+
+
+def test_format_summaries():
+    """Test that every summary is introduced by its path."""
+    assert format_summaries([("a.py", "- one"), ("b.py", "- two")]) == "--- a.py ---\n- one\n\n--- b.py ---\n- two\n\n"
+
+
+def test_get_map_reduce_tokens(monkeypatch):
+    """Test that the threshold is read from the environment and ignored when invalid."""
+    assert get_map_reduce_tokens() is None
+    monkeypatch.setenv("AGT_MAP_REDUCE_TOKENS", "5000")
+    assert get_map_reduce_tokens() == 5000
+    monkeypatch.setenv("AGT_MAP_REDUCE_TOKENS", "many")
+    assert get_map_reduce_tokens() is None
+
+
+def test_group_by_directory():
+    """Test that the small files of a directory share a chunk while it fits."""
+    changes = {
+        "src/a.py": ("a" * 35, ""),
+        "src/b.py": ("b" * 35, ""),
+        "src/c.py": ("c" * 35, ""),
+        "docs/d.md": ("d" * 35, ""),
+        "src/e.py": ("e" * 35, ""),
+    }
+
+    assert group_by_directory(changes, 20) == [["src/a.py", "src/b.py"], ["src/c.py"], ["docs/d.md"], ["src/e.py"]]
+
+
+def test_summarize_grouped_chunk():
+    """Test that a chunk of several files is summarized in a single request and labelled with its files."""
+    llm = build_llm()
+    summaries = FileSummarizer(llm, "Summarize:", {}, 1000).summarize(split_by_file(DIFF, ""))
+
+    llm.complete_async.assert_called_once()
+    assert summaries[0][0] == "app.py, lib.py"
+
+
+def test_summarize_bounded_concurrency():
+    """Test that the chunks are summarized concurrently, up to the maximum concurrency."""
+    running = []
+    peak = []
+
+    async def complete_async(prompt, system):
+        running.append(prompt)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(prompt)
+        return "summary"
+
+    llm = build_llm()
+    llm.complete_async = complete_async
+    changes = {f"dir{index}/file.py": (f"diff {index}", "") for index in range(10)}
+
+    summarizer = FileSummarizer(llm, "Summarize:", {}, 1000, use_cache=False)
+    summarizer.max_concurrency = 3
+    summaries = summarizer.summarize(changes)
+
+    assert max(peak) == 3
+    assert [label for label, _ in summaries] == list(changes)
+
+
+def test_summarize_waits_when_rate_limited():
+    """Test that a rate limited request is tried again after the delay requested by the API."""
+    error = Exception("Rate limit reached")
+    error.status_code = 429
+    error.response = MagicMock(headers={"retry-after": "0.01"})
+
+    llm = build_llm()
+    llm.complete_async = AsyncMock(side_effect=[error, "summary"])
+
+    summaries = FileSummarizer(llm, "Summarize:", {}, 1000).summarize({"app.py": ("diff", "")})
+
+    assert summaries == [("app.py", "summary")]
+    assert llm.complete_async.call_count == 2
+
+
+def test_summarize_caches_grouped_files_one_by_one():
+    """Test that the summary of a chunk is split per file, so a changed file does not resend the files grouped with it."""
+    changes = split_by_file(DIFF, "")
+    pairs = {"app.py": ("a1", "a2"), "lib.py": ("l1", "l2")}
+
+    first_llm = build_llm()
+    first_llm.complete_async = AsyncMock(return_value="--- app.py ---\n- app change\n--- lib.py ---\n- lib change")
+    first = FileSummarizer(first_llm, "Summarize:", pairs, 1000).summarize(changes)
+    assert first == [("app.py", "- app change"), ("lib.py", "- lib change")]
+
+    second_llm = build_llm()
+    pairs["lib.py"] = ("l1", "l3")
+    second = FileSummarizer(second_llm, "Summarize:", pairs, 1000).summarize(changes)
+
+    second_llm.complete_async.assert_called_once()
+    assert "app.py" not in second_llm.complete_async.call_args.args[0]
+    assert second[0] == ("app.py", "- app change")
+    assert second[1][0] == "lib.py"
+
+
+def test_split_summary():
+    """Test that a chunk summary is split on the file headers, and kept whole when they do not match its files."""
+    summary = "--- b.py ---\n- two\n--- a.py ---\n- one"
+
+    assert split_summary(["a.py", "b.py"], summary) == [(["a.py"], "- one"), (["b.py"], "- two")]
+    assert split_summary(["a.py", "c.py"], summary) == [(["a.py", "c.py"], summary)]
+    assert split_summary(["a.py"], "- one") == [(["a.py"], "- one")]
@@ -0,0 +1,62 @@
+import json
+
+from src.core.model_router import Route, choose_route, count_changed_files, record_route
+from src.service.llm_config import LlmConfig
+
+PROMPT = (
+    "Template\n\nGit diff for my changes:\n"
+    "diff --git a/app.py b/app.py\n@@ -1 +1 @@\n-old\n+new\n"
+    "\ndiff --git a/app.py b/app.py\n@@ -3 +3 @@\n-x\n+y\n"
+    "diff --git a/lib.py b/lib.py\n@@ -1 +1 @@\n-a\n+b\n"
+    "\nContent of untracked files:\n\n\n--- Untracked file: new.py ---\nprint()"
+)
+
+
+def test_count_changed_files():
+    """Test that every file is counted once, whether it is in the diff or untracked."""
+    assert count_changed_files(PROMPT) == 3
+
+
+def test_small_change_uses_small_model():
+    """Test that a change below both thresholds goes to the small model."""
+    route = choose_route(LlmConfig(small_model="gpt-4o-mini"), 1200, 3)
+
+    assert (route.name, route.model) == ("small", "gpt-4o-mini")
+    assert route.describe() == "Using gpt-4o-mini (small route): small change, 1200 tokens, 3 file(s)."
+
+
+def test_large_change_uses_configured_model(monkeypatch):
+    """Test that a change above either threshold goes to the configured model."""
+    config = LlmConfig(small_model="gpt-4o-mini")
+
+    assert choose_route(config, 9000, 1).model == "gpt-4o"
+    assert choose_route(config, 100, 11).model == "gpt-4o"
+    assert choose_route(config, 100, None).name == "large"
+
+    monkeypatch.setenv("AGT_SMALL_MODEL_MAX_TOKENS", "20000")
+    monkeypatch.setenv("AGT_SMALL_MODEL_MAX_FILES", "20")
+    assert choose_route(config, 9000, 11).name == "small"
+
+
+def test_without_small_model():
+    """Test that every change goes to the configured model when there is no small model."""
+    route = choose_route(LlmConfig(model="llama-3.1-70b"), 100, 1)
+
+    assert (route.name, route.model) == ("default", "llama-3.1-70b")
+
+
+def test_record_route(tmp_path, monkeypatch):
+    """Test that every route is appended to the route log with the latency it got."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    route = Route("small", "gpt-4o-mini", 1200, 3, "small change")
+
+    record_route(route, {"first_token": 0.4, "total": 2.5, "attempts": 1})
+    record_route(route, {"first_token": 0.6, "total": 3.0, "attempts": 2})
+
+    lines = (tmp_path / "agt" / "metrics" / "routes.jsonl").read_text().splitlines()
+    entries = [json.loads(line) for line in lines]
+    assert [entry["total"] for entry in entries] == [2.5, 3.0]
+    assert entries[0]["route"] == "small"
+    assert entries[0]["model"] == "gpt-4o-mini"
+    assert entries[0]["prompt_tokens"] == 1200
+    assert entries[0]["changed_files"] == 3
@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock, patch
+
+from src.core.git_change_manager import get_run_context
+from src.core.run_context import RunContext
+from src.service.github_service import GitHubService
+
+
+def test_values_are_memoized():
+    """Test that each value is resolved only once."""
+    git_service = MagicMock()
+    git_service.find_parent_branch.return_value = "main"
+    git_service.get_repo_name.return_value = "test-user/test-repo"
+    git_service.repo.remote.return_value.urls = iter(["https://github.com/test-user/test-repo.git"])
+    git_service.get_status.return_value.is_dirty = True
+
+    context = RunContext(git_service)
+
+    for _ in range(3):
+        assert context.parent_branch == "main"
+        assert context.repo_name == "test-user/test-repo"
+        assert context.remote_url == "https://github.com/test-user/test-repo.git"
+        assert context.is_dirty is True
+
+    git_service.find_parent_branch.assert_called_once()
+    git_service.get_repo_name.assert_called_once_with("https://github.com/test-user/test-repo.git")
+    git_service.repo.remote.assert_called_once()
+
+
+def test_git_queries_run_once_per_run(git_repo, git_commands, monkeypatch, tmp_path):
+    """Test that diff collection and pull request creation share a single parent branch detection."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "new.txt").write_text("new\n")
+    (tmp_path / "yarn.lock").write_text("lock\n")
+    context = get_run_context()
+
+    with patch("src.service.github_service.Github") as mock_github:
+        service = GitHubService(context)
+        context.git.get_diff(context.parent_branch)
+        _, untracked_content = context.git.get_diff(context.parent_branch)
+        assert context.is_dirty
+
+        mock_repo = mock_github.return_value.get_repo.return_value
+        mock_repo.get_pulls.return_value = iter([])
+        service.create_pull_request("feature", "Test PR", "This is a test.")
+
+    mock_github.return_value.get_repo.assert_called_once_with("test-user/test-repo")
+    assert mock_repo.create_pull.call_args.kwargs["base"] == "main"
+    assert git_commands.count("rev-list") == 1
+    assert git_commands.count("for-each-ref") == 2
+    # The working tree is scanned once, for both the untracked files and the dirty state
+    assert git_commands.count("status") == 1
+    assert "ls-files" not in git_commands
+    # The ignore rules of the run still apply to the untracked files
+    assert untracked_content == "\n\n--- Untracked file: new.txt ---\nnew\n"
+
+
+def test_scope_is_relative_to_the_repository(git_repo, monkeypatch, tmp_path):
+    """Test that an absolute path limits the changes to the untracked files below it."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "new.txt").write_text("new\n")
+    (tmp_path / "other.txt").write_text("other\n")
+
+    context = get_run_context(str(tmp_path / "dir"))
+
+    assert context.git.pathspecs[0] == "dir"
+    assert context.git._list_untracked_files() == ["dir/new.txt"]
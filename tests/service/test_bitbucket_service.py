@@ -3,12 +3,16 @@ import unittest
 from unittest.mock import patch, MagicMock
 
 import requests
+from src.core.run_context import RunContext
 from src.service.bitbucket_service import BitbucketService
+from src.service.git_service import GitService
 
 
 class TestBitbucketService(unittest.TestCase):
     def setUp(self):
-        self.service = BitbucketService()
+        context = RunContext(GitService())
+        context.remote_url = "https://bitbucket.org/test_project/test_repo.git"
+        self.service = BitbucketService(context)
         self.service.username = "test_user"
         self.service.password = "test_password"
         self.service.api_url = "https://api.bitbucket.org/2.0"
@@ -1,19 +1,62 @@
-from unittest.mock import patch, MagicMock, mock_open
+import io
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
 
 import pytest
+from git import GitCommandError
 from src.service.git_service import GitService
+from src.utils.file_utils import read_text_sample
 
 
 # Fixture for mocking Repo
 @pytest.fixture
-def mock_repo():
+def mock_repo(tmp_path):
     """Patch Repo to return a mock instance."""
     with patch("src.service.git_service.Repo") as mock_repo:
         mock_repo_instance = MagicMock()
+        mock_repo_instance.git_dir = str(tmp_path)
+        mock_repo_instance.common_dir = str(tmp_path)
+        mock_repo_instance.head.commit.hexsha = "sha_head"
+        mock_repo_instance.active_branch.name = "feature-branch"
         mock_repo.return_value = mock_repo_instance
         yield mock_repo_instance
 
 
+# The configuration every patch is read with
+PATCH_ENV = {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "core.quotePath", "GIT_CONFIG_VALUE_0": "false"}
+
+
+def fake_process(output):
+    """Build a git process streaming the given output."""
+    process = MagicMock()
+    process.proc.stdout = io.BytesIO(output.encode("utf-8"))
+    return process
+
+
+def fake_diff(numstat="1\t1\tfile.py\0"):
+    """Build a git diff side effect answering the numstat pre-pass and streaming one patch per kind of diff."""
+
+    def diff(*args, as_process=False, env=None):
+        if "--numstat" in args:
+            return numstat
+        if "--cached" in args:
+            return fake_process("staged diff")
+        if "main...HEAD" in args:
+            return fake_process("branch diff")
+        return fake_process("unstaged diff")
+
+    return diff
+
+
+def porcelain_status(*untracked, changed=()):
+    """Build the output of ``git status --porcelain=v2 -z --branch`` for the given files."""
+    records = ["# branch.oid sha_head", "# branch.head feature-branch"]
+    records += [f"1 .M N... 100644 100644 100644 {'a' * 40} {'a' * 40} {path}" for path in changed]
+    records += [f"? {path}" for path in untracked]
+    return "".join(f"{record}\0" for record in records)
+
+
 def build_git_service(mock_repo):
     service = GitService()
     service.repo = mock_repo
@@ -22,47 +65,166 @@ def build_git_service(mock_repo):
 
 
 def test_find_parent_branch_success(mock_repo):
-    """Test finding the parent branch successfully."""
-    # Set up active branch
+    """Test finding the parent branch from the nearest fork point."""
+    mock_repo.active_branch.name = "feature-branch"
+
+    mock_repo.git.for_each_ref.side_effect = [
+        "sha_develop develop\nsha_feature feature-branch\nsha_main main",
+        "develop\nmain",
+    ]
+    mock_repo.git.rev_list.return_value = "300 sha_feature\n200 -sha_develop\n100 -sha_main"
+
+    git_service = build_git_service(mock_repo)
+    parent_branch = git_service.find_parent_branch()
+
+    assert parent_branch == "develop"
+    mock_repo.git.rev_list.assert_called_once_with(
+        "--boundary", "--timestamp", "HEAD", "--not", "--exclude=feature-branch", "--branches"
+    )
+    mock_repo.git.for_each_ref.assert_called_with("--contains=sha_develop", "--format=%(refname:short)", "refs/heads/")
+
+
+def test_find_parent_branch_constant_git_calls(mock_repo):
+    """Test that the number of git calls does not depend on the number of branches."""
     mock_repo.active_branch.name = "feature-branch"
 
-    # Set up mock branches
-    main_branch = MagicMock()
-    develop_branch = MagicMock()
-    main_branch.name = "main"
-    develop_branch.name = "develop"
-    mock_repo.heads = [main_branch, develop_branch]
+    branches = [f"branch-{i:03d}" for i in range(500)]
+    mock_repo.git.for_each_ref.side_effect = [
+        "\n".join(f"sha_{name} {name}" for name in branches),
+        "branch-042\nbranch-100",
+    ]
+    mock_repo.git.rev_list.return_value = "300 sha_feature\n200 -sha_branch-100"
+
+    git_service = build_git_service(mock_repo)
+    parent_branch = git_service.find_parent_branch()
 
-    # Mock merge_base behavior
-    mock_repo.git.merge_base.side_effect = lambda a, b: {
-        ("feature-branch", "main"): "merge_base_main",
-        ("feature-branch", "develop"): "merge_base_develop",
-    }[(a, b)]
+    assert parent_branch == "branch-100"
+    assert mock_repo.git.for_each_ref.call_count == 2
+    assert mock_repo.git.rev_list.call_count == 1
+    mock_repo.git.merge_base.assert_not_called()
+    mock_repo.commit.assert_not_called()
 
-    # Mock commit behavior
-    mock_repo.commit.side_effect = lambda commit: {
-        "merge_base_main": MagicMock(committed_date=100),
-        "merge_base_develop": MagicMock(committed_date=200),
-    }[commit]
 
-    # Create GitService and test
+def test_find_parent_branch_head_reachable_from_other_branch(mock_repo):
+    """Test that HEAD itself is the fork point when it has no unique commits."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.head.commit.hexsha = "sha_head"
+
+    mock_repo.git.for_each_ref.side_effect = ["sha_head main\nsha_other develop", "develop\nmain"]
+    mock_repo.git.rev_list.return_value = ""
+
     git_service = build_git_service(mock_repo)
     parent_branch = git_service.find_parent_branch()
 
-    assert parent_branch == "develop"
+    assert parent_branch == "main"
+
+
+def test_find_parent_branch_include_remotes(mock_repo):
+    """Test that origin remote-tracking branches are considered when requested."""
+    mock_repo.active_branch.name = "feature-branch"
+
+    mock_repo.git.for_each_ref.side_effect = [
+        "sha_head feature-branch\nsha_head origin/feature-branch\nsha_main origin/HEAD\nsha_main origin/main",
+        "origin/main",
+    ]
+    mock_repo.git.rev_list.return_value = "300 sha_head\n200 -sha_main"
+
+    git_service = build_git_service(mock_repo)
+    parent_branch = git_service.find_parent_branch(include_remotes=True)
+
+    assert parent_branch == "origin/main"
+    mock_repo.git.rev_list.assert_called_once_with(
+        "--boundary",
+        "--timestamp",
+        "HEAD",
+        "--not",
+        "--exclude=feature-branch",
+        "--branches",
+        "--exclude=origin/feature-branch",
+        "--exclude=origin/HEAD",
+        "--remotes=origin",
+    )
+
+
+def test_find_parent_branch_no_other_branches(mock_repo):
+    """Test finding the parent branch when the current branch is the only one."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.return_value = "sha_feature feature-branch"
+
+    git_service = build_git_service(mock_repo)
+    parent_branch = git_service.find_parent_branch()
+
+    assert parent_branch is None
+    mock_repo.git.rev_list.assert_not_called()
 
 
 def test_find_parent_branch_no_merge_base(mock_repo):
     """Test finding the parent branch with no valid merge base."""
     mock_repo.active_branch.name = "feature-branch"
-    mock_repo.heads = [MagicMock(name="main")]
+    mock_repo.git.for_each_ref.return_value = "sha_main main"
+    mock_repo.git.rev_list.return_value = "300 sha_feature\n200 sha_root"
 
-    mock_repo.git.merge_base.side_effect = Exception("No merge base")
     git_service = build_git_service(mock_repo)
     parent_branch = git_service.find_parent_branch()
     assert parent_branch is None
 
 
+def test_find_parent_branch_git_error(mock_repo):
+    """Test finding the parent branch when a git command fails."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.side_effect = GitCommandError("for-each-ref", 128)
+
+    git_service = build_git_service(mock_repo)
+    parent_branch = git_service.find_parent_branch()
+    assert parent_branch is None
+
+
+def test_find_parent_branch_uses_cache(mock_repo):
+    """Test that a repeated lookup with unchanged HEAD and refs skips the ref walk."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.side_effect = ["sha_main main", "main"]
+    mock_repo.git.rev_list.return_value = "300 sha_head\n200 -sha_main"
+
+    assert build_git_service(mock_repo).find_parent_branch() == "main"
+    assert build_git_service(mock_repo).find_parent_branch() == "main"
+
+    assert mock_repo.git.for_each_ref.call_count == 2
+    assert mock_repo.git.rev_list.call_count == 1
+
+
+def test_find_parent_branch_cache_invalidated_by_head(mock_repo):
+    """Test that moving HEAD invalidates the cached parent branch."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.side_effect = ["sha_main main", "main", "sha_develop develop", "develop"]
+    mock_repo.git.rev_list.side_effect = ["300 sha_head\n200 -sha_main", "400 sha_new\n300 -sha_develop"]
+
+    assert build_git_service(mock_repo).find_parent_branch() == "main"
+    mock_repo.head.commit.hexsha = "sha_new"
+    assert build_git_service(mock_repo).find_parent_branch() == "develop"
+
+
+def test_find_parent_branch_cache_invalidated_by_refs(mock_repo, tmp_path):
+    """Test that updating a branch ref invalidates the cached parent branch."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.side_effect = ["sha_main main", "main", "sha_develop develop", "develop"]
+    mock_repo.git.rev_list.side_effect = ["300 sha_head\n200 -sha_main", "300 sha_head\n250 -sha_develop"]
+
+    assert build_git_service(mock_repo).find_parent_branch() == "main"
+    (tmp_path / "refs" / "heads").mkdir(parents=True)
+    (tmp_path / "refs" / "heads" / "develop").write_text("sha_develop\n")
+    assert build_git_service(mock_repo).find_parent_branch() == "develop"
+
+
+def test_find_parent_branch_without_cache(mock_repo, tmp_path):
+    """Test that the cache is neither read nor written when disabled."""
+    mock_repo.active_branch.name = "feature-branch"
+    mock_repo.git.for_each_ref.side_effect = ["sha_main main", "main"]
+    mock_repo.git.rev_list.return_value = "300 sha_head\n200 -sha_main"
+
+    assert build_git_service(mock_repo).find_parent_branch(use_cache=False) == "main"
+    assert not (tmp_path / "agt").exists()
+
+
 # Test get_repo_name
 def test_get_repo_name_https(mock_repo):
     """Test extracting repository name from HTTPS URL."""
@@ -92,27 +254,100 @@ def test_get_repo_name_invalid_url(mock_repo):
 
 
 # Test get_diff
-@patch("src.service.git_service.os.path.isfile", return_value=True)
-@patch("src.service.git_service.open", new_callable=mock_open, read_data="untracked content")
-def test_get_diff(mock_open, mock_isfile, mock_repo):
+def test_get_diff(mock_repo, tmp_path, monkeypatch):
     """Test retrieving Git diffs."""
-    mock_repo.git.diff.side_effect = ["unstaged diff", "staged diff", "branch diff"]
-    mock_repo.untracked_files = ["untracked_file.txt"]
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "untracked_file.txt").write_text("untracked content")
+    mock_repo.git.diff.side_effect = fake_diff()
+    mock_repo.git.status.return_value = porcelain_status("untracked_file.txt")
 
     git_service = build_git_service(mock_repo)
-    diff, untracked_content = git_service.get_diff()
+    diff, untracked_content = git_service.get_diff("main")
     assert "unstaged diff" in diff
     assert "staged diff" in diff
     assert "branch diff" in diff
+    mock_repo.git.diff.assert_any_call("main...HEAD", as_process=True, env=PATCH_ENV)
     assert "--- Untracked file: untracked_file.txt ---" in untracked_content
     assert "untracked content" in untracked_content
 
 
+def test_get_diff_skips_binary_untracked_files(mock_repo, tmp_path, monkeypatch, capsys):
+    """Test that binary untracked files are detected from their first bytes and skipped."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00" + b"text" * 10_000)
+    (tmp_path / "notes.txt").write_text("notes")
+    mock_repo.git.diff.side_effect = ["", "", ""]
+    mock_repo.git.status.return_value = porcelain_status("image.png", "notes.txt")
+
+    _, untracked_content = build_git_service(mock_repo).get_diff("main")
+
+    assert "image.png" not in untracked_content
+    assert "--- Untracked file: notes.txt ---\nnotes" in untracked_content
+    assert "Skipping binary file: image.png" in capsys.readouterr().out
+
+
+def test_get_diff_samples_large_untracked_files(mock_repo, tmp_path, monkeypatch):
+    """Test that untracked files over the per-file budget keep only their head and tail."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dump.sql").write_text("HEAD" + "x" * 10_000 + "TAIL")
+    mock_repo.git.diff.side_effect = ["", "", ""]
+    mock_repo.git.status.return_value = porcelain_status("dump.sql")
+
+    git_service = build_git_service(mock_repo)
+    git_service.untracked_file_budget = 100
+    _, untracked_content = git_service.get_diff("main")
+
+    assert untracked_content.startswith("\n\n--- Untracked file: dump.sql ---\nHEAD")
+    assert untracked_content.endswith("TAIL")
+    assert "[9908 bytes omitted]" in untracked_content
+    assert len(untracked_content) < 200
+
+
+def test_get_diff_untracked_total_budget(mock_repo, tmp_path, monkeypatch):
+    """Test that untracked files beyond the total budget are only listed by name."""
+    monkeypatch.chdir(tmp_path)
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (tmp_path / name).write_text(name * 20)
+    mock_repo.git.diff.side_effect = ["", "", ""]
+    mock_repo.git.status.return_value = porcelain_status("a.txt", "b.txt", "c.txt")
+
+    git_service = build_git_service(mock_repo)
+    git_service.untracked_total_budget = 150
+    _, untracked_content = git_service.get_diff("main")
+
+    assert "--- Untracked file: a.txt ---\n" + "a.txt" * 20 in untracked_content
+    assert "--- Untracked file: b.txt ---\n" in untracked_content
+    assert "--- Untracked file: c.txt (omitted, content budget exhausted) ---" in untracked_content
+    assert "c.txtc.txt" not in untracked_content
+
+
+def test_untracked_reads_ahead_stay_within_the_total_budget(tmp_path, monkeypatch):
+    """Test that files are only read ahead while their per-file budgets fit in what is left of the total budget."""
+    monkeypatch.chdir(tmp_path)
+    names = [f"{index:03}.txt" for index in range(100)]
+    for name in names:
+        (tmp_path / name).write_text("x" * 50)
+    read = []
+
+    def record(path, budget):
+        read.append(path)
+        return read_text_sample(path, budget)
+
+    git_service = GitService()
+    git_service.untracked_file_budget = 100
+    git_service.untracked_total_budget = 500
+    with patch("src.service.git_service.read_text_sample", side_effect=record), ThreadPoolExecutor(8) as executor:
+        untracked_content = git_service._collect_untracked_content(names, executor)
+
+    assert untracked_content.count("x" * 50) == 10
+    assert len(read) == 10
+
+
 @patch("src.service.git_service.os.path.isfile", return_value=False)
 def test_get_diff_no_untracked_files(mock_isfile, mock_repo):
     """Test retrieving Git diffs with no untracked files."""
-    mock_repo.git.diff.side_effect = ["unstaged diff", "staged diff", "branch diff"]
-    mock_repo.untracked_files = []
+    mock_repo.git.diff.side_effect = fake_diff()
+    mock_repo.git.status.return_value = porcelain_status()
 
     git_service = build_git_service(mock_repo)
     diff, untracked_content = git_service.get_diff()
@@ -122,49 +357,294 @@ def test_get_diff_no_untracked_files(mock_isfile, mock_repo):
     assert untracked_content == ""
 
 
-# Test sync_branch_and_commit
-def test_sync_branch_and_commit_new_branch(mock_repo):
-    """Test syncing branch and committing changes to a new branch."""
+# Test commit_changes
+def test_commit_changes_new_branch(mock_repo):
+    """Test committing changes to a new branch."""
     mock_repo.active_branch.name = "main"
-    mock_repo.is_dirty.return_value = True
+    mock_repo.git.status.return_value = porcelain_status(changed=["file.py"])
 
     git_service = build_git_service(mock_repo)
-    git_service.sync_branch_and_commit("new-feature-branch", "Commit message")
+    assert git_service.commit_changes("new-feature-branch", "Commit message") is True
 
     # Assertions for new branch creation
     mock_repo.git.checkout.assert_called_once_with("-b", "new-feature-branch")
-    mock_repo.git.push.assert_any_call("-u", "origin", "new-feature-branch")
     mock_repo.git.add.assert_called_once_with(A=True)
     mock_repo.git.commit.assert_called_once_with("-m", "Commit message")
-    mock_repo.git.push.assert_any_call()
+    # The push is left to the caller
+    mock_repo.git.push.assert_not_called()
 
 
-def test_sync_branch_and_commit_rename_branch(mock_repo):
+def test_commit_changes_rename_branch(mock_repo):
     """Test renaming the current branch."""
     mock_repo.active_branch.name = "old-feature-branch"
-    mock_repo.is_dirty.return_value = True
+    mock_repo.git.status.return_value = porcelain_status(changed=["file.py"])
 
     git_service = build_git_service(mock_repo)
 
-    git_service.sync_branch_and_commit("new-feature-branch", "Commit message")
+    assert git_service.commit_changes("new-feature-branch", "Commit message") is True
 
     # Assertions for branch rename
     mock_repo.git.branch.assert_called_once_with("-m", "new-feature-branch")
-    mock_repo.git.push.assert_any_call("-u", "origin", "new-feature-branch")
     mock_repo.git.add.assert_called_once_with(A=True)
     mock_repo.git.commit.assert_called_once_with("-m", "Commit message")
-    mock_repo.git.push.assert_any_call()
 
 
-def test_sync_branch_and_commit_no_changes(mock_repo):
-    """Test syncing branch with no changes."""
-    mock_repo.active_branch.name = "main"
-    mock_repo.is_dirty.return_value = False
+def test_commit_changes_no_changes(mock_repo):
+    """Test that a clean working tree is not committed, the branch still having to be pushed once created."""
+    mock_repo.git.status.return_value = porcelain_status()
 
     git_service = build_git_service(mock_repo)
 
-    git_service.sync_branch_and_commit("new-feature-branch", "Commit message")
+    assert git_service.commit_changes("feature-branch", "Commit message") is False
+    assert git_service.commit_changes("new-feature-branch", "Commit message", current_branch="main") is True
 
     # No changes should result in no Git commands being called
     mock_repo.git.add.assert_not_called()
     mock_repo.git.commit.assert_not_called()
+
+
+def test_commit_changes_with_known_state(mock_repo):
+    """Test that a known branch and status are not queried from the repository again."""
+    mock_repo.index.diff.return_value = ["change"]
+    mock_repo.git.status.return_value = porcelain_status(changed=["file.py"])
+
+    git_service = build_git_service(mock_repo)
+    git_service.get_status()
+    git_service.commit_changes(
+        "new-feature-branch", "Commit message", current_branch="old-feature-branch", is_dirty=True
+    )
+
+    mock_repo.git.status.assert_called_once()
+    mock_repo.git.branch.assert_called_once_with("-m", "new-feature-branch")
+    mock_repo.git.commit.assert_called_once_with("-m", "Commit message")
+
+
+def test_commit_changes_with_conflicts(mock_repo):
+    """Test that unresolved merge conflicts fail the commit, leaving the branch untouched."""
+    mock_repo.active_branch.name = "main"
+    mock_repo.git.status.return_value = (
+        f"u UU N... 100644 100644 100644 100644 {'a' * 40} {'b' * 40} {'c' * 40} app.py\0"
+    )
+
+    with pytest.raises(ValueError, match="Resolve the merge conflicts in app.py"):
+        build_git_service(mock_repo).commit_changes("new-feature-branch", "Commit message")
+
+    mock_repo.git.checkout.assert_not_called()
+    mock_repo.git.add.assert_not_called()
+    mock_repo.git.commit.assert_not_called()
+
+
+def test_push_branch(mock_repo):
+    """Test that the branch is pushed once, setting its upstream."""
+    build_git_service(mock_repo).push_branch("new-feature-branch")
+
+    mock_repo.git.push.assert_called_once_with("-u", "origin", "new-feature-branch")
+
+
+@patch("src.service.git_service.Repo")
+def test_repo_opened_on_first_use(mock_repo_class):
+    """Test that the repository is opened lazily and only once."""
+    git_service = GitService()
+    mock_repo_class.assert_not_called()
+
+    assert git_service.repo is mock_repo_class.return_value
+    assert git_service.repo is mock_repo_class.return_value
+    mock_repo_class.assert_called_once()
+
+
+def test_get_diff_with_pathspecs(mock_repo, tmp_path, monkeypatch):
+    """Test that the scope and ignore rules are passed to git as pathspecs."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    for path in ["src/new.py", "src/yarn.lock", "other.py"]:
+        (tmp_path / path).write_text("print()")
+    mock_repo.git.diff.side_effect = fake_diff()
+    mock_repo.git.status.return_value = porcelain_status("src/new.py", "src/yarn.lock", "other.py")
+
+    git_service = GitService(mock_repo, ["src", ":(exclude,glob)**/*.lock"])
+    diff, untracked_content = git_service.get_diff("main")
+
+    pathspec_args = ("--", "src", ":(exclude,glob)**/*.lock")
+    mock_repo.git.diff.assert_any_call("--numstat", "-z", *pathspec_args)
+    mock_repo.git.diff.assert_any_call(*pathspec_args, as_process=True, env=PATCH_ENV)
+    mock_repo.git.diff.assert_any_call("--cached", *pathspec_args, as_process=True, env=PATCH_ENV)
+    mock_repo.git.diff.assert_any_call("main...HEAD", *pathspec_args, as_process=True, env=PATCH_ENV)
+    mock_repo.git.ls_files.assert_not_called()
+    assert untracked_content == "\n\n--- Untracked file: src/new.py ---\nprint()"
+
+
+def test_get_diff_numstat_decides_patch_size(mock_repo):
+    """Test that large files get a zero-context patch and huge or binary files only a summary."""
+    numstat = "3\t1\tsmall.py\0" "1500\t0\tmedium.py\0" "90000\t10\tdump.sql\0" "-\t-\timage.png\0"
+    mock_repo.git.diff.side_effect = lambda *args, **kwargs: (
+        numstat if "--numstat" in args else fake_process(f"patch {args}\n")
+    )
+    mock_repo.git.status.return_value = porcelain_status()
+
+    git_service = build_git_service(mock_repo)
+    diff = git_service._assemble_diff(git_service._fetch_diff(("--cached",), None))
+
+    mock_repo.git.diff.assert_any_call(
+        "--cached",
+        "--",
+        ".",
+        ":(exclude,literal)medium.py",
+        ":(exclude,literal)dump.sql",
+        ":(exclude,literal)image.png",
+        as_process=True,
+        env=PATCH_ENV,
+    )
+    mock_repo.git.diff.assert_any_call("-U0", "--cached", "--", ":(literal)medium.py", as_process=True, env=PATCH_ENV)
+    assert mock_repo.git.diff.call_count == 3
+    assert "diff --git a/dump.sql b/dump.sql\nPatch omitted, 90000 lines added and 10 lines removed\n" in diff
+    assert "diff --git a/image.png b/image.png\nBinary files differ\n" in diff
+
+
+def test_get_diff_numstat_without_changes(mock_repo):
+    """Test that no patch is requested when the numstat pre-pass reports no changes."""
+    mock_repo.git.diff.return_value = ""
+
+    git_service = build_git_service(mock_repo)
+    assert git_service._assemble_diff(git_service._fetch_diff((), None)) == ""
+    mock_repo.git.diff.assert_called_once_with("--numstat", "-z")
+
+
+def test_parse_numstat_renames():
+    """Test parsing renamed files from the numstat output."""
+    entries = GitService._parse_numstat("0\t0\t\0src/a.py\0src/b.py\0-\t-\tbin.dat\0")
+    assert entries == [(0, 0, ["src/a.py", "src/b.py"]), (None, None, ["bin.dat"])]
+
+
+def test_stream_diff_yields_headers_and_hunks(mock_repo):
+    """Test that the diff is streamed one file header or hunk at a time."""
+    patch_text = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a\n+b\n@@ -5 +5 @@\n-c\n+d\n"
+    process = fake_process(patch_text)
+    mock_repo.git.diff.return_value = process
+
+    chunks = list(build_git_service(mock_repo)._stream_diff("--cached"))
+
+    assert chunks == [
+        "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n",
+        "@@ -1 +1 @@\n-a\n+b\n",
+        "@@ -5 +5 @@\n-c\n+d\n",
+    ]
+    mock_repo.git.diff.assert_called_once_with("--cached", as_process=True, env=PATCH_ENV)
+    process.wait.assert_called_once()
+    process.proc.kill.assert_not_called()
+
+
+def test_get_diff_resolves_parent_branch_concurrently(mock_repo):
+    """Test that a parent branch given as a function is resolved by the collector before the branch diff."""
+    mock_repo.git.diff.side_effect = lambda *args, **kwargs: "" if "--numstat" in args else fake_process("")
+    mock_repo.git.status.return_value = porcelain_status()
+
+    build_git_service(mock_repo).get_diff(lambda: "develop")
+
+    mock_repo.git.diff.assert_any_call("--numstat", "-z", "develop...HEAD")
+
+
+def test_get_diff_budget_is_spent_in_order(mock_repo):
+    """Test that the diffs read concurrently share the diff budget as if they were read in turn."""
+    patch_text = "diff --git a/a.py b/a.py\n@@ -1 +1 @@\n-old\n+new\n"
+    mock_repo.git.diff.side_effect = lambda *args, **kwargs: (
+        "1\t1\ta.py\0" if "--numstat" in args else fake_process(patch_text)
+    )
+    mock_repo.git.status.return_value = porcelain_status()
+
+    git_service = build_git_service(mock_repo)
+    git_service.diff_byte_budget = 60
+    diff, _ = git_service.get_diff("main")
+
+    summary = "diff --git a/a.py b/a.py\nPatch omitted, 1 lines added and 1 lines removed\n"
+    truncated = "[Diff truncated to fit the prompt budget]\n"
+    assert diff == f"{patch_text}\n{truncated}\n{summary}\n{summary}"
+
+
+def test_get_diff_stops_git_when_budget_is_full(mock_repo):
+    """Test that git is stopped once the diff budget is used and unread files are summarized."""
+    numstat = "1\t1\ta.py\0" "1\t1\tb.py\0" "1\t1\tc.py\0"
+    patch_text = "".join(
+        f"diff --git a/{name} b/{name}\n@@ -1 +1 @@\n-old\n+new\n" for name in ["a.py", "b.py", "c.py"]
+    )
+    process = fake_process(patch_text)
+    mock_repo.git.diff.side_effect = lambda *args, **kwargs: numstat if "--numstat" in args else process
+
+    git_service = build_git_service(mock_repo)
+    git_service._diff_bytes_left = 60
+    diff = git_service._assemble_diff(git_service._fetch_diff(("--cached",), 60))
+
+    assert diff.startswith(
+        "diff --git a/a.py b/a.py\n@@ -1 +1 @@\n-old\n+new\n[Diff truncated to fit the prompt budget]\n"
+    )
+    assert "diff --git a/b.py b/b.py\nPatch omitted, 1 lines added and 1 lines removed\n" in diff
+    assert "diff --git a/c.py b/c.py\nPatch omitted, 1 lines added and 1 lines removed\n" in diff
+    assert "diff --git a/a.py b/a.py\nPatch omitted" not in diff
+    process.proc.kill.assert_called_once()
+    process.wait.assert_not_called()
+    assert git_service._diff_bytes_left == 0
+
+
+def test_get_diff_matches_quoted_paths(mock_repo):
+    """Test that files whose paths git quotes or that contain ' b/' are matched with the pre-pass."""
+    numstat = "1\t1\tcafé.py\0" "1\t1\ta b/c.py\0" "1\t1\td.py\0"
+    patch_text = (
+        'diff --git "a/caf\\303\\251.py" "b/caf\\303\\251.py"\n--- "a/caf\\303\\251.py"\n+++ "b/caf\\303\\251.py"\n'
+        "@@ -1 +1 @@\n-old\n+new\n"
+        "diff --git a/a b/c.py b/a b/c.py\n--- a/a b/c.py\t\n+++ b/a b/c.py\t\n@@ -1 +1 @@\n-old\n+new\n"
+        "diff --git a/d.py b/d.py\n--- a/d.py\n+++ b/d.py\n@@ -1 +1 @@\n-old\n+new\n"
+    )
+    mock_repo.git.diff.side_effect = lambda *args, **kwargs: (
+        numstat if "--numstat" in args else fake_process(patch_text)
+    )
+
+    git_service = build_git_service(mock_repo)
+    assert git_service._assemble_diff(git_service._fetch_diff(("--cached",), None)) == patch_text
+
+    git_service._diff_bytes_left = patch_text.index("diff --git a/d.py")
+    diff = git_service._assemble_diff(git_service._fetch_diff(("--cached",), None))
+    assert diff.count("Patch omitted") == 1
+    assert "diff --git a/d.py b/d.py\nPatch omitted, 1 lines added and 1 lines removed\n" in diff
+
+
+def test_get_blob_pairs(mock_repo, tmp_path, monkeypatch):
+    """Test that changed files are identified by their blobs at the fork point and in the working tree."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "modified.py").write_text("new")
+    (tmp_path / "staged.py").write_text("staged")
+    (tmp_path / "new.py").write_text("untracked")
+    (tmp_path / "dump.sql").write_text("x" * 200)
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\0")
+    mock_repo.git.merge_base.return_value = "sha_base"
+    mock_repo.git.diff.return_value = (
+        f":100644 100644 {'a' * 40} {'0' * 40} M\0modified.py\0"
+        f":000000 100644 {'0' * 40} {'b' * 40} A\0staged.py\0"
+        f":100644 000000 {'c' * 40} {'0' * 40} D\0deleted.py\0"
+    )
+    mock_repo.git.status.return_value = porcelain_status("new.py", "dump.sql", "image.png")
+    process = mock_repo.git.hash_object.return_value
+    process.proc.communicate.return_value = (f"{'d' * 40}\n{'e' * 40}\n".encode(), b"")
+    process.proc.returncode = 0
+
+    git_service = build_git_service(mock_repo)
+    git_service.untracked_file_budget = 100
+    pairs = git_service.get_blob_pairs("develop")
+
+    mock_repo.git.merge_base.assert_called_once_with("develop", "HEAD")
+    mock_repo.git.diff.assert_called_once_with("--raw", "-z", "--no-renames", "--no-abbrev", "sha_base")
+    # The paths are written to git, large and binary untracked files are not read at all
+    mock_repo.git.hash_object.assert_called_once_with("--stdin-paths", istream=subprocess.PIPE, as_process=True)
+    process.proc.communicate.assert_called_once_with(b"modified.py\nnew.py\n")
+    assert pairs == {
+        "modified.py": ("a" * 40, "d" * 40),
+        "staged.py": ("0" * 40, "b" * 40),
+        "deleted.py": ("c" * 40, "0" * 40),
+        "new.py": ("0" * 40, "e" * 40),
+    }
+
+
+def test_get_blob_pairs_git_error(mock_repo):
+    """Test that no file is identified when the fork point cannot be found."""
+    mock_repo.git.merge_base.side_effect = GitCommandError("merge-base", 1)
+
+    assert build_git_service(mock_repo).get_blob_pairs() == {}
+    mock_repo.git.merge_base.assert_called_once_with("main", "HEAD")
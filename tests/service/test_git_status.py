@@ -0,0 +1,71 @@
+from git import Repo
+from src.service.git_service import GitService
+from src.service.git_status import StatusSnapshot
+
+SHA = "a" * 40
+
+OUTPUT = (
+    f"# branch.oid {SHA}\0"
+    "# branch.head feature\0"
+    "# branch.upstream origin/feature\0"
+    "# branch.ab +1 -0\0"
+    f"1 M. N... 100644 100644 100644 {SHA} {SHA} staged.py\0"
+    f"1 .M N... 100644 100644 100644 {SHA} {SHA} path with spaces.py\0"
+    f"2 R. N... 100644 100644 100644 {SHA} {SHA} R100 new name.py\0old name.py\0"
+    f"u UU N... 100644 100644 100644 100644 {SHA} {SHA} {SHA} conflict.py\0"
+    "? notes.txt\0"
+    "! build/\0"
+)
+
+
+def test_parse():
+    """Test that every kind of entry is parsed, including paths with spaces and the original path of renames."""
+    status = StatusSnapshot.parse(OUTPUT)
+
+    assert (status.branch, status.head) == ("feature", SHA)
+    assert [entry.path for entry in status.entries] == [
+        "staged.py",
+        "path with spaces.py",
+        "new name.py",
+        "conflict.py",
+        "notes.txt",
+        "build/",
+    ]
+    assert status.untracked == ["notes.txt"]
+    assert status.renames == {"new name.py": "old name.py"}
+    assert status.conflicts == ["conflict.py"]
+    assert status.has_staged_changes and status.has_unstaged_changes and status.is_dirty
+
+
+def test_parse_clean_detached_head():
+    """Test that a clean working tree on a detached HEAD of an empty repository is reported as such."""
+    status = StatusSnapshot.parse("# branch.oid (initial)\0# branch.head (detached)\0")
+
+    assert (status.branch, status.head) == (None, None)
+    assert not status.is_dirty
+    assert not status.has_staged_changes and not status.has_unstaged_changes
+
+
+def test_parse_ignored_files_only():
+    """Test that ignored files do not make the working tree dirty."""
+    assert not StatusSnapshot.parse("! build/\0").is_dirty
+
+
+def test_get_status(git_repo, tmp_path):
+    """Test that the status is read once, with the untracked cache enabled unless the repository configures it."""
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "new.txt").write_text("new\n")
+
+    git = GitService(git_repo)
+    status = git.get_status()
+
+    assert git.get_status() is status
+    assert status.branch == "feature"
+    assert status.untracked == ["dir/new.txt"]
+    assert status.has_unstaged_changes and not status.has_staged_changes
+    # git added the untracked cache to the index while reading the status
+    assert b"UNTR" in (tmp_path / ".git" / "index").read_bytes()
+    assert git._status_config_env()["GIT_CONFIG_KEY_0"] == "core.untrackedCache"
+
+    git_repo.git.config("core.untrackedCache", "false")
+    assert GitService(Repo(tmp_path))._status_config_env() == {}
@@ -9,7 +9,7 @@ def github_service():
     """Fixture to initialize GitHubService with mocked parameters."""
     with patch("src.service.github_service.Github") as MockGithub:
         mock_github_instance = MockGithub.return_value
-        yield GitHubService(), mock_github_instance
+        yield GitHubService(MagicMock()), mock_github_instance
 
 
 def test_validate_environment_with_token(github_service):
@@ -45,13 +45,11 @@ def test_get_username_without_token(github_service):
         assert username is None
 
 
-@patch("src.service.github_service.GitService")
-def test_create_pull_request_existing_pr(mock_git_service, github_service):
+def test_create_pull_request_existing_pr(github_service):
     """Test create_pull_request with an existing pull request."""
     service, mock_github = github_service
-    mock_git = mock_git_service.return_value
-    mock_git.get_repo_name.return_value = "test-user/test-repo"
-    mock_git.find_parent_branch.return_value = "main"
+    service.context.repo_name = "test-user/test-repo"
+    service.context.parent_branch = "main"
 
     with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
         mock_repo = MagicMock()
@@ -68,13 +66,11 @@ def test_create_pull_request_existing_pr(mock_git_service, github_service):
         mock_pr.edit.assert_called_once_with(title="Test PR", body="This is a test.")
 
 
-@patch("src.service.github_service.GitService")
-def test_create_pull_request_new_pr(mock_git_service, github_service):
+def test_create_pull_request_new_pr(github_service):
     """Test create_pull_request when no existing PR is found."""
     service, mock_github = github_service
-    mock_git = mock_git_service.return_value
-    mock_git.get_repo_name.return_value = "test-user/test-repo"
-    mock_git.find_parent_branch.return_value = "main"
+    service.context.repo_name = "test-user/test-repo"
+    service.context.parent_branch = "main"
 
     with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
         mock_repo = MagicMock()
@@ -94,13 +90,11 @@ def test_create_pull_request_new_pr(mock_git_service, github_service):
         )
 
 
-@patch("src.service.github_service.GitService")
-def test_create_pull_request_failure(mock_git_service, github_service):
+def test_create_pull_request_failure(github_service):
     """Test create_pull_request when an exception occurs."""
     service, mock_github = github_service
-    mock_git = mock_git_service.return_value
-    mock_git.get_repo_name.return_value = "test-user/test-repo"
-    mock_git.find_parent_branch.return_value = "main"
+    service.context.repo_name = "test-user/test-repo"
+    service.context.parent_branch = "main"
 
     with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
         mock_github.get_repo.side_effect = Exception("GitHub API error")
@@ -109,10 +103,47 @@ def test_create_pull_request_failure(mock_git_service, github_service):
         assert result is None
 
 
-@patch("src.service.github_service.GitService")
-def test_create_pull_request_no_token(mock_git_service, github_service):
+def test_create_pull_request_no_token(github_service):
     """Test create_pull_request when GITHUB_TOKEN is not set."""
     service, _ = github_service
     with patch.dict(os.environ, {}, clear=True):
         result = service.create_pull_request("feature-branch", "Test PR", "This is a test.")
         assert result is None
+
+
+def test_create_pull_request_prepared(github_service):
+    """Test that the lookups prepared while the branch is pushed are reused, and the new PR assigned afterwards."""
+    service, mock_github = github_service
+    service.context.repo_name = "test-user/test-repo"
+    service.context.parent_branch = "main"
+
+    with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
+        mock_repo = mock_github.get_repo.return_value
+        mock_repo.owner.login = "test-user"
+        mock_repo.get_pulls.return_value = iter([])
+        mock_github.get_user.return_value.login = "test-user"
+
+        service.get_username()
+        service.prepare_pull_request("feature-branch")
+        service.create_pull_request("feature-branch", "Test PR", "This is a test.")
+        service.assign_pull_request()
+
+        mock_github.get_repo.assert_called_once_with("test-user/test-repo")
+        mock_repo.get_pulls.assert_called_once()
+        mock_repo.create_pull.return_value.add_to_assignees.assert_called_once_with("test-user")
+        mock_github.get_user.assert_called_once()
+
+
+def test_assign_pull_request_existing_pr(github_service):
+    """Test that an existing pull request keeps its assignees."""
+    service, mock_github = github_service
+    service.context.parent_branch = "main"
+
+    with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
+        mock_pr = MagicMock()
+        mock_github.get_repo.return_value.get_pulls.return_value = iter([mock_pr])
+
+        service.create_pull_request("feature-branch", "Test PR", "This is a test.")
+        service.assign_pull_request()
+
+        mock_pr.add_to_assignees.assert_not_called()
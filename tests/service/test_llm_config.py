@@ -0,0 +1,35 @@
+from src.service.llm_config import DEFAULT_MODEL, LlmConfig
+
+
+def test_from_env_defaults(monkeypatch):
+    """Test that OpenAI and the default model are used when nothing is configured."""
+    config = LlmConfig.from_env()
+
+    assert config.is_openai
+    assert config.model == DEFAULT_MODEL
+    assert config.api_key == "fake-key"
+    assert config.label == "OpenAI"
+
+
+def test_from_env_local_server(monkeypatch):
+    """Test that a base URL, a model and a key select an OpenAI-compatible server."""
+    monkeypatch.setenv("AGT_LLM_BASE_URL", "http://localhost:8080/v1")
+    monkeypatch.setenv("AGT_LLM_MODEL", "qwen2.5-coder")
+    monkeypatch.setenv("AGT_LLM_API_KEY", "local-key")
+
+    config = LlmConfig.from_env()
+
+    assert not config.is_openai
+    assert (config.model, config.api_key) == ("qwen2.5-coder", "local-key")
+    assert config.label == "qwen2.5-coder at http://localhost:8080/v1"
+
+
+def test_small_model(monkeypatch):
+    """Test that the small model defaults to gpt-4o-mini only for the default OpenAI model."""
+    assert LlmConfig.from_env().small_model == "gpt-4o-mini"
+
+    monkeypatch.setenv("AGT_LLM_MODEL", "o3")
+    assert LlmConfig.from_env().small_model is None
+
+    monkeypatch.setenv("AGT_LLM_SMALL_MODEL", "o4-mini")
+    assert LlmConfig.from_env().small_model == "o4-mini"
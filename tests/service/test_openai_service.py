@@ -1,7 +1,22 @@
+import asyncio
+import http.server
+import json
 import os
+import threading
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
-from src.service.openai_service import OpenAiService
+from src.service.llm_config import LlmConfig
+from src.service.openai_service import RESPONSE_FORMAT, OpenAiService
+
+
+def stream_chunks(*contents):
+    """Build the chunks of a streamed completion."""
+    chunks = [MagicMock(choices=[], usage=None)]
+    for content in contents:
+        chunks.append(MagicMock(choices=[MagicMock(delta=MagicMock(content=content))], usage=None))
+    return chunks
 
 
 def test_no_api_key():
@@ -13,28 +28,37 @@ def test_no_api_key():
 
 
 @patch("src.service.openai_service.openai.OpenAI")
-def test_call_success(mock_openai):
-    """Test a successful API call."""
+def test_stream_success(mock_openai):
+    """Test a successful streamed request."""
     mock_response = MagicMock()
-    mock_response.chat.completions.create.return_value = MagicMock(
-        choices=[MagicMock(message=MagicMock(content='{"key": "value"}'))]
-    )
+    mock_response.chat.completions.create.return_value = stream_chunks('{"key": ', '"value"}')
     mock_openai.return_value = mock_response
 
     with patch.dict(os.environ, {"OPENAI_API_KEY": "fake-key"}):
         service = OpenAiService()
-        response = service.call("Test prompt")
+        response = service.stream("Test prompt").result()
 
     assert response == {"key": "value"}
     mock_response.chat.completions.create.assert_called_once_with(
         model="gpt-4o",
         messages=[{"role": "user", "content": "Test prompt"}],
+        response_format=RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True},
     )
 
 
 @patch("src.service.openai_service.openai.OpenAI")
-def test_call_api_error(mock_openai):
-    """Test API call when an error occurs."""
+def test_stream_repairs_response(mock_openai):
+    """Test that a response with a formatting mistake is repaired instead of failing the run."""
+    mock_openai.return_value.chat.completions.create.return_value = stream_chunks('Sure:\n{"key": "value",}\n')
+
+    assert OpenAiService(use_cache=False).stream("Test prompt").result() == {"key": "value"}
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_api_error(mock_openai):
+    """Test a streamed request when an error occurs."""
     mock_response = MagicMock()
     mock_response.chat.completions.create.side_effect = Exception("API Error")
     mock_openai.return_value = mock_response
@@ -42,10 +66,313 @@ def test_call_api_error(mock_openai):
     with patch.dict(os.environ, {"OPENAI_API_KEY": "fake-key"}):
         service = OpenAiService()
         with pytest.raises(SystemExit) as excinfo:
-            service.call("Test prompt")
+            service.stream("Test prompt").result()
 
         assert excinfo.value.code == 1
     mock_response.chat.completions.create.assert_called_once_with(
         model="gpt-4o",
         messages=[{"role": "user", "content": "Test prompt"}],
+        response_format=RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_uses_cached_response(mock_openai):
+    """Test that an identical prompt is answered from the cache without calling the API again."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = lambda **kwargs: stream_chunks('```json\n{"key": "value"}\n```')
+
+    first = OpenAiService().stream("Test prompt").result()
+    service = OpenAiService()
+    second = service.stream("Test prompt").result()
+
+    assert first == second == {"key": "value"}
+    mock_client.chat.completions.create.assert_called_once()
+    assert (service.cache.hits, service.cache.misses) == (1, 0)
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_without_cache(mock_openai):
+    """Test that the API is called for every prompt when the cache is disabled."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = lambda **kwargs: stream_chunks('{"key": "value"}')
+
+    service = OpenAiService(use_cache=False)
+    service.stream("Test prompt").result()
+    service.stream("Test prompt").result()
+
+    assert service.cache is None
+    assert mock_client.chat.completions.create.call_count == 2
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_publishes_fields_as_they_complete(mock_openai):
+    """Test that the fields of a streamed response are readable before the response is complete."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.return_value = stream_chunks(
+        '```json\n{"branch_name": "feat-x", ', '"pr_body": "## Desc', 'ription"}\n```'
     )
+
+    service = OpenAiService()
+    response = service.stream("Test prompt")
+
+    assert response.get("branch_name") == "feat-x"
+    assert response.result() == {"branch_name": "feat-x", "pr_body": "## Description"}
+    assert list(service.metrics["fields"]) == ["branch_name", "pr_body"]
+    assert service.metrics["first_token"] <= service.metrics["fields"]["branch_name"] <= service.metrics["total"]
+    assert service.describe_metrics().startswith("Response timings: first token ")
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_error_is_raised_to_the_reader(mock_openai):
+    """Test that an API error in the background is raised where the response is read."""
+    mock_openai.return_value.chat.completions.create.side_effect = Exception("API Error")
+
+    response = OpenAiService().stream("Test prompt")
+
+    with pytest.raises(SystemExit) as excinfo:
+        response.get("branch_name")
+    assert excinfo.value.code == 1
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_cached_response(mock_openai):
+    """Test that a cached response is returned complete, without starting a request."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = lambda **kwargs: stream_chunks('{"key": "value"}')
+    OpenAiService().stream("Test prompt").result()
+
+    service = OpenAiService()
+    response = service.stream("Test prompt")
+
+    assert response.result() == {"key": "value"}
+    mock_client.chat.completions.create.assert_called_once()
+    assert service.describe_metrics() is None
+
+
+def api_error(status_code, headers=None):
+    """Build an error of the API answering with the given status."""
+    error = Exception(f"Error code: {status_code}")
+    error.status_code = status_code
+    error.response = MagicMock(headers=headers or {})
+    return error
+
+
+@patch("src.service.openai_service.time.sleep")
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_retries_transient_errors(mock_openai, mock_sleep):
+    """Test that rate limits and server errors are retried, honouring the delay requested by the API."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = [
+        api_error(429, {"retry-after": "3"}),
+        api_error(502),
+        stream_chunks('{"key": "value"}'),
+    ]
+
+    service = OpenAiService(use_cache=False)
+
+    assert service.stream("Test prompt").result() == {"key": "value"}
+    assert mock_client.chat.completions.create.call_count == 3
+    assert mock_sleep.call_args_list[0].args == (3.0,)
+    assert service.metrics["attempts"] == 3
+
+
+@patch("src.service.openai_service.time.sleep")
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_is_not_retried_once_a_field_is_published(mock_openai, mock_sleep):
+    """Test that a stream failing after its first field is not retried, the field being possibly in use already."""
+
+    def interrupted():
+        yield from stream_chunks('{"branch_name": "feat-x", ')
+        raise ConnectionError("Connection reset")
+
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = [interrupted(), stream_chunks('{"branch_name": "feat-y"}')]
+
+    response = OpenAiService(use_cache=False).stream("Test prompt")
+
+    assert response.get("branch_name") == "feat-x"
+    with pytest.raises(SystemExit):
+        response.result()
+    mock_client.chat.completions.create.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+@patch("src.service.openai_service.time.sleep")
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_does_not_retry_client_errors(mock_openai, mock_sleep):
+    """Test that an error that would fail again, such as an invalid request, is not retried."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = api_error(400)
+
+    with pytest.raises(SystemExit):
+        OpenAiService(use_cache=False).stream("Test prompt").result()
+
+    mock_client.chat.completions.create.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+@patch("src.service.openai_service.time.sleep")
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_gives_up_after_max_attempts(mock_openai, mock_sleep):
+    """Test that the run exits once every attempt failed."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = api_error(503)
+
+    with pytest.raises(SystemExit):
+        OpenAiService(use_cache=False).stream("Test prompt").result()
+
+    assert mock_client.chat.completions.create.call_count == OpenAiService.max_attempts
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_hedges_slow_requests(mock_openai):
+    """Test that a second request is sent when the first token is slower than usual, the fastest one being used."""
+    slow_stream = MagicMock()
+    slow_stream.__iter__.side_effect = lambda: (time.sleep(0.3), iter(stream_chunks('{"key": "slow"}')))[1]
+    fast_stream = MagicMock()
+    fast_stream.__iter__.side_effect = lambda: iter(stream_chunks('{"key": "fast"}'))
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = [slow_stream, fast_stream]
+
+    service = OpenAiService(use_cache=False, hedge=True)
+    for _ in range(10):
+        service.latency.record(0.05)
+
+    assert service.stream("Test prompt").result() == {"key": "fast"}
+    assert service.metrics["hedged"]
+    time.sleep(0.4)
+    slow_stream.close.assert_called_once()
+    fast_stream.close.assert_not_called()
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_without_latency_history_is_not_hedged(mock_openai):
+    """Test that requests are not hedged until enough latencies were recorded to tell what is slow."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = lambda **kwargs: stream_chunks('{"key": "value"}')
+
+    service = OpenAiService(use_cache=False, hedge=True)
+    service.stream("Test prompt").result()
+
+    mock_client.chat.completions.create.assert_called_once()
+    assert not service.metrics["hedged"]
+    assert len(service.latency.samples()) == 1
+
+
+@pytest.fixture
+def local_server():
+    """Serve a stand-in for a local OpenAI-compatible server, answering every completion with the same content."""
+    requests = []
+    answer = {"content": '{"branch_name": "feat-local", "commit_message": "feat: local"}'}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests.append((self.path, self.headers["Authorization"], body))
+            self.send_response(200)
+            content = answer["content"]
+            if body.get("stream"):
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for index in range(0, len(content), 16):
+                    delta = {"choices": [{"index": 0, "delta": {"content": content[index : index + 16]}}]}
+                    self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+            else:
+                message = {"role": "assistant", "content": content}
+                response = {"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+                encoded = json.dumps(response).encode("utf-8")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", requests, answer
+    server.shutdown()
+
+
+def test_local_server(local_server, monkeypatch):
+    """Test that an OpenAI-compatible server selected by its base URL is used, without an OpenAI key."""
+    base_url, requests, _ = local_server
+    monkeypatch.delenv("OPENAI_API_KEY")
+    monkeypatch.setenv("AGT_LLM_BASE_URL", base_url)
+    monkeypatch.setenv("AGT_LLM_MODEL", "llama-3.1-8b")
+
+    service = OpenAiService(use_cache=False)
+    response = service.stream("Test prompt").result()
+
+    assert response == {"branch_name": "feat-local", "commit_message": "feat: local"}
+    assert asyncio.run(service.complete_async("Summarize")) == json.dumps(response)
+    path, authorization, body = requests[0]
+    assert path == "/v1/chat/completions"
+    assert authorization == "Bearer unused"
+    assert body["model"] == "llama-3.1-8b"
+    assert body["stream"] is True
+    assert "response_format" not in body
+
+
+def test_local_server_multiline_body(local_server):
+    """Test that a local server writing raw newlines in the PR body, without structured outputs, is understood."""
+    base_url, _, answer = local_server
+    answer["content"] = '{"branch_name": "feat-x", "commit_message": "feat: x", "pr_body": "## Description\nStuff"}'
+
+    response = OpenAiService(use_cache=False, config=LlmConfig(base_url=base_url)).stream("Test prompt")
+
+    assert response.get("branch_name") == "feat-x"
+    assert response.get("pr_body") == "## Description\nStuff"
+    assert response.result()["commit_message"] == "feat: x"
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_cache_is_kept_per_endpoint(mock_openai):
+    """Test that the same prompt sent to another server is not answered from the cache of the first one."""
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.side_effect = lambda **kwargs: stream_chunks('{"key": "value"}')
+
+    OpenAiService().stream("Test prompt").result()
+    OpenAiService(config=LlmConfig(base_url="http://localhost:8080/v1")).stream("Test prompt").result()
+
+    assert mock_client.chat.completions.create.call_count == 2
+    assert mock_openai.call_args.kwargs["base_url"] == "http://localhost:8080/v1"
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_reports_metrics_on_completion(mock_openai):
+    """Test that the metrics of a streamed response are reported once it is complete."""
+    mock_openai.return_value.chat.completions.create.return_value = stream_chunks('{"key": "value"}')
+    completed = []
+
+    service = OpenAiService(use_cache=False)
+    service.model = "gpt-4o-mini"
+    service.stream("Test prompt", on_complete=completed.append).result()
+
+    assert completed[0]["attempts"] == 1
+    assert completed[0]["total"] is not None
+    assert mock_openai.return_value.chat.completions.create.call_args.kwargs["model"] == "gpt-4o-mini"
+
+
+@patch("src.service.openai_service.openai.OpenAI")
+def test_stream_sends_system_prefix_and_reports_cached_tokens(mock_openai):
+    """Test that the template is sent as a system message and the prompt tokens read from the cache are reported."""
+    usage = MagicMock(prompt_tokens=1200, prompt_tokens_details=MagicMock(cached_tokens=1024))
+    chunks = stream_chunks('{"key": "value"}') + [MagicMock(choices=[], usage=usage)]
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.return_value = chunks
+
+    service = OpenAiService(use_cache=False)
+    assert service.stream("Test prompt", system="Template").result() == {"key": "value"}
+
+    assert mock_client.chat.completions.create.call_args.kwargs["messages"] == [
+        {"role": "system", "content": "Template"},
+        {"role": "user", "content": "Test prompt"},
+    ]
+    assert (service.metrics["prompt_tokens"], service.metrics["cached_tokens"]) == (1200, 1024)
+    assert "1024 of 1200 prompt tokens cached" in service.describe_metrics()
@@ -1,3 +1,4 @@
+import os
 import subprocess
 import sys
 from unittest.mock import patch
@@ -18,7 +19,7 @@ def test_display_help(capsys):
     assert "Examples:" in captured.out
 
 
-@patch("main.git_change_manager.main")
+@patch("src.core.git_change_manager.main")
 def test_main_help_flag(mock_git_change_manager, capsys):
     """
     Test the main function when the help flag is passed.
@@ -39,7 +40,7 @@ def test_main_help_flag(mock_git_change_manager, capsys):
     mock_git_change_manager.assert_not_called()
 
 
-@patch("main.git_change_manager.main")
+@patch("src.core.git_change_manager.main")
 def test_main_no_args(mock_git_change_manager):
     """
     Test the main function when no arguments are passed.
@@ -49,10 +50,46 @@ def test_main_no_args(mock_git_change_manager):
         main()
 
     # Ensure git_change_manager.main() is called
-    mock_git_change_manager.assert_called_once()
+    mock_git_change_manager.assert_called_once_with(path=None, use_cache=True, map_reduce=False, resume=False)
+
+
+@patch("src.core.git_change_manager.main")
+def test_main_path_option(mock_git_change_manager):
+    """
+    Test that the --path option is passed to the change manager.
+    """
+    test_args = ["main.py", "--path", "services/api"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    mock_git_change_manager.assert_called_once_with(path="services/api", use_cache=True, map_reduce=False, resume=False)
+
+
+@patch("src.core.git_change_manager.main")
+def test_main_no_cache_option(mock_git_change_manager):
+    """
+    Test that the --no-cache option disables the response cache of the change manager.
+    """
+    test_args = ["main.py", "--no-cache"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    mock_git_change_manager.assert_called_once_with(path=None, use_cache=False, map_reduce=False, resume=False)
 
 
-@patch("main.git_change_manager.main", side_effect=subprocess.CalledProcessError(1, "mocked_command"))
+@patch("src.core.git_change_manager.main")
+def test_main_resume_option(mock_git_change_manager):
+    """
+    Test that the --resume option is passed to the change manager.
+    """
+    test_args = ["main.py", "--resume"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    mock_git_change_manager.assert_called_once_with(path=None, use_cache=True, map_reduce=False, resume=True)
+
+
+@patch("src.core.git_change_manager.main", side_effect=subprocess.CalledProcessError(1, "mocked_command"))
 def test_main_git_change_manager_error(mock_git_change_manager, capsys):
     """
     Test the main function when git_change_manager.main() raises a CalledProcessError.
@@ -69,7 +106,7 @@ def test_main_git_change_manager_error(mock_git_change_manager, capsys):
     mock_git_change_manager.assert_called_once()
 
 
-@patch("main.git_change_manager.main", side_effect=Exception("Unexpected error"))
+@patch("src.core.git_change_manager.main", side_effect=Exception("Unexpected error"))
 def test_main_unexpected_error(mock_git_change_manager, capsys):
     """
     Test the main function when git_change_manager.main() raises an unexpected exception.
@@ -81,3 +118,20 @@ def test_main_unexpected_error(mock_git_change_manager, capsys):
 
     # Verify git_change_manager.main() was called
     mock_git_change_manager.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "module, unexpected",
+    [
+        ("src.main", ["git", "openai", "github", "pyperclip", "requests"]),
+        ("src.core.git_change_manager", ["openai", "github", "pyperclip", "requests"]),
+    ],
+)
+def test_heavy_modules_not_imported_at_startup(module, unexpected):
+    """
+    Test that provider SDKs are only imported once their service is picked.
+    """
+    code = f"import sys, {module}; print(','.join(name for name in {unexpected!r} if name in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
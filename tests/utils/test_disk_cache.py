@@ -0,0 +1,80 @@
+import os
+import time
+
+from src.utils.disk_cache import DiskCache, get_cache_dir, make_cache_key
+
+
+def test_get_cache_dir(monkeypatch, tmp_path):
+    """Test that the caches live under XDG_CACHE_HOME."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert get_cache_dir("responses") == os.path.join(str(tmp_path), "agt", "responses")
+
+
+def test_make_cache_key():
+    """Test that keys depend on the content only, not on the order of dictionary keys."""
+    assert make_cache_key({"a": 1, "b": 2}) == make_cache_key({"b": 2, "a": 1})
+    assert make_cache_key({"a": 1}) != make_cache_key({"a": 2})
+
+
+def test_get_and_set(tmp_path):
+    """Test that stored values are read back and lookups are counted."""
+    cache = DiskCache(str(tmp_path))
+
+    assert cache.get("key") is None
+    cache.set("key", {"value": 1})
+
+    assert cache.get("key") == {"value": 1}
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats() == "1 hit(s), 1 miss(es)"
+
+
+def test_expired_entry(tmp_path):
+    """Test that entries older than the maximum age are removed instead of returned."""
+    cache = DiskCache(str(tmp_path), max_age=60)
+    cache.set("key", "value")
+    old = time.time() - 120
+    os.utime(tmp_path / "key.json", (old, old))
+
+    assert cache.get("key") is None
+    assert not (tmp_path / "key.json").exists()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Test that reading an entry protects it from the eviction of the least recently used entries."""
+    cache = DiskCache(str(tmp_path), max_entries=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+    for name, age in [("first", 20), ("second", 10)]:
+        os.utime(tmp_path / f"{name}.json", (time.time() - age, time.time() - age))
+
+    assert cache.get("first") == 1
+    cache.set("third", 3)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["first.json", "third.json"]
+
+
+def test_evicts_beyond_max_bytes(tmp_path):
+    """Test that the oldest entries are evicted once the cache exceeds its size."""
+    cache = DiskCache(str(tmp_path), max_bytes=150)
+    cache.set("old", "x" * 100)
+    old = time.time() - 10
+    os.utime(tmp_path / "old.json", (old, old))
+    cache.set("new", "y" * 100)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["new.json"]
+
+
+def test_directory_is_scanned_once_while_entries_fit(tmp_path, monkeypatch):
+    """Test that writes only scan the cache directory again once the entries counted in memory exceed the limits."""
+    scandir = os.scandir
+    scans = []
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+    cache = DiskCache(str(tmp_path), max_entries=10)
+
+    for index in range(10):
+        cache.set(f"key-{index}", index)
+    assert len(scans) == 1
+
+    cache.set("key-10", 10)
+    assert len(scans) == 2
+    assert len(list(tmp_path.iterdir())) == 10
@@ -0,0 +1,18 @@
+from src.utils.env import get_int_env
+
+
+def test_get_int_env(monkeypatch, capsys):
+    """Test that an integer setting falls back to its default when it is not set or invalid."""
+    monkeypatch.delenv("AGT_TEST_SETTING", raising=False)
+    assert get_int_env("AGT_TEST_SETTING", 10) == 10
+
+    monkeypatch.setenv("AGT_TEST_SETTING", "25")
+    assert get_int_env("AGT_TEST_SETTING", 10) == 25
+
+    monkeypatch.setenv("AGT_TEST_SETTING", "many")
+    assert get_int_env("AGT_TEST_SETTING", 10) == 10
+    assert get_int_env("AGT_TEST_SETTING", None) is None
+    assert capsys.readouterr().out.splitlines() == [
+        "Invalid AGT_TEST_SETTING value 'many', using 10.",
+        "Invalid AGT_TEST_SETTING value 'many', ignoring it.",
+    ]
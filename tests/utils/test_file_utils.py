@@ -0,0 +1,25 @@
+import os
+
+from src.utils.file_utils import write_file_atomic
+
+
+def test_write_file_atomic(tmp_path):
+    """Test that the file is replaced through a temporary file of its own, which does not stay behind."""
+    path = tmp_path / "cache" / "entry.json"
+
+    assert write_file_atomic(str(path), "first", "write the entry")
+    assert write_file_atomic(str(path), "second", "write the entry")
+
+    assert path.read_text() == "second"
+    assert os.listdir(tmp_path / "cache") == ["entry.json"]
+
+
+def test_write_file_atomic_failure(tmp_path, capsys):
+    """Test that a failed write is reported and leaves no temporary file."""
+    path = tmp_path / "entry.json"
+    path.mkdir()
+
+    assert not write_file_atomic(str(path), "content", "write the entry")
+
+    assert capsys.readouterr().out.startswith("Unable to write the entry: ")
+    assert os.listdir(tmp_path) == ["entry.json"]
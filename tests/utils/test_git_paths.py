@@ -0,0 +1,16 @@
+from src.utils.git_paths import diff_header_path, unquote_path
+
+
+def test_unquote_path():
+    """Test that the octal and backslash escapes of a quoted path are decoded."""
+    assert unquote_path('"caf\\303\\251 \\"x\\"\\t.py"') == 'café "x"\t.py'
+    assert unquote_path("plain.py") == "plain.py"
+
+
+def test_diff_header_path():
+    """Test that the path is read from the lines of the header that name the changed side."""
+    assert diff_header_path("diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n") == "a.py"
+    assert diff_header_path("diff --git a/old.py b/new.py\nrename from old.py\nrename to new.py\n") == "new.py"
+    assert diff_header_path("diff --git a/gone.py b/gone.py\n--- a/gone.py\n+++ /dev/null\n") == "gone.py"
+    assert diff_header_path("diff --git a/x b/y.py b/x b/y.py\nBinary files differ\n") == "x b/y.py"
+    assert diff_header_path('diff --git "a/\\303\\251.py" "b/\\303\\251.py"\nnew mode 100755\n') == "é.py"
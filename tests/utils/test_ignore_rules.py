@@ -0,0 +1,55 @@
+from src.utils.ignore_rules import (
+    DEFAULT_IGNORE_PATTERNS,
+    build_pathspecs,
+    filter_by_pathspecs,
+    load_ignore_patterns,
+    to_exclude_pathspecs,
+)
+
+
+def test_load_ignore_patterns_defaults(tmp_path):
+    """Test that the built-in patterns are used when there is no .agtignore file."""
+    assert load_ignore_patterns(str(tmp_path)) == DEFAULT_IGNORE_PATTERNS
+
+
+def test_load_ignore_patterns_from_file(tmp_path):
+    """Test reading patterns, comments and negations from .agtignore."""
+    (tmp_path / ".agtignore").write_text("# generated code\n\n*_pb2.py\nvendor/\n!*.lock\n!not-listed\n")
+
+    patterns = load_ignore_patterns(str(tmp_path))
+
+    assert "*.lock" not in patterns
+    assert "package-lock.json" in patterns
+    assert patterns[-2:] == ["*_pb2.py", "vendor/"]
+    assert "# generated code" not in patterns
+    assert "!not-listed" not in patterns
+
+
+def test_to_exclude_pathspecs():
+    """Test translating gitignore patterns into exclude pathspecs."""
+    assert to_exclude_pathspecs("*.lock") == [":(exclude,glob)**/*.lock", ":(exclude,glob)**/*.lock/**"]
+    assert to_exclude_pathspecs("vendor/") == [":(exclude,glob)**/vendor/**"]
+    assert to_exclude_pathspecs("/build") == [":(exclude,glob)build", ":(exclude,glob)build/**"]
+    assert to_exclude_pathspecs("docs/*.svg") == [":(exclude,glob)docs/*.svg", ":(exclude,glob)docs/*.svg/**"]
+    assert to_exclude_pathspecs("**/snapshots/") == [":(exclude,glob)**/snapshots/**"]
+
+
+def test_build_pathspecs():
+    """Test that the scope comes first, followed by the exclusions."""
+    assert build_pathspecs() == ["."]
+    assert build_pathspecs("services/api", ["vendor/"]) == ["services/api", ":(exclude,glob)**/vendor/**"]
+
+
+def test_filter_by_pathspecs():
+    """Test that paths are selected like git selects them with the pathspecs of a run."""
+    paths = ["src/app.py", "src/yarn.lock", "src/vendor/lib.py", "docs/logo.svg", "docs/api/logo.svg", "srcx.py"]
+
+    assert filter_by_pathspecs(paths, build_pathspecs()) == paths
+    assert filter_by_pathspecs(paths, build_pathspecs("src/", ["*.lock", "vendor/"])) == ["src/app.py"]
+    assert filter_by_pathspecs(paths, build_pathspecs(None, ["docs/*.svg"])) == [
+        "src/app.py",
+        "src/yarn.lock",
+        "src/vendor/lib.py",
+        "docs/api/logo.svg",
+        "srcx.py",
+    ]
@@ -0,0 +1,32 @@
+import pytest
+from src.utils.json_repair import parse_json_response, repair_json
+
+EXPECTED = {"branch_name": "feat-x", "pr_body": "## Description\nText, with {braces}"}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"branch_name": "feat-x", "pr_body": "## Description\\nText, with {braces}"}',
+        '```json\n{"branch_name": "feat-x", "pr_body": "## Description\\nText, with {braces}"}\n```',
+        'Here it is:\n{"branch_name": "feat-x", "pr_body": "## Description\\nText, with {braces}"}\nDone.',
+        '{"branch_name": "feat-x", "pr_body": "## Description\\nText, with {braces}",\n}',
+        '{"branch_name": "feat-x", "pr_body": "## Description\nText, with {braces}"}',
+        '{"branch_name": "feat-x", "pr_body": "## Description\\nText, with {braces}',
+    ],
+    ids=["valid", "fenced", "surrounded", "trailing-comma", "raw-line-break", "truncated"],
+)
+def test_parse_json_response(text):
+    """Test that the usual formatting mistakes of a response are repaired."""
+    assert parse_json_response(text) == EXPECTED
+
+
+def test_repair_json_nested_trailing_commas():
+    """Test that trailing commas are removed at every level, but not within strings."""
+    assert repair_json('{"labels": ["a", "b",], "text": "a,]",}') == '{"labels": ["a", "b"], "text": "a,]"}'
+
+
+def test_parse_json_response_without_object():
+    """Test that a response without any object is rejected."""
+    with pytest.raises(ValueError):
+        parse_json_response("Sorry, I cannot help with that.")
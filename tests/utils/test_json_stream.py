@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from src.utils.json_stream import JsonFieldExtractor
+
+RESPONSE = (
+    '```json\n{\n  "branch_name": "feat-add-\\"quoted\\"-name",\n  "count": 12,\n'
+    '  "labels": ["a", "b, c"],\n  "nested": {"key": "}"},\n  "pr_body": "## Description\\nText"\n}\n```'
+)
+
+
+def test_feed_whole_text():
+    """Test that every field is extracted from a complete response, whatever the type of its value."""
+    fields = JsonFieldExtractor().feed(RESPONSE)
+
+    assert dict(fields) == json.loads(RESPONSE.strip("`").removeprefix("json"))
+    assert [name for name, _ in fields] == ["branch_name", "count", "labels", "nested", "pr_body"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7])
+def test_feed_in_chunks(size):
+    """Test that splitting the text anywhere, even within escapes, gives the same fields."""
+    extractor = JsonFieldExtractor()
+    fields = []
+    for start in range(0, len(RESPONSE), size):
+        fields.extend(extractor.feed(RESPONSE[start : start + size]))
+
+    assert fields == JsonFieldExtractor().feed(RESPONSE)
+    assert extractor.text == RESPONSE
+
+
+def test_field_is_returned_once_complete():
+    """Test that a field is only returned by the chunk that completes its value."""
+    extractor = JsonFieldExtractor()
+
+    assert extractor.feed('{"branch_name": "feat-') == []
+    assert extractor.feed('x", "commit_message": "feat: x') == [("branch_name", "feat-x")]
+    assert extractor.feed('"}') == [("commit_message", "feat: x")]
+    assert extractor.feed('{"ignored": "after the object"}') == []
+
+
+def test_feed_raw_control_characters():
+    """Test that strings with raw newlines, as local models often write them, are extracted."""
+    fields = JsonFieldExtractor().feed('{"branch_name": "feat-x", "pr_body": "## Description\n\tStuff"}')
+
+    assert fields == [("branch_name", "feat-x"), ("pr_body", "## Description\n\tStuff")]
+
+
+def test_feed_stops_at_invalid_json():
+    """Test that invalid JSON stops the extraction instead of failing, the text still being collected."""
+    extractor = JsonFieldExtractor()
+
+    assert extractor.feed('{"branch_name": "feat-x", "count": 1 2, ') == [("branch_name", "feat-x")]
+    assert extractor.feed('"pr_title": "Title"}') == []
+    assert extractor.text.endswith('"Title"}')
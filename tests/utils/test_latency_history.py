@@ -0,0 +1,30 @@
+from src.utils.latency_history import LatencyHistory
+
+
+def test_percentile(tmp_path):
+    """Test that the percentile is computed from the recorded latencies."""
+    history = LatencyHistory(str(tmp_path / "metrics" / "latency.json"))
+    for seconds in range(1, 21):
+        history.record(float(seconds))
+
+    assert history.percentile(95) == 19.0
+    assert history.percentile(50) == 10.0
+
+
+def test_percentile_needs_enough_samples(tmp_path):
+    """Test that no percentile is given until enough latencies were recorded."""
+    history = LatencyHistory(str(tmp_path / "latency.json"))
+    history.record(1.0)
+
+    assert history.samples() == [1.0]
+    assert history.percentile(95) is None
+
+
+def test_keeps_most_recent_samples(tmp_path):
+    """Test that only the most recent latencies are kept."""
+    history = LatencyHistory(str(tmp_path / "latency.json"))
+    history.max_samples = 3
+    for seconds in range(5):
+        history.record(float(seconds))
+
+    assert history.samples() == [2.0, 3.0, 4.0]
@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+from src.utils.pending_response import PendingResponse
+
+
+def test_get_waits_for_the_field():
+    """Test that a field can be read while the rest of the response is still being produced."""
+    release = threading.Event()
+
+    def produce(response):
+        response.set_field("first", 1)
+        release.wait()
+        return {"first": 1, "second": 2}
+
+    response = PendingResponse.run(produce)
+
+    assert response.get("first") == 1
+    release.set()
+    assert response.get("second") == 2
+    assert response.get("missing", "default") == "default"
+    assert response.result() == {"first": 1, "second": 2}
+
+
+def test_error_is_raised_to_the_reader():
+    """Test that an error of the producer is raised by the fields that were not received."""
+
+    def produce(response):
+        response.set_field("first", 1)
+        raise SystemExit(1)
+
+    response = PendingResponse.run(produce)
+
+    with pytest.raises(SystemExit):
+        response.get("second")
+    assert response.get("first") == 1
+    with pytest.raises(SystemExit):
+        response.result()
+
+
+def test_completed():
+    """Test that a complete response is readable at once."""
+    response = PendingResponse.completed({"key": "value"})
+    assert response.get("key") == "value"
+    assert response.result() == {"key": "value"}
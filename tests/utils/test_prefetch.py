@@ -0,0 +1,48 @@
+import sys
+import threading
+
+import pytest
+from src.utils.prefetch import Prefetch, hold_background_output
+
+
+def test_tasks_run_concurrently():
+    """Test that the tasks run at the same time, a task being able to wait for another one."""
+    both_started = threading.Barrier(2, timeout=5)
+    prefetch = Prefetch()
+
+    prefetch.start("first", lambda: (both_started.wait(), "first")[1])
+    prefetch.start("second", lambda: (both_started.wait(), prefetch.get("first"))[1] + " then second")
+
+    assert prefetch.get("second") == "first then second"
+    prefetch.wait()
+
+
+def test_error_is_raised_to_the_reader():
+    """Test that the error of a task, including an exit, is raised where its value is read."""
+    prefetch = Prefetch()
+    prefetch.start("value", int, "not a number")
+    prefetch.start("exit", sys.exit, 1)
+
+    with pytest.raises(ValueError):
+        prefetch.get("value")
+    with pytest.raises(SystemExit):
+        prefetch.get("exit")
+    with pytest.raises(ValueError):
+        prefetch.wait()
+
+
+def test_background_output_is_held(capsys):
+    """Test that what other threads print while the output is held comes after what the main thread prints."""
+    with hold_background_output():
+        thread = threading.Thread(target=lambda: print("Skipping binary file: image.png"))
+        thread.start()
+        thread.join()
+        print("Enter a description of the change: ")
+        assert capsys.readouterr().out == "Enter a description of the change: \n"
+
+    assert capsys.readouterr().out == "Skipping binary file: image.png\n"
+
+    thread = threading.Thread(target=lambda: print("Collapsed 2 repeated hunk(s)"))
+    thread.start()
+    thread.join()
+    assert capsys.readouterr().out == "Collapsed 2 repeated hunk(s)\n"
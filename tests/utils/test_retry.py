@@ -0,0 +1,25 @@
+from unittest.mock import MagicMock, patch
+
+from src.utils.retry import get_retry_delay
+
+
+def error_with_headers(headers):
+    error = Exception("Error")
+    error.response = MagicMock(headers=headers)
+    return error
+
+
+def test_retry_delay_honours_retry_after():
+    """Test that the delay requested by the server is used, in seconds or milliseconds."""
+    assert get_retry_delay(error_with_headers({"retry-after": "2"}), 0) == 2.0
+    assert get_retry_delay(error_with_headers({"retry-after-ms": "1500", "retry-after": "2"}), 0) == 1.5
+    assert get_retry_delay(error_with_headers({"retry-after": "3600"}), 0) == 30.0
+
+
+@patch("src.utils.retry.random.uniform", side_effect=lambda low, high: high)
+def test_retry_delay_backs_off_with_jitter(mock_uniform):
+    """Test that without a requested delay the delay is drawn below an exponential backoff."""
+    assert get_retry_delay(Exception("Error"), 0) == 1.0
+    assert get_retry_delay(error_with_headers({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}), 2) == 4.0
+    assert get_retry_delay(Exception("Error"), 10) == 30.0
+    mock_uniform.assert_called_with(0, 30.0)